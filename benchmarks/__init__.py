@@ -0,0 +1,2 @@
+# Benchmarks del Dashboard Industrial. Se ejecutan desde la raíz del repo:
+#     python -m benchmarks.<nombre>
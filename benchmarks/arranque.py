@@ -0,0 +1,90 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+
+# Arranque del dashboard:
+#   1. importación en frío de los módulos que streamlit_app.py importa al
+#      comienzo (un intérprete nuevo por medición; streamlit se importa
+#      antes porque el servidor ya lo tiene cargado al ejecutar el script)
+#   2. primer pintado: tiempo del primer rerun hasta terminar la sección de
+#      métricas, con el perfilador por secciones, sobre el volumen simulado
+#      que se pida
+#
+#     python -m benchmarks.arranque --frecuencia 1s --dias 2 --tags 8
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(RAIZ, 'streamlit_app.py')
+
+# Secciones que forman el primer pintado (estado y métricas del día)
+PRIMER_PINTADO = ('carga', 'controles', 'filtro', 'estado', 'metricas')
+
+
+# Sentencias import del nivel superior del script
+def importaciones(ruta=SCRIPT):
+    with open(ruta, encoding='utf-8') as archivo:
+        arbol = ast.parse(archivo.read())
+    return [ast.unparse(nodo) for nodo in arbol.body if isinstance(nodo, (ast.Import, ast.ImportFrom))]
+
+
+def medir_importacion(sentencias, repeticiones):
+    codigo = (
+        'import time, sys\n'
+        'import streamlit\n'
+        'reloj = time.perf_counter()\n'
+        + ''.join(s + '\n' for s in sentencias if s != 'import streamlit as st')
+        + 'print(time.perf_counter() - reloj, "altair" in sys.modules)\n'
+    )
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.split()
+        tiempos.append(float(salida[0]))
+    return min(tiempos), salida[1] == 'True'
+
+
+def medir_primer_pintado():
+    from streamlit.testing.v1 import AppTest
+
+    from industrial.perfilado import RESULTADOS
+
+    os.environ['DASHBOARD_PERFILADO'] = '1'
+    app = AppTest.from_file(SCRIPT, default_timeout=600)
+    mediciones = []
+    for _ in range(2):
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        secciones = {m['seccion']: m['segundos'] for m in RESULTADOS[-1]['secciones']}
+        mediciones.append((sum(secciones.get(s, 0.0) for s in PRIMER_PINTADO), RESULTADOS[-1]['total_segundos']))
+    return mediciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importación en frío y primer pintado del dashboard')
+    parser.add_argument('--frecuencia', default='1s')
+    parser.add_argument('--dias', type=int, default=2)
+    parser.add_argument('--tags', type=int, default=8)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    sentencias = importaciones()
+    segundos, con_altair = medir_importacion(sentencias, args.repeticiones)
+    print(f"importación en frío: {segundos * 1000:.0f} ms "
+          f"({len(sentencias)} sentencias; altair {'cargado' if con_altair else 'diferido'})")
+
+    os.environ.update(
+        DASHBOARD_SIM_FRECUENCIA=args.frecuencia,
+        DASHBOARD_SIM_DIAS=str(args.dias),
+        DASHBOARD_SIM_TAGS=str(args.tags),
+    )
+    sys.path.insert(0, RAIZ)
+    for nombre, (pintado, total) in zip(['primer rerun', 'rerun'], medir_primer_pintado()):
+        print(f"{nombre:>13}: estado y métricas en {pintado * 1000:6.0f} ms · rerun completo {total * 1000:6.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
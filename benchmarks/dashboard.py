@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from industrial.almacenamiento import FORMATOS
+from industrial.perfilado import RESULTADOS, VARIABLE_ENTORNO
+from industrial.simulador import SimuladorPlanta, configurar_tags
+
+# Benchmark del costo de un rerun completo de streamlit_app.py.
+#
+# Genera un almacén sintético de tamaño configurable (días × muestras/día ×
+# tags), ejecuta el script sin navegador con streamlit.testing.v1.AppTest
+# (una pasada por pestaña en cada rerun) y reporta, por sección, el tiempo de pared y (con --memoria) el pico de
+# memoria de Python, además del tamaño de cada spec de gráfico enviado al
+# navegador. Los resultados se guardan en JSON para comparar entre commits:
+#
+#     python -m benchmarks.dashboard --dias 3 --frecuencia 10 --tags 50 --salida base.json
+#     python -m benchmarks.dashboard ... --comparar base.json
+
+# Pestañas y expansores perezosos de streamlit_app.py
+PESTANAS = ["📈 Tendencias", "📊 Vista Combinada", "🔍 Correlación", "📋 Resumen del Día"]
+EXPANSORES = ['exp_correlacion_movil', 'exp_tiempo_estados', 'exp_resumen_hora']
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'streamlit_app.py')
+
+
+def generar_almacen(raiz, dias, frecuencia_s, n_tags, formato='npy', semilla=42):
+    simulador = SimuladorPlanta(configurar_tags(n_tags, semilla), f'{frecuencia_s}s', semilla)
+    almacen = FORMATOS[formato](raiz, simulador.nombres)
+    inicio = pd.Timestamp('2024-09-20')
+    simulador.escribir_en_almacen(almacen, inicio, inicio + pd.Timedelta(days=dias))
+    return almacen
+
+
+def tamanos_specs(app):
+    specs = {}
+    for grafico in app.get('vega_lite_chart'):
+        proto = grafico.proto
+        datos = [d.data.data for d in proto.datasets] + [proto.data.data]
+        specs[hash((proto.spec, *datos))] = {
+            'spec_bytes': len(proto.spec),
+            'datos_bytes': sum(len(d) for d in datos),
+            'total_bytes': proto.ByteSize(),
+        }
+    return specs
+
+
+# Un rerun del dashboard recorre todas las pestañas (sólo se ejecuta la
+# elegida) con los expansores perezosos abiertos: cada pasada aporta las
+# secciones de su pestaña y la primera también las comunes, de modo que la
+# suma equivale al rerun completo que dibujaba todas las secciones a la vez.
+def ejecutar(reruns, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    corridas = []
+    app = AppTest.from_file(SCRIPT, default_timeout=timeout)
+    for k in range(reruns):
+        secciones, specs, pestanas = {}, {}, {}
+        segundos = 0.0
+        for pestana in PESTANAS:
+            app.session_state['seccion'] = pestana
+            for clave in EXPANSORES:
+                app.session_state[clave] = True
+            inicio = time.perf_counter()
+            app.run()
+            segundos += time.perf_counter() - inicio
+            if app.exception:
+                raise RuntimeError(f"El script falló en {pestana}: {app.exception[0].value}")
+            medicion = RESULTADOS[-1] if RESULTADOS else {'secciones': [], 'total_segundos': None}
+            pestanas[pestana] = medicion['total_segundos']
+            for m in medicion['secciones']:
+                secciones.setdefault(m['seccion'], m)
+            specs.update(tamanos_specs(app))
+        corridas.append({
+            'rerun': k,
+            'frio': k == 0,
+            'segundos_apptest': segundos,
+            'segundos_script': sum(m['segundos'] for m in secciones.values()) if secciones else None,
+            'pestanas': pestanas,
+            'secciones': list(secciones.values()),
+            'specs': list(specs.values()),
+        })
+    return corridas
+
+
+# Mediana por sección de los reruns en caliente (todos si sólo hubo uno)
+def resumir(corridas):
+    calientes = [c for c in corridas if not c['frio']] or corridas
+    por_seccion = {}
+    for corrida in calientes:
+        for m in corrida['secciones']:
+            por_seccion.setdefault(m['seccion'], []).append(m)
+    resumen = {}
+    for seccion, mediciones in por_seccion.items():
+        resumen[seccion] = {'segundos': statistics.median(m['segundos'] for m in mediciones)}
+        picos = [m['pico_bytes'] for m in mediciones if m.get('pico_bytes') is not None]
+        if picos:
+            resumen[seccion]['pico_bytes'] = max(picos)
+    specs = calientes[-1]['specs']
+    pestanas = {}
+    for corrida in calientes:
+        for pestana, segundos in corrida.get('pestanas', {}).items():
+            if segundos is not None:
+                pestanas.setdefault(pestana, []).append(segundos)
+    return {
+        'secciones': resumen,
+        'pestanas': {p: statistics.median(v) for p, v in pestanas.items()},
+        'total_segundos': statistics.median(c['segundos_script'] or c['segundos_apptest'] for c in calientes),
+        'frio_segundos': corridas[0]['segundos_script'] or corridas[0]['segundos_apptest'],
+        'graficos': len(specs),
+        'specs_bytes': sum(s['total_bytes'] for s in specs),
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(SCRIPT), text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(resumen, base=None):
+    base_secciones = base['resumen']['secciones'] if base else {}
+    print(f"{'sección':<14} {'ms':>10} {'pico KB':>10}" + (f" {'base ms':>10} {'x':>7}" if base else ''))
+    for seccion, datos in resumen['secciones'].items():
+        linea = f"{seccion:<14} {datos['segundos'] * 1000:>10.1f} "
+        linea += f"{datos['pico_bytes'] / 1024:>10.0f}" if 'pico_bytes' in datos else f"{'-':>10}"
+        if base:
+            previo = base_secciones.get(seccion)
+            if previo:
+                linea += f" {previo['segundos'] * 1000:>10.1f} {datos['segundos'] / max(previo['segundos'], 1e-9):>6.2f}x"
+            else:
+                linea += f" {'-':>10} {'-':>7}"
+        print(linea)
+    for pestana, segundos in resumen.get('pestanas', {}).items():
+        print(f"pestaña {pestana}: {segundos * 1000:.1f} ms")
+    print(f"total rerun (caliente): {resumen['total_segundos'] * 1000:.1f} ms · "
+          f"primer rerun: {resumen['frio_segundos'] * 1000:.1f} ms")
+    print(f"gráficos: {resumen['graficos']} · specs: {resumen['specs_bytes'] / 1024:.1f} KB")
+    if base:
+        print(f"base ({base.get('commit')}): total {base['resumen']['total_segundos'] * 1000:.1f} ms · "
+              f"specs {base['resumen']['specs_bytes'] / 1024:.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark por sección de un rerun del dashboard')
+    parser.add_argument('--dias', type=int, default=3)
+    parser.add_argument('--frecuencia', type=int, default=60, help='segundos entre muestras')
+    parser.add_argument('--tags', type=int, default=8)
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='npy')
+    parser.add_argument('--almacen', help='usar un almacén existente en lugar de generar uno')
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--memoria', action='store_true', help='medir picos con tracemalloc (más lento)')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--salida', help='archivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-dashboard-') as tmp:
+        raiz = args.almacen
+        if raiz is None:
+            raiz = os.path.join(tmp, 'almacen')
+            inicio = time.perf_counter()
+            generar_almacen(raiz, args.dias, args.frecuencia, args.tags, args.formato)
+            print(f"almacén sintético generado en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+        os.environ['DASHBOARD_ALMACEN'] = raiz
+        os.environ[VARIABLE_ENTORNO] = 'memoria' if args.memoria else '1'
+        corridas = ejecutar(args.reruns, args.timeout)
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'parametros': {
+            'dias': args.dias, 'frecuencia_s': args.frecuencia, 'tags': args.tags,
+            'filas_por_dia': 86400 // args.frecuencia, 'formato': args.formato,
+            'almacen': args.almacen, 'reruns': args.reruns, 'memoria': args.memoria,
+        },
+        'rss_maximo_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'corridas': corridas,
+        'resumen': resumir(corridas),
+    }
+    base = None
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+    imprimir(resultado['resumen'], base)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(resultado, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from industrial.almacenamiento import AlmacenParquet
+from industrial.exportacion import CSV_GZ, DATOS, FORMATOS, exportar
+from industrial.simulador import SimuladorPlanta, configurar_tags
+
+# Pico de memoria de la exportación por bloques contra la exportación
+# ingenua (leer todo el rango en un DataFrame y llamar a to_csv), para
+# rangos de distinta cantidad de días sobre un almacén Parquet:
+#
+#     python -m benchmarks.exportacion --dias 1 4 16 --formato csv.gz
+
+
+def ingenua(almacen, ruta, inicio, fin, formato):
+    df = almacen.leer_rango(inicio, fin)
+    if formato == 'parquet':
+        df.to_parquet(ruta, index=False)
+    else:
+        df.to_csv(ruta, index=False, compression='gzip' if formato == CSV_GZ else None)
+    return len(df)
+
+
+def medir(funcion, *args):
+    tracemalloc.start()
+    reloj = time.perf_counter()
+    filas = funcion(*args)
+    segundos = time.perf_counter() - reloj
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return filas, segundos, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria de la exportación por bloques')
+    parser.add_argument('--dias', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--frecuencia', default='10s')
+    parser.add_argument('--tags', type=int, default=20)
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default=CSV_GZ)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        simulador = SimuladorPlanta(configurar_tags(args.tags), args.frecuencia)
+        almacen = AlmacenParquet(os.path.join(directorio, 'almacen'), simulador.nombres)
+        inicio = pd.Timestamp('2024-09-01')
+        simulador.escribir_en_almacen(almacen, inicio, inicio + pd.Timedelta(days=max(args.dias)))
+        salida = os.path.join(directorio, 'salida' + FORMATOS[args.formato][1])
+
+        print(f"{'días':>5} {'filas':>10} {'bloques MB':>11} {'s':>6} {'ingenua MB':>11} {'s':>6}")
+        for dias in args.dias:
+            fin = inicio + pd.Timedelta(days=dias)
+            filas, s_bloques, pico_bloques = medir(
+                exportar, almacen, salida, inicio, fin, None, DATOS, args.formato
+            )
+            _, s_ingenua, pico_ingenua = medir(ingenua, almacen, salida, inicio, fin, args.formato)
+            print(f"{dias:>5} {filas:>10,} {pico_bloques / 2**20:>11.1f} {s_bloques:>6.2f} "
+                  f"{pico_ingenua / 2**20:>11.1f} {s_ingenua:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from industrial.simulador import SimuladorPlanta, configurar_tags
+from industrial.streaming import CUANTIZADO, FLOAT32, BufferCircular, BufferCompacto
+
+# Memoria residente del historial en vivo de varias horas por tag: el
+# DataFrame float64 de generar_datos_industriales (la referencia de la
+# columna 'x DF'; el objetivo es 4-8x), un BufferCircular (int64 + float64)
+# por tag y BufferCompacto en float32 y cuantizado a 16 y 12 bits (el que usa
+# el dashboard). Con --jitter los tiempos dejan de ser regulares y
+# BufferCompacto guarda el desvío de cada muestra respecto de la grilla del
+# bloque (compartido entre los tags, que reciben los mismos tiempos).
+# 'reducida' es el costo de graficar la ventana completa de todos los tags
+# en un refresco, con la reducción de los bloques sellados ya en caché.
+#
+#     python -m benchmarks.historial --horas 24 72 --tags 20 --jitter 0 50
+
+
+def llenar(fabrica, tags, tiempos, valores, lote):
+    tracemalloc.start()
+    buffers = {t: fabrica() for t in tags}
+    for desde in range(0, len(tiempos), lote):
+        for j, tag in enumerate(tags):
+            buffers[tag].agregar(tiempos[desde:desde + lote], valores[desde:desde + lote, j])
+    residente, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return buffers, residente
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria del historial en vivo')
+    parser.add_argument('--horas', type=int, nargs='+', default=[24, 72])
+    parser.add_argument('--tags', type=int, default=20)
+    parser.add_argument('--frecuencia', default='1s')
+    parser.add_argument('--jitter', type=int, nargs='+', default=[0, 50], help='ms de variación de los tiempos')
+    parser.add_argument('--lote', type=int, default=600, help='muestras por llamada a agregar')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'horas':>5} {'jitter':>6} {'estructura':<22} {'MB':>8} {'x DF':>6} "
+          f"{'error máx':>10} {'ultimos(3600)':>14} {'reducida':>11}")
+    for horas in args.horas:
+        simulador = SimuladorPlanta(configurar_tags(args.tags), args.frecuencia)
+        inicio = pd.Timestamp('2024-09-20')
+        df = simulador.generar_dataframe(inicio, inicio + pd.Timedelta(hours=horas))
+        tags = simulador.nombres
+        valores = df[tags].to_numpy(dtype='float64')
+        base = df.memory_usage(deep=True).sum()
+        capacidad = len(df)
+        for jitter in args.jitter:
+            tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64').copy()
+            if jitter:
+                tiempos += rng.integers(-jitter, jitter + 1, len(tiempos)) * 1_000_000
+            print(f"{horas:>5} {jitter:>6} {'DataFrame float64':<22} {base / 2**20:>8.1f} {1:>6.1f}")
+            estructuras = [
+                ('BufferCircular', lambda: BufferCircular(capacidad)),
+                ('BufferCompacto float32', lambda: BufferCompacto(capacidad, FLOAT32)),
+                ('BufferCompacto 16 bits', lambda: BufferCompacto(capacidad, CUANTIZADO, bits=16)),
+                ('BufferCompacto 12 bits', lambda: BufferCompacto(capacidad, CUANTIZADO, bits=12)),
+            ]
+            for nombre, fabrica in estructuras:
+                buffers, residente = llenar(fabrica, tags, tiempos, valores, args.lote)
+                error = max(
+                    np.nanmax(np.abs(buffers[t].ultimos(capacidad)[1] - valores[:, j])) for j, t in enumerate(tags)
+                )
+                reloj = time.perf_counter()
+                for tag in tags:
+                    buffers[tag].ultimos(3600)
+                ms = (time.perf_counter() - reloj) * 1000
+                for tag in tags:
+                    buffers[tag].reducida(capacidad, 1500)
+                reloj = time.perf_counter()
+                for tag in tags:
+                    buffers[tag].reducida(capacidad, 1500)
+                ms_reducida = (time.perf_counter() - reloj) * 1000
+                print(f"{'':>5} {'':>6} {nombre:<22} {residente / 2**20:>8.1f} {base / residente:>6.1f} "
+                      f"{error:>10.2e} {ms:>11.1f} ms {ms_reducida:>8.1f} ms")
+                del buffers
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from industrial.estados import clasificar, tabla_umbrales
+from industrial.kpis import KPIsIncrementales
+from industrial.simulador import SimuladorPlanta, configurar_tags
+
+# Costo de mantener los KPI de tiempo en estado a alta frecuencia: recalcular
+# el día completo en cada tick contra actualizar sólo con las muestras nuevas.
+#
+#     python -m benchmarks.kpis --frecuencia 1s --tags 50 --tick 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KPI de disponibilidad: completo vs incremental')
+    parser.add_argument('--frecuencia', default='1s')
+    parser.add_argument('--tags', type=int, default=50)
+    parser.add_argument('--horas', type=int, default=12, help='historia del día al comenzar')
+    parser.add_argument('--tick', type=int, default=60, help='muestras nuevas por tick')
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args()
+
+    simulador = SimuladorPlanta(configurar_tags(args.tags), args.frecuencia)
+    inicio = pd.Timestamp('2024-09-20')
+    paso = simulador.frecuencia * args.tick
+    df = simulador.generar_dataframe(inicio, inicio + pd.Timedelta(hours=args.horas) + paso * args.ticks)
+    tags = simulador.nombres
+    tabla = tabla_umbrales(tags)
+    tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]')
+    estados = clasificar(df[tags].to_numpy(dtype='float64'), tabla)
+    n_inicial = int(np.searchsorted(tiempos, np.datetime64(inicio + pd.Timedelta(hours=args.horas))))
+
+    incremental = KPIsIncrementales(tags, tabla.con_umbral)
+    incremental.actualizar(tiempos[:n_inicial], estados[:n_inicial])
+    t_completo = t_incremental = 0.0
+    for k in range(1, args.ticks + 1):
+        n = min(n_inicial + k * args.tick, len(tiempos))
+        reloj = time.perf_counter()
+        completo = KPIsIncrementales(tags, tabla.con_umbral)
+        completo.actualizar(tiempos[:n], estados[:n])
+        disponibilidad_completo = completo.resumen().disponibilidad
+        t_completo += time.perf_counter() - reloj
+        reloj = time.perf_counter()
+        incremental.actualizar(tiempos[:n], estados[:n])
+        disponibilidad_incremental = incremental.resumen().disponibilidad
+        t_incremental += time.perf_counter() - reloj
+        assert np.isclose(disponibilidad_completo, disponibilidad_incremental)
+
+    print(f"{n:,} muestras × {len(tags)} tags, {args.tick} nuevas por tick")
+    print(f"completo:    {t_completo / args.ticks * 1000:8.2f} ms/tick")
+    print(f"incremental: {t_incremental / args.ticks * 1000:8.2f} ms/tick "
+          f"({t_completo / max(t_incremental, 1e-9):.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from industrial.muestreo import MODOS, puntos_para_ancho, reducir_dataframe
+
+# Benchmark de la reducción de puntos: tamaño del spec Vega-Lite y tiempo de
+# construcción + serialización de un gráfico de tendencia, con y sin reducir.
+# El render en el navegador no se mide aquí; el tamaño del spec es la cota
+# de lo que el navegador tiene que parsear y dibujar.
+
+
+def serie_sintetica(n, semilla=42):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range('2024-09-20', periods=n, freq='s')
+    valores = 250 + np.cumsum(rng.normal(0, 0.05, n)) + rng.normal(0, 1, n)
+    # Picos aislados de una muestra que la reducción debe conservar
+    picos = np.linspace(n * 0.1, n * 0.9, 5).astype(int) + rng.integers(0, 10, 5)
+    valores[picos] += 60
+    return pd.DataFrame({'Fecha': fechas, 'Valor': valores}), picos
+
+
+def grafico(datos, marcadores):
+    return alt.Chart(datos).mark_line(
+        point=alt.OverlayMarkDef() if marcadores else False,
+        strokeWidth=3
+    ).encode(
+        x=alt.X('Fecha:T', title='Tiempo'),
+        y=alt.Y('Valor:Q'),
+        tooltip=['Fecha:T', 'Valor:Q']
+    ).properties(width=350, height=250).interactive()
+
+
+def medir(datos, marcadores, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        spec = grafico(datos, marcadores).to_json()
+        tiempos.append(time.perf_counter() - inicio)
+    return len(spec.encode()), min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de reducción de puntos para gráficos')
+    parser.add_argument('--muestras', type=int, nargs='+', default=[1_000, 10_000, 86_400])
+    parser.add_argument('--ancho', type=int, default=350)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    alt.data_transformers.disable_max_rows()
+    n_salida = puntos_para_ancho(args.ancho)
+    print(f"{'muestras':>9} {'modo':>8} {'puntos':>7} {'spec KB':>9} {'seg':>8} {'reducir seg':>12} {'picos':>6}")
+    for n in args.muestras:
+        datos, picos = serie_sintetica(n)
+        kb, seg = medir(datos, True, args.repeticiones)
+        print(f"{n:>9} {'original':>8} {n:>7} {kb / 1024:>9.1f} {seg:>8.3f} {'-':>12} {'5/5':>6}")
+        for modo in MODOS:
+            inicio = time.perf_counter()
+            reducidos = reducir_dataframe(datos, ['Valor'], n_salida, modo)
+            seg_reducir = time.perf_counter() - inicio
+            kb, seg = medir(reducidos, len(reducidos) <= 200, args.repeticiones)
+            conservados = np.isin(picos, reducidos.index).sum()
+            print(f"{n:>9} {modo:>8} {len(reducidos):>7} {kb / 1024:>9.1f} {seg:>8.3f} "
+                  f"{seg_reducir:>12.4f} {conservados:>4}/5")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from industrial.estados import clasificar, tabla_umbrales
+from industrial.muestreo import puntos_para_ancho
+from industrial.paralelo import EjecutorAnalitico
+from industrial.simulador import SimuladorPlanta, configurar_tags
+
+# Aceleración de la analítica por tag en un pool de procesos frente al
+# camino en serie: agregados por hora, reducción LTTB al ancho de un gráfico
+# e intervalos de alarma de todos los tags de un día. La última columna es
+# sólo la extracción de alarmas desde la matriz de estados ya clasificada
+# (lo que hace el servicio de vistas).
+#
+#     python -m benchmarks.paralelo --tags 500 --frecuencia 10 --procesos 2 4 8
+
+
+def medir(ejecutor, df, tags, cortes, en_serie, repeticiones, estados=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        if estados is None:
+            resultado = ejecutor.analizar(
+                df, tags, cortes=cortes, n_salida=puntos_para_ancho(350), alarmas=True, en_serie=en_serie
+            )
+        else:
+            resultado = ejecutor.analizar(df, tags, alarmas=True, estados=estados, en_serie=en_serie)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analítica por tag: serie vs. pool de procesos')
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--frecuencia', type=int, default=10, help='segundos entre muestras')
+    parser.add_argument('--procesos', type=int, nargs='+', default=[os.cpu_count() or 1])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    simulador = SimuladorPlanta(configurar_tags(args.tags), f'{args.frecuencia}s')
+    inicio = pd.Timestamp('2024-09-20')
+    df = simulador.generar_dataframe(inicio, inicio + pd.Timedelta(days=1))
+    tags = simulador.nombres
+    cortes = np.arange(0, len(df), 3600 // args.frecuencia)
+    cpus = os.cpu_count() or 1
+    print(f"{len(df):,} filas × {len(tags)} tags · {cpus} CPU")
+    # Sin núcleos libres para cada worker la columna x sólo mide la
+    # coordinación; la escala del pool no queda verificada
+    if cpus == 1 or max(args.procesos) > cpus:
+        print(f"aviso: {cpus} CPU para hasta {max(args.procesos)} procesos; los workers se reparten los "
+              f"mismos núcleos, así que estos tiempos no muestran cómo escala el pool")
+
+    estados = clasificar(df[tags].to_numpy(dtype='float64'), tabla_umbrales(tags))
+    serie, referencia = medir(EjecutorAnalitico(procesos=1), df, tags, cortes, True, args.repeticiones)
+    serie_alarmas, _ = medir(EjecutorAnalitico(procesos=1), df, tags, None, True, args.repeticiones, estados)
+    print(f"{'procesos':>8} {'ms':>10} {'x':>7} {'alarmas ms':>11} {'x':>7}")
+    print(f"{'serie':>8} {serie * 1000:>10.1f} {1.0:>6.2f}x {serie_alarmas * 1000:>11.1f} {1.0:>6.2f}x")
+    for procesos in args.procesos:
+        ejecutor = EjecutorAnalitico(procesos=procesos)
+        # El primer uso levanta el pool; no se cuenta
+        ejecutor.analizar(df, tags[:procesos], alarmas=True, en_serie=False)
+        segundos, resultado = medir(ejecutor, df, tags, cortes, False, args.repeticiones)
+        alarmas, solo_alarmas = medir(ejecutor, df, tags, None, False, args.repeticiones, estados)
+        ejecutor.cerrar()
+        assert resultado.alarmas.equals(referencia.alarmas)
+        assert solo_alarmas.alarmas.equals(referencia.alarmas)
+        assert np.allclose(resultado.agregados.media, referencia.agregados.media, equal_nan=True)
+        print(f"{procesos:>8} {segundos * 1000:>10.1f} {serie / segundos:>6.2f}x "
+              f"{alarmas * 1000:>11.1f} {serie_alarmas / alarmas:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
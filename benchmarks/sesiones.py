@@ -0,0 +1,73 @@
+import argparse
+import threading
+import time
+
+import pandas as pd
+
+from industrial.almacenamiento import AlmacenMemoria
+from industrial.servicio import ServicioVistas
+from industrial.simulador import SimuladorPlanta, configurar_tags
+
+# Costo de CPU por tick de datos según la cantidad de sesiones conectadas.
+#
+# En cada tick se agregan muestras nuevas al día en curso y cada sesión pide
+# las vistas del día (valores actuales, estados, alarmas, agregados,
+# correlación). Se compara el servicio compartido contra el esquema
+# anterior, en el que cada sesión calculaba sus propias vistas:
+#
+#     python -m benchmarks.sesiones --sesiones 1 10 100 --ticks 5
+
+
+def preparar(frecuencia_s, n_tags, horas):
+    simulador = SimuladorPlanta(configurar_tags(n_tags), f'{frecuencia_s}s')
+    inicio = pd.Timestamp('2024-09-20')
+    almacen = AlmacenMemoria(simulador.generar_dataframe(inicio, inicio + pd.Timedelta(hours=horas)))
+    return simulador, almacen, inicio
+
+
+def medir(modo, n_sesiones, ticks, frecuencia_s, n_tags, horas):
+    simulador, almacen, inicio = preparar(frecuencia_s, n_tags, horas)
+    dia = inicio.date()
+    cursor = inicio + pd.Timedelta(hours=horas)
+    paso = pd.Timedelta(minutes=1)
+    if modo == 'compartido':
+        servicio = ServicioVistas(almacen)
+        servicio.vistas(dia)
+    cpu = 0.0
+    for _ in range(ticks):
+        almacen.escribir(simulador.generar_dataframe(cursor, cursor + paso))
+        cursor += paso
+        if modo == 'compartido':
+            sesion = lambda: servicio.vistas(dia)
+        else:
+            # Cada sesión con su propio servicio: nada se comparte
+            sesion = lambda: ServicioVistas(almacen).vistas(dia)
+        hilos = [threading.Thread(target=sesion) for _ in range(n_sesiones)]
+        reloj = time.process_time()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        cpu += time.process_time() - reloj
+    return cpu / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU por tick vs. cantidad de sesiones')
+    parser.add_argument('--sesiones', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--ticks', type=int, default=5)
+    parser.add_argument('--frecuencia', type=int, default=5, help='segundos entre muestras')
+    parser.add_argument('--tags', type=int, default=20)
+    parser.add_argument('--horas', type=int, default=12, help='historia del día al comenzar')
+    args = parser.parse_args()
+
+    print(f"{'sesiones':>8} {'compartido ms':>14} {'por sesión ms':>14} {'x':>7}")
+    for n in args.sesiones:
+        compartido = medir('compartido', n, args.ticks, args.frecuencia, args.tags, args.horas)
+        por_sesion = medir('por_sesion', n, args.ticks, args.frecuencia, args.tags, args.horas)
+        print(f"{n:>8} {compartido * 1000:>14.1f} {por_sesion * 1000:>14.1f} "
+              f"{por_sesion / max(compartido, 1e-9):>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
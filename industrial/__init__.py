@@ -0,0 +1,2 @@
+# Núcleo del Dashboard Industrial: almacenamiento y cálculo de las series de
+# proceso que consume streamlit_app.py.
@@ -0,0 +1,393 @@
+import json
+import os
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Almacenamiento columnar de series de tiempo.
+#
+# Todas las implementaciones guardan el tiempo como un índice int64 (ns)
+# ordenado y cada variable (tag) como una columna float64 independiente.
+# Una consulta por rango localiza sus límites con búsqueda binaria
+# (np.searchsorted) y sólo materializa las filas y columnas pedidas.
+
+COLUMNA_TIEMPO = 'Fecha'
+ARCHIVO_FORMATO = 'formato.json'
+UN_DIA = pd.Timedelta(days=1)
+
+
+def _a_ns(momento):
+    return pd.Timestamp(momento).value
+
+
+# Índices [i, j) de las muestras con inicio <= t < fin
+def _limites(tiempos_ns, inicio_ns, fin_ns):
+    i = int(np.searchsorted(tiempos_ns, inicio_ns, side='left'))
+    j = int(np.searchsorted(tiempos_ns, fin_ns, side='left'))
+    return i, j
+
+
+def _armar_dataframe(tiempos_ns, columnas):
+    datos = {COLUMNA_TIEMPO: pd.to_datetime(np.asarray(tiempos_ns, dtype='int64'))}
+    datos.update(columnas)
+    return pd.DataFrame(datos)
+
+
+# Escribe con `escribir(archivo)` un temporal en el directorio de `ruta` y lo
+# renombra encima: un lector concurrente (p. ej. el hilo del servicio de
+# vistas) ve el archivo anterior o el nuevo, nunca uno a medio escribir
+def _escribir_atomico(ruta, escribir):
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as archivo:
+            escribir(archivo)
+        # mkstemp crea el archivo sólo para su dueño
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+# Convierte un DataFrame ancho (Fecha + tags) en arreglos ordenados por tiempo
+def _separar_columnas(df, tags=None):
+    df = df.sort_values(COLUMNA_TIEMPO, kind='stable')
+    tiempos = df[COLUMNA_TIEMPO].to_numpy(dtype='datetime64[ns]').view('int64')
+    if tags is None:
+        tags = [c for c in df.columns if c != COLUMNA_TIEMPO]
+    columnas = {tag: df[tag].to_numpy(dtype='float64') for tag in tags}
+    return tiempos, columnas
+
+
+class AlmacenSeries:
+    """Interfaz común de los almacenes de series de tiempo."""
+
+    tags = []
+
+    def dias(self):
+        raise NotImplementedError
+
+    def num_registros(self):
+        raise NotImplementedError
+
+    def leer_rango(self, inicio, fin, tags=None):
+        raise NotImplementedError
+
+    def escribir(self, df):
+        raise NotImplementedError
+
+    def rango_fechas(self):
+        dias = self.dias()
+        if not dias:
+            return None, None
+        return dias[0], dias[-1]
+
+    def leer_dia(self, dia, tags=None):
+        inicio = pd.Timestamp(dia)
+        return self.leer_rango(inicio, inicio + UN_DIA, tags)
+
+    # Valor que cambia cada vez que se escribe en la partición del día (None
+    # si no existe); sirve para invalidar lo derivado de ella
+    def version_dia(self, dia):
+        raise NotImplementedError
+
+    def version_rango(self, inicio, fin):
+        inicio, fin = pd.Timestamp(inicio), pd.Timestamp(fin)
+        return tuple(
+            self.version_dia(d) for d in self.dias()
+            if inicio.normalize() <= pd.Timestamp(d) < fin
+        )
+
+    # Lista de tags pedida (todos si es None); KeyError si alguno no existe
+    def tags_validos(self, tags):
+        if tags is None:
+            return list(self.tags)
+        desconocidos = [t for t in tags if t not in self.tags]
+        if desconocidos:
+            raise KeyError(f"Variables desconocidas: {', '.join(desconocidos)}")
+        return list(tags)
+
+
+class AlmacenMemoria(AlmacenSeries):
+    """Series en RAM con índice de tiempo ordenado (datos simulados o de prueba)."""
+
+    def __init__(self, df=None, tags=None):
+        self._tiempos = np.empty(0, dtype='int64')
+        self._columnas = {}
+        self._versiones = {}
+        # Días con datos, ordenados; se actualiza en cada escritura
+        self._dias = []
+        self.tags = list(tags) if tags else []
+        if df is not None:
+            self.escribir(df)
+
+    def dias(self):
+        return list(self._dias)
+
+    def num_registros(self):
+        return len(self._tiempos)
+
+    def version_dia(self, dia):
+        return self._versiones.get(pd.Timestamp(dia).date())
+
+    def leer_rango(self, inicio, fin, tags=None):
+        tags = self.tags_validos(tags)
+        i, j = _limites(self._tiempos, _a_ns(inicio), _a_ns(fin))
+        return _armar_dataframe(self._tiempos[i:j], {t: self._columnas[t][i:j] for t in tags})
+
+    def escribir(self, df):
+        tiempos, columnas = _separar_columnas(df)
+        if not len(tiempos):
+            return
+        for tag in columnas:
+            if tag not in self.tags:
+                self.tags.append(tag)
+        dias = [d.item() for d in np.unique(tiempos.view('datetime64[ns]').astype('datetime64[D]'))]
+        for dia in dias:
+            self._versiones[dia] = self._versiones.get(dia, 0) + 1
+        if dias and (not self._dias or dias[0] > self._dias[-1]):
+            self._dias.extend(dias)
+        elif dias:
+            self._dias = sorted(set(self._dias).union(dias))
+        # Caso común: datos nuevos posteriores a todo lo almacenado
+        if not len(self._tiempos) or tiempos[0] > self._tiempos[-1]:
+            n_previo = len(self._tiempos)
+            self._tiempos = np.concatenate([self._tiempos, tiempos])
+            for tag in self.tags:
+                previo = self._columnas.get(tag, np.full(n_previo, np.nan))
+                nuevo = columnas.get(tag, np.full(len(tiempos), np.nan))
+                self._columnas[tag] = np.concatenate([previo, nuevo])
+            return
+        previo = _armar_dataframe(self._tiempos, self._columnas)
+        combinado = pd.concat([previo, df])
+        combinado = combinado.drop_duplicates(COLUMNA_TIEMPO, keep='last')
+        self._tiempos, self._columnas = _separar_columnas(combinado, self.tags)
+
+
+class _AlmacenParticionado(AlmacenSeries):
+    """Base de los almacenes en disco particionados por día (raiz/AAAA-MM-DD/)."""
+
+    formato = None
+
+    def __init__(self, raiz, tags=None):
+        self.raiz = raiz
+        os.makedirs(raiz, exist_ok=True)
+        ruta_formato = os.path.join(raiz, ARCHIVO_FORMATO)
+        if os.path.exists(ruta_formato):
+            with open(ruta_formato) as f:
+                meta = json.load(f)
+            if meta['formato'] != self.formato:
+                raise ValueError(f"{raiz} contiene un almacén '{meta['formato']}', no '{self.formato}'")
+            self.tags = meta['tags']
+        else:
+            self.tags = list(tags) if tags else []
+            self._guardar_formato()
+
+    def _guardar_formato(self):
+        meta = json.dumps({'formato': self.formato, 'tags': self.tags}).encode()
+        _escribir_atomico(os.path.join(self.raiz, ARCHIVO_FORMATO), lambda f: f.write(meta))
+
+    def _ruta_dia(self, dia):
+        return os.path.join(self.raiz, dia.isoformat())
+
+    def dias(self):
+        dias = []
+        for nombre in os.listdir(self.raiz):
+            try:
+                dias.append(date.fromisoformat(nombre))
+            except ValueError:
+                continue
+        return sorted(dias)
+
+    def leer_rango(self, inicio, fin, tags=None):
+        tags = self.tags_validos(tags)
+        inicio_ns, fin_ns = _a_ns(inicio), _a_ns(fin)
+        primer_dia = pd.Timestamp(inicio).date()
+        ultimo_dia = (pd.Timestamp(fin) - pd.Timedelta(1, 'ns')).date()
+        partes_t = []
+        partes_c = {t: [] for t in tags}
+        # Sólo se abren las particiones que intersectan el rango
+        for dia in self.dias():
+            if dia < primer_dia or dia > ultimo_dia:
+                continue
+            tiempos, columnas = self._leer_particion(dia, tags, inicio_ns, fin_ns)
+            partes_t.append(tiempos)
+            for t in tags:
+                partes_c[t].append(columnas[t])
+        if not partes_t:
+            return _armar_dataframe(np.empty(0, 'int64'), {t: np.empty(0) for t in tags})
+        return _armar_dataframe(
+            np.concatenate(partes_t),
+            {t: np.concatenate(partes_c[t]) for t in tags}
+        )
+
+    def escribir(self, df):
+        tiempos, columnas = _separar_columnas(df)
+        nuevos = [t for t in columnas if t not in self.tags]
+        if nuevos:
+            self.tags.extend(nuevos)
+            self._guardar_formato()
+        dias_muestra = tiempos.view('datetime64[ns]').astype('datetime64[D]')
+        dias, cortes = np.unique(dias_muestra, return_index=True)
+        cortes = list(cortes) + [len(tiempos)]
+        for k, dia in enumerate(dias):
+            dia = dia.item()
+            i, j = cortes[k], cortes[k + 1]
+            bloque_t = tiempos[i:j]
+            bloque_c = {t: columnas[t][i:j] for t in columnas}
+            if os.path.isdir(self._ruta_dia(dia)):
+                bloque_t, bloque_c = self._fusionar(dia, bloque_t, bloque_c)
+            self._escribir_particion(dia, bloque_t, bloque_c)
+
+    # Combina una partición existente con muestras nuevas (las nuevas prevalecen)
+    def _fusionar(self, dia, tiempos, columnas):
+        previo_t, previo_c = self._leer_particion(dia, self.tags, np.iinfo('int64').min, np.iinfo('int64').max)
+        todos_t = np.concatenate([previo_t, tiempos])
+        orden = np.argsort(todos_t, kind='stable')
+        todos_t = todos_t[orden]
+        # Con duplicados se conserva la última ocurrencia (la muestra nueva)
+        conservar = np.append(todos_t[1:] != todos_t[:-1], True)
+        combinadas = {}
+        for tag in self.tags:
+            nuevo = columnas.get(tag, np.full(len(tiempos), np.nan))
+            combinadas[tag] = np.concatenate([previo_c[tag], nuevo])[orden][conservar]
+        return todos_t[conservar], combinadas
+
+    def version_dia(self, dia):
+        try:
+            estado = os.stat(self._archivo_version(pd.Timestamp(dia).date()))
+        except FileNotFoundError:
+            return None
+        return estado.st_mtime_ns, estado.st_size
+
+    # Archivo que se reescribe en cada escritura de la partición
+    def _archivo_version(self, dia):
+        raise NotImplementedError
+
+    def _leer_particion(self, dia, tags, inicio_ns, fin_ns):
+        raise NotImplementedError
+
+    def _escribir_particion(self, dia, tiempos, columnas):
+        raise NotImplementedError
+
+
+class AlmacenMemmap(_AlmacenParticionado):
+    """Particiones diarias de arreglos .npy (uno por tag) leídos con memoria mapeada."""
+
+    formato = 'npy'
+
+    def _ruta_columna(self, dia, nombre):
+        return os.path.join(self._ruta_dia(dia), f'{nombre}.npy')
+
+    def _archivo_version(self, dia):
+        return self._ruta_columna(dia, COLUMNA_TIEMPO)
+
+    def num_registros(self):
+        total = 0
+        for dia in self.dias():
+            total += np.load(self._ruta_columna(dia, COLUMNA_TIEMPO), mmap_mode='r').shape[0]
+        return total
+
+    def _leer_particion(self, dia, tags, inicio_ns, fin_ns):
+        tiempos = np.load(self._ruta_columna(dia, COLUMNA_TIEMPO), mmap_mode='r')
+        i, j = _limites(tiempos, inicio_ns, fin_ns)
+        columnas = {}
+        for tag in tags:
+            ruta = self._ruta_columna(dia, tag)
+            if os.path.exists(ruta):
+                # Copia sólo la ventana pedida; el resto del archivo no se toca
+                columnas[tag] = np.array(np.load(ruta, mmap_mode='r')[i:j])
+            else:
+                columnas[tag] = np.full(j - i, np.nan)
+        return np.array(tiempos[i:j]), columnas
+
+    # Cada archivo se reemplaza entero; el de tiempos (la versión) va al
+    # final, cuando las columnas ya están en su lugar
+    def _escribir_particion(self, dia, tiempos, columnas):
+        os.makedirs(self._ruta_dia(dia), exist_ok=True)
+        for tag, valores in columnas.items():
+            valores = np.asarray(valores, dtype='float64')
+            _escribir_atomico(self._ruta_columna(dia, tag), lambda f: np.save(f, valores))
+        tiempos = np.asarray(tiempos, dtype='int64')
+        _escribir_atomico(self._ruta_columna(dia, COLUMNA_TIEMPO), lambda f: np.save(f, tiempos))
+
+
+class AlmacenParquet(_AlmacenParticionado):
+    """Un archivo Parquet por día; cada tag es una columna que se lee por separado."""
+
+    formato = 'parquet'
+    FILAS_POR_GRUPO = 3600
+
+    def __init__(self, raiz, tags=None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("AlmacenParquet requiere pyarrow (pip install pyarrow)") from e
+        super().__init__(raiz, tags)
+
+    def _ruta_archivo(self, dia):
+        return os.path.join(self._ruta_dia(dia), 'datos.parquet')
+
+    def _archivo_version(self, dia):
+        return self._ruta_archivo(dia)
+
+    def num_registros(self):
+        import pyarrow.parquet as pq
+        return sum(pq.read_metadata(self._ruta_archivo(d)).num_rows for d in self.dias())
+
+    def _leer_particion(self, dia, tags, inicio_ns, fin_ns):
+        import pyarrow.parquet as pq
+        archivo = pq.ParquetFile(self._ruta_archivo(dia))
+        disponibles = set(archivo.schema_arrow.names)
+        columnas_leer = [COLUMNA_TIEMPO] + [t for t in tags if t in disponibles]
+        # Los grupos de filas están ordenados por tiempo: se descartan por sus
+        # estadísticas sin leerlos
+        grupos = []
+        for g in range(archivo.num_row_groups):
+            stats = archivo.metadata.row_group(g).column(0).statistics
+            if stats is not None and stats.has_min_max:
+                # Margen de 1 µs: las estadísticas pueden venir truncadas a µs
+                if _a_ns(stats.max) + 1000 < inicio_ns or _a_ns(stats.min) - 1000 >= fin_ns:
+                    continue
+            grupos.append(g)
+        tabla = archivo.read_row_groups(grupos, columns=columnas_leer)
+        tiempos = tabla.column(COLUMNA_TIEMPO).to_numpy().astype('datetime64[ns]').view('int64')
+        i, j = _limites(tiempos, inicio_ns, fin_ns)
+        columnas = {}
+        for tag in tags:
+            if tag in disponibles:
+                columnas[tag] = tabla.column(tag).to_numpy()[i:j]
+            else:
+                columnas[tag] = np.full(j - i, np.nan)
+        return tiempos[i:j], columnas
+
+    def _escribir_particion(self, dia, tiempos, columnas):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(self._ruta_dia(dia), exist_ok=True)
+        arreglos = {COLUMNA_TIEMPO: pa.array(np.asarray(tiempos, dtype='int64').view('datetime64[ns]'))}
+        for tag, valores in columnas.items():
+            arreglos[tag] = pa.array(np.asarray(valores, dtype='float64'))
+        tabla = pa.table(arreglos)
+        _escribir_atomico(
+            self._ruta_archivo(dia), lambda f: pq.write_table(tabla, f, row_group_size=self.FILAS_POR_GRUPO)
+        )
+
+
+FORMATOS = {'npy': AlmacenMemmap, 'parquet': AlmacenParquet}
+
+
+# Abre un almacén en disco existente detectando su formato
+def abrir_almacen(raiz, formato=None):
+    ruta_formato = os.path.join(raiz, ARCHIVO_FORMATO)
+    if formato is None:
+        if not os.path.exists(ruta_formato):
+            raise FileNotFoundError(f"No hay un almacén de series en {raiz}")
+        with open(ruta_formato) as f:
+            formato = json.load(f)['formato']
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de almacén desconocido: {formato}")
+    return FORMATOS[formato](raiz)
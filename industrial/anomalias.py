@@ -0,0 +1,269 @@
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Detección de anomalías en línea, complemento de las bandas fijas.
+#
+# Por cada tag se mantiene un estado de tamaño fijo (media y varianza EWMA,
+# sumas CUSUM, último valor) y cada muestra nueva se evalúa y se incorpora en
+# O(1). Las filas se procesan por bloques vectorizados en ambos ejes: las
+# recurrencias EWMA son lineales (productos y sumas acumuladas) y CUSUM es
+# una recurrencia max(0, s + u) con solución cerrada, que sólo se recalcula
+# para los tags que se disparan dentro del bloque. En un núcleo rinde unos
+# 5 M de muestras/s con 500 tags (~8 s para un día entero a 1 Hz, 43 M de
+# muestras; en vivo cada segundo suma 500) y ~1 M/s con 8 tags, donde pesa
+# el costo fijo por bloque (ver benchmarks/anomalias.py).
+# Tres detectores, combinados en una máscara de bits por muestra:
+#   Z       |x - media| > z_limite · desviación (EWMA, antes de actualizar)
+#   CUSUM   suma acumulada bilateral del residuo estandarizado por encima de
+#           `cusum_h`; se reinicia al dispararse
+#   CAMBIO  tasa de cambio por minuto mayor que el `cambio_maximo` del tag;
+#           sin límite configurado, salto mayor que z_limite · desviación
+#           EWMA de las diferencias
+# Ningún detector marca hasta que el tag acumula `minimo` muestras válidas.
+# Igual que los agregados incrementales, `actualizar` sólo procesa las filas
+# posteriores a la última vista, así que el estado sobrevive entre reruns y
+# nunca se recorre de nuevo la historia. Los eventos se guardan por día, sin
+# límite de cantidad; `dias` acota cuántos días (enteros) se retienen.
+
+Z = 1
+CUSUM = 2
+CAMBIO = 4
+
+# Nombre de cada detector (bit de la máscara)
+TIPOS = {
+    Z: 'z-score',
+    CUSUM: 'CUSUM',
+    CAMBIO: 'tasa de cambio',
+}
+
+COLUMNAS = ['Fecha', 'Variable', 'Tipo', 'Valor', 'Puntaje']
+
+# Filas máximas por bloque vectorizado
+FILAS_BLOQUE = 256
+
+
+# Texto de una máscara de bits: "z-score + CUSUM"
+def describir(mascara):
+    return ' + '.join(nombre for bit, nombre in TIPOS.items() if mascara & bit)
+
+
+# Texto de cada máscara posible, indexado por la máscara
+_DESCRIPCIONES = np.array([describir(m) for m in range(Z + CUSUM + CAMBIO + 1)], dtype=object)
+
+
+# y_j = a_j · y_{j-1} + b_j por columnas, con y_{-1} = inicial; devuelve el
+# valor previo y el posterior a cada fila. El bloque debe ser lo bastante
+# corto para que el producto acumulado de `a` no pierda precisión.
+def _recurrencia(inicial, a, b):
+    producto = np.cumprod(a, axis=0)
+    despues = producto * (inicial + np.cumsum(b / producto, axis=0))
+    return np.vstack([inicial[None], despues[:-1]]), despues
+
+
+# s_j = max(0, s_{j-1} + u_j) por columnas, con s_{-1} = inicial
+def _lindley(inicial, u):
+    acumulado = np.cumsum(u, axis=0)
+    return acumulado - np.minimum(-inicial, np.minimum.accumulate(acumulado, axis=0))
+
+
+# Último valor válido antes de cada fila (o `inicial` si no hubo ninguno)
+def _previos(inicial, valores, validos):
+    filas = np.arange(len(valores))[:, None]
+    ultima = np.maximum.accumulate(np.where(validos, filas, -1), axis=0)
+    despues = np.where(ultima >= 0, np.take_along_axis(valores, np.maximum(ultima, 0), axis=0), inicial)
+    return np.vstack([inicial[None], despues[:-1]]), despues
+
+
+class DetectorAnomalias:
+    """EWMA/z-score, CUSUM y tasa de cambio por tag, con estado O(tags)."""
+
+    def __init__(self, tags, alfa=0.05, z_limite=4.0, cusum_k=0.5, cusum_h=8.0,
+                 cambio_maximo=None, minimo=20, dias=None):
+        self.tags = list(tags)
+        self.alfa = alfa
+        self.z_limite = z_limite
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.minimo = minimo
+        # Límite de cambio por minuto de cada tag (NaN = adaptativo)
+        k = len(self.tags)
+        self.cambio_maximo = np.full(k, np.nan) if cambio_maximo is None else np.asarray(cambio_maximo, dtype='float64')
+        self.dias = dias
+        # Día (datetime64[D]) -> eventos del día, en uno o más DataFrames
+        self._eventos = {}
+        # Filas por bloque: (1 - alfa)^filas no baja de 1e-3
+        self._filas_bloque = FILAS_BLOQUE if alfa <= 0 else max(
+            1, min(FILAS_BLOQUE, int(math.log(1e-3) / math.log1p(-min(alfa, 0.999))))
+        )
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            k = len(self.tags)
+            self.ultimo_ns = None
+            self.muestras = 0
+            self._n = np.zeros(k, dtype='int64')
+            self._media = np.zeros(k)
+            self._var = np.zeros(k)
+            self._var_dif = np.zeros(k)
+            self._s_pos = np.zeros(k)
+            self._s_neg = np.zeros(k)
+            self._previo = np.full(k, np.nan)
+            self._t_previo = np.zeros(k, dtype='int64')
+            self._eventos.clear()
+
+    def _desde(self, tiempos):
+        return 0 if self.ultimo_ns is None else int(np.searchsorted(tiempos, self.ultimo_ns, side='right'))
+
+    # Filas de `df` que todavía no pasaron por el detector
+    def pendientes(self, df):
+        tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        with self._lock:
+            return len(tiempos) - self._desde(tiempos)
+
+    # Procesa las filas de `df` (Fecha + tags) posteriores a la última vista,
+    # a lo sumo `max_filas`; devuelve los eventos nuevos
+    def actualizar(self, df, max_filas=None):
+        tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        with self._lock:
+            desde = self._desde(tiempos)
+            if desde >= len(tiempos):
+                return pd.DataFrame(columns=COLUMNAS)
+            hasta = len(tiempos) if max_filas is None else min(len(tiempos), desde + max_filas)
+            tiempos = tiempos[desde:hasta]
+            valores = df.iloc[desde:hasta].reindex(columns=self.tags).to_numpy(dtype='float64')
+            marcas, puntajes = self.procesar(tiempos, valores)
+            self.ultimo_ns = int(tiempos[-1])
+            filas, columnas = np.nonzero(marcas)
+            eventos = pd.DataFrame({
+                'Fecha': pd.to_datetime(tiempos[filas]),
+                'Variable': np.asarray(self.tags, dtype=object)[columnas],
+                'Tipo': _DESCRIPCIONES[marcas[filas, columnas]],
+                'Valor': valores[filas, columnas],
+                'Puntaje': puntajes[filas, columnas],
+            }, columns=COLUMNAS)
+            self._guardar(eventos)
+            return eventos
+
+    def _guardar(self, eventos):
+        if eventos.empty:
+            return
+        dias = eventos['Fecha'].to_numpy().astype('datetime64[D]')
+        for dia in np.unique(dias):
+            self._eventos.setdefault(dia, []).append(eventos[dias == dia])
+        if self.dias is not None:
+            for dia in sorted(self._eventos)[:-self.dias]:
+                del self._eventos[dia]
+
+    # Núcleo del detector: evalúa las filas (muestras × tags) en orden y
+    # devuelve la máscara de detectores (uint8) y el residuo estandarizado
+    def procesar(self, tiempos, valores):
+        m, k = valores.shape
+        marcas = np.zeros((m, k), dtype=np.uint8)
+        puntajes = np.full((m, k), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            for desde in range(0, m, self._filas_bloque):
+                hasta = min(m, desde + self._filas_bloque)
+                marcas[desde:hasta], puntajes[desde:hasta] = self._bloque(tiempos[desde:hasta], valores[desde:hasta])
+        self.muestras += m
+        return marcas, puntajes
+
+    # Un bloque de filas: cada muestra se evalúa con el estado previo a ella
+    # y luego se incorpora, igual que si se recorrieran de a una
+    def _bloque(self, tiempos, x):
+        alfa, z_limite, k_cusum, h = self.alfa, self.z_limite, self.cusum_k, self.cusum_h
+        validos = ~np.isnan(x)
+        n_previo = self._n + np.cumsum(validos, axis=0) - validos
+        listos = validos & (n_previo >= self.minimo)
+        # La primera muestra válida de un tag fija su media
+        nuevos = (self._n == 0) & validos.any(axis=0)
+        self._media[nuevos] = x[validos.argmax(axis=0)[nuevos], nuevos]
+        media, despues = _recurrencia(
+            self._media, np.where(validos, 1 - alfa, 1.0), np.where(validos, alfa * x, 0.0)
+        )
+        self._media[:] = despues[-1]
+        delta = np.where(validos, x - media, 0.0)
+        actualiza = validos & (n_previo > 0)
+        var, despues = _recurrencia(
+            self._var, np.where(actualiza, 1 - alfa, 1.0), np.where(actualiza, (1 - alfa) * alfa * delta * delta, 0.0)
+        )
+        self._var[:] = despues[-1]
+        desv = np.sqrt(var)
+        r = np.where(listos & (desv > 0), delta / desv, 0.0)
+        marcas = np.where(np.abs(r) > z_limite, Z, 0).astype(np.uint8)
+        marcas |= np.where(self._cusum(np.where(listos, r, 0.0), listos), CUSUM, 0).astype(np.uint8)
+        # Tasa de cambio contra la última muestra válida del tag
+        previo, despues = _previos(self._previo, x, validos)
+        self._previo[:] = despues[-1]
+        t_previo, despues = _previos(self._t_previo, np.broadcast_to(tiempos[:, None], x.shape), validos)
+        self._t_previo[:] = despues[-1]
+        diferencia = x - previo
+        con_previo = validos & ~np.isnan(previo)
+        var_dif, despues = _recurrencia(
+            self._var_dif, np.where(con_previo, 1 - alfa, 1.0),
+            np.where(con_previo, alfa * diferencia * diferencia, 0.0)
+        )
+        self._var_dif[:] = despues[-1]
+        minutos = (tiempos[:, None] - t_previo) / 60e9
+        con_limite = ~np.isnan(self.cambio_maximo)
+        salto = np.where(
+            con_limite,
+            np.abs(diferencia) / minutos > np.where(con_limite, self.cambio_maximo, 0.0),
+            np.abs(diferencia) > z_limite * np.sqrt(var_dif)
+        )
+        marcas |= np.where(listos & con_previo & salto, CAMBIO, 0).astype(np.uint8)
+        self._n += validos.sum(axis=0)
+        return marcas, np.where(listos, r, np.nan)
+
+    # CUSUM bilateral de los residuos `r`: filas donde se dispara cada tag.
+    # Tras un disparo ambas sumas vuelven a cero, así que sólo los tags que
+    # se dispararon se recalculan desde la fila siguiente.
+    def _cusum(self, r, listos):
+        m = len(r)
+        filas = np.arange(m)[:, None]
+        disparos = np.zeros(r.shape, dtype=bool)
+        u_pos = np.where(listos, r - self.cusum_k, 0.0)
+        u_neg = np.where(listos, -r - self.cusum_k, 0.0)
+        activos = np.arange(r.shape[1])
+        inicio_pos, inicio_neg = self._s_pos[activos], self._s_neg[activos]
+        while activos.size:
+            s_pos = _lindley(inicio_pos, u_pos)
+            s_neg = _lindley(inicio_neg, u_neg)
+            disparo = (s_pos > self.cusum_h) | (s_neg > self.cusum_h)
+            hay = disparo.any(axis=0)
+            self._s_pos[activos[~hay]] = s_pos[-1, ~hay]
+            self._s_neg[activos[~hay]] = s_neg[-1, ~hay]
+            fila = disparo[:, hay].argmax(axis=0)
+            activos = activos[hay]
+            disparos[fila, activos] = True
+            # Desde la fila del disparo las sumas parten de cero
+            antes = filas <= fila
+            u_pos = np.where(antes, 0.0, u_pos[:, hay])
+            u_neg = np.where(antes, 0.0, u_neg[:, hay])
+            inicio_pos = inicio_neg = np.zeros(len(activos))
+        return disparos
+
+    # Memoria: estado por tag más los DataFrames de eventos retenidos
+    @property
+    def nbytes(self):
+        with self._lock:
+            estado = (self._n, self._media, self._var, self._var_dif, self._s_pos, self._s_neg,
+                      self._previo, self._t_previo)
+            eventos = sum(p.memory_usage().sum() for partes in self._eventos.values() for p in partes)
+            return sum(a.nbytes for a in estado) + eventos
+
+    # Eventos retenidos de todos los días, en orden
+    def eventos(self, desde=None):
+        with self._lock:
+            for dia, partes in self._eventos.items():
+                if len(partes) > 1:
+                    self._eventos[dia] = [pd.concat(partes, ignore_index=True)]
+            partes = [p for dia in sorted(self._eventos) for p in self._eventos[dia]]
+        eventos = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS)
+        if desde is not None:
+            eventos = eventos[eventos['Fecha'] >= pd.Timestamp(desde)].reset_index(drop=True)
+        return eventos
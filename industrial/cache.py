@@ -0,0 +1,193 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Caché compartida entre sesiones.
+#
+# Un único objeto por proceso (vía st.cache_resource) que guarda resultados
+# de sólo lectura. Cada entrada tiene TTL propio y, opcionalmente, el rango
+# de tiempo y los tags de los que depende, para poder invalidar sólo lo
+# afectado. Al superar el presupuesto de memoria se desalojan las entradas
+# menos usadas recientemente (LRU).
+#
+# Los valores no se copian al leerlos: los arreglos NumPy se marcan como no
+# escribibles y los DataFrames se entregan como vistas superficiales, que
+# sólo son seguras con copy-on-write (siempre activo desde pandas 3, opcional
+# en 2.x); sin él, cada lectura de un DataFrame o Series es una copia.
+
+
+class _Entrada:
+    __slots__ = ('valor', 'bytes', 'expira', 'rango', 'tags')
+
+    def __init__(self, valor, bytes_, expira, rango, tags):
+        self.valor = valor
+        self.bytes = bytes_
+        self.expira = expira
+        self.rango = rango
+        self.tags = tags
+
+
+# Tamaño aproximado en memoria de un valor cacheado
+def tamano_bytes(valor):
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=False).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=False))
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamano_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamano_bytes(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+def _solo_lectura(valor):
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, (list, tuple)):
+        for v in valor:
+            _solo_lectura(v)
+    elif isinstance(valor, dict):
+        for v in valor.values():
+            _solo_lectura(v)
+    return valor
+
+
+def _copy_on_write():
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+
+def _vista(valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=not _copy_on_write())
+    return valor
+
+
+def _a_ns(momento):
+    return pd.Timestamp(momento).value
+
+
+class CacheCompartida:
+    """Caché LRU con TTL por entrada, presupuesto de memoria e invalidación dirigida."""
+
+    def __init__(self, presupuesto_bytes=256 * 2**20, ttl=300.0):
+        self.presupuesto_bytes = presupuesto_bytes
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.bytes_usados = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.RLock()
+        # Un lock por clave evita que varias sesiones calculen lo mismo a la vez
+        self._calculando = {}
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            return entrada is not None and entrada.expira > time.monotonic()
+
+    @property
+    def tasa_aciertos(self):
+        total = self.aciertos + self.fallos
+        return self.aciertos / total if total else 0.0
+
+    def obtener(self, clave, calcular, ttl=None, rango=None, tags=None):
+        """Devuelve el valor de `clave`, calculándolo con `calcular()` si falta.
+
+        `rango` (inicio, fin) y `tags` declaran de qué datos depende la entrada
+        para que `invalidar` pueda descartarla de forma selectiva.
+        """
+        valor = self._buscar(clave)
+        if valor is not None:
+            return valor
+        with self._lock:
+            lock_clave = self._calculando.setdefault(clave, threading.Lock())
+        try:
+            with lock_clave:
+                # Otra sesión pudo haberlo calculado mientras se esperaba
+                valor = self._buscar(clave, contar_fallo=False)
+                if valor is not None:
+                    return valor
+                valor = calcular()
+                self.guardar(clave, valor, ttl=ttl, rango=rango, tags=tags)
+        finally:
+            # También si `calcular` falló: la próxima lectura vuelve a intentarlo
+            with self._lock:
+                self._calculando.pop(clave, None)
+        return _vista(valor)
+
+    def _buscar(self, clave, contar_fallo=True):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.expira <= time.monotonic():
+                self._quitar(clave)
+                entrada = None
+            if entrada is None:
+                if contar_fallo:
+                    self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return _vista(entrada.valor)
+
+    def guardar(self, clave, valor, ttl=None, rango=None, tags=None):
+        bytes_ = tamano_bytes(valor)
+        if bytes_ > self.presupuesto_bytes:
+            return  # no cabe: se entrega sin cachear
+        if rango is not None:
+            rango = (_a_ns(rango[0]), _a_ns(rango[1]))
+        tags = frozenset(tags) if tags is not None else None
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = _Entrada(_solo_lectura(valor), bytes_, expira, rango, tags)
+            self.bytes_usados += bytes_
+            while self.bytes_usados > self.presupuesto_bytes:
+                self._quitar(next(iter(self._entradas)))
+                self.desalojos += 1
+
+    def _quitar(self, clave):
+        entrada = self._entradas.pop(clave)
+        self.bytes_usados -= entrada.bytes
+
+    def invalidar(self, rango=None, tags=None):
+        """Descarta las entradas que dependen del rango de tiempo y/o tags dados.
+
+        Una entrada sin rango (o sin tags) declarados se considera dependiente
+        de todo el tiempo (o de todos los tags). Sin argumentos vacía la caché.
+        Devuelve cuántas entradas se descartaron.
+        """
+        if rango is not None:
+            rango = (_a_ns(rango[0]), _a_ns(rango[1]))
+        tags = frozenset(tags) if tags is not None else None
+        with self._lock:
+            afectadas = [
+                clave for clave, e in self._entradas.items()
+                if (rango is None or e.rango is None or (e.rango[0] < rango[1] and rango[0] < e.rango[1]))
+                and (tags is None or e.tags is None or not e.tags.isdisjoint(tags))
+            ]
+            for clave in afectadas:
+                self._quitar(clave)
+            return len(afectadas)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self.bytes_usados,
+                'presupuesto_bytes': self.presupuesto_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.tasa_aciertos,
+            }
@@ -0,0 +1,161 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+from industrial.estadisticas import UNA_HORA_NS
+
+# Correlación a partir de estadísticos suficientes.
+#
+# Por cada cubeta de tiempo se guardan, para todos los pares de tags, el
+# número de muestras válidas en ambos (N), las sumas (A), las sumas de
+# cuadrados (Q) y las sumas de productos cruzados (P). Todo se obtiene con
+# productos matriciales y es aditivo: la matriz de un día, de una ventana
+# móvil o de un rango cualquiera es la suma de sus cubetas, y los datos
+# nuevos sólo suman sus propias cubetas. Se ignoran los NaN por pares, como
+# DataFrame.corr().
+
+
+def _sumas(valores, desplazamiento):
+    validos = ~np.isnan(valores)
+    x = np.where(validos, valores - desplazamiento, 0.0)
+    m = validos.astype('float64')
+    return np.stack([m.T @ m, x.T @ m, (x * x).T @ m, x.T @ x])
+
+
+# Coeficientes de Pearson desde sumas (N, A, Q, P) de forma (..., 4, k, k)
+def _pearson(sumas):
+    n, a, q, p = (sumas[..., i, :, :] for i in range(4))
+    a_t = np.swapaxes(a, -1, -2)
+    q_t = np.swapaxes(q, -1, -2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = n * p - a * a_t
+        var_i = n * q - a * a
+        var_j = n * q_t - a_t * a_t
+        r = cov / np.sqrt(var_i * var_j)
+    r = np.where((n > 1) & (var_i > 0) & (var_j > 0), r, np.nan)
+    return np.clip(r, -1.0, 1.0)
+
+
+class CorrelacionIncremental:
+    """Matriz de correlación de un conjunto de tags, actualizable por lotes.
+
+    Igual que EstadisticasIncrementales, supone datos en orden temporal y en
+    cada actualización sólo procesa las filas posteriores a la última vista.
+    Las sumas se guardan como una lista de arreglos (4, k, k) por cubeta que
+    nunca se modifican en sitio: continuar la última cubeta la reemplaza, y
+    `instantanea` sólo copia la lista.
+    """
+
+    def __init__(self, tags, cubeta_ns=UNA_HORA_NS):
+        self.tags = list(tags)
+        self.cubeta_ns = cubeta_ns
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.ultimo_ns = None
+            self._desplazamiento = None
+            self._inicios = np.empty(0, dtype='int64')
+            self._sumas = []
+
+    def actualizar(self, df):
+        tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        with self._lock:
+            desde = 0 if self.ultimo_ns is None else int(np.searchsorted(tiempos, self.ultimo_ns, side='right'))
+            if desde >= len(tiempos):
+                return 0
+            tiempos = tiempos[desde:]
+            valores = df[self.tags].to_numpy(dtype='float64')[desde:]
+            # Centrar en un valor de referencia fijo evita la cancelación
+            # numérica de sumas de cuadrados grandes
+            if self._desplazamiento is None:
+                with np.errstate(invalid='ignore'):
+                    self._desplazamiento = np.nan_to_num(np.nanmean(valores, axis=0))
+            inicios = tiempos - tiempos % self.cubeta_ns
+            claves, cortes = np.unique(inicios, return_index=True)
+            cortes = np.append(cortes, len(tiempos))
+            nuevas = [
+                _sumas(valores[cortes[b]:cortes[b + 1]], self._desplazamiento)
+                for b in range(len(claves))
+            ]
+            n = len(self._inicios)
+            if n and claves[0] == self._inicios[-1]:
+                nuevas[0] = nuevas[0] + self._sumas[-1]
+                n -= 1
+            self._inicios = np.concatenate([self._inicios[:n], claves])
+            self._sumas = self._sumas[:n] + nuevas
+            self.ultimo_ns = int(tiempos[-1])
+            return len(tiempos)
+
+    # Matriz de correlación de las cubetas que empiezan en [inicio, fin)
+    def matriz(self, inicio=None, fin=None):
+        with self._lock:
+            i = 0 if inicio is None else int(np.searchsorted(self._inicios, pd.Timestamp(inicio).value))
+            j = len(self._inicios) if fin is None else int(np.searchsorted(self._inicios, pd.Timestamp(fin).value))
+            seleccion = self._sumas[i:j]
+        k = len(self.tags)
+        total = np.zeros((4, k, k))
+        for sumas in seleccion:
+            total += sumas
+        return pd.DataFrame(_pearson(total), index=self.tags, columns=self.tags)
+
+    # Copia de sólo lectura del estado actual (comparte las sumas por cubeta)
+    def instantanea(self):
+        with self._lock:
+            copia = copy.copy(self)
+        copia._lock = threading.Lock()
+        return copia
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._inicios.nbytes + sum(s.nbytes for s in self._sumas)
+
+    # Correlación móvil entre dos tags: una ventana de `ventana` cubetas que
+    # termina en cada cubeta (sumas acumuladas, sin recorrer los datos)
+    def serie_movil(self, tag_x, tag_y, ventana):
+        ix, iy = self.tags.index(tag_x), self.tags.index(tag_y)
+        with self._lock:
+            inicios = self._inicios.copy()
+            seleccion = self._sumas
+        par = np.array([s[:, [ix, iy]][:, :, [ix, iy]] for s in seleccion]).reshape(-1, 4, 2, 2)
+        acumuladas = np.concatenate([np.zeros((1,) + par.shape[1:]), np.cumsum(par, axis=0)])
+        desde = np.maximum(np.arange(1, len(inicios) + 1) - ventana, 0)
+        en_ventana = acumuladas[1:] - acumuladas[desde]
+        r = _pearson(en_ventana)[:, 0, 1]
+        return pd.DataFrame({
+            'Fecha': pd.to_datetime(inicios + self.cubeta_ns),
+            'Correlacion': r
+        })
+
+
+# Pares con |r| > umbral del triángulo superior, ordenados por |r|
+def pares_significativos(matriz, umbral=0.5):
+    valores = matriz.to_numpy()
+    i, j = np.triu_indices(len(valores), k=1)
+    r = valores[i, j]
+    fuertes = np.abs(r) > umbral
+    i, j, r = i[fuertes], j[fuertes], r[fuertes]
+    orden = np.argsort(-np.abs(r), kind='stable')
+    tags = np.asarray(matriz.columns, dtype=object)
+    return pd.DataFrame({
+        'Variable 1': tags[i[orden]],
+        'Variable 2': tags[j[orden]],
+        'Correlación': r[orden],
+    })
+
+
+# Matriz en formato largo para el heatmap, sin bucles
+def formato_largo(matriz, etiquetas=None):
+    k = len(matriz)
+    etiquetas = np.asarray(etiquetas if etiquetas is not None else matriz.columns, dtype=object)
+    return pd.DataFrame({
+        'Variable_X': np.repeat(etiquetas, k),
+        'Variable_Y': np.tile(etiquetas, k),
+        'Correlacion': matriz.to_numpy().ravel(),
+        'X_pos': np.repeat(np.arange(k), k),
+        'Y_pos': np.tile(np.arange(k), k),
+    })
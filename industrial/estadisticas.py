@@ -0,0 +1,260 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Estadísticas incrementales por tag y por cubeta de tiempo.
+#
+# Cada cubeta guarda conteo, suma, media, M2 (Welford), mínimo y máximo por
+# tag. Son combinables, así que un resumen de turno o de día es la reducción
+# de sus cubetas horarias, y las muestras nuevas sólo actualizan las cubetas
+# que tocan: el costo es O(muestras nuevas), nunca un nuevo recorrido del día.
+
+UNA_HORA_NS = 3600 * 10**9
+
+# Turnos del día (hora de inicio, hora de fin)
+TURNOS = {
+    'Turno 1 (00-08)': (0, 8),
+    'Turno 2 (08-16)': (8, 16),
+    'Turno 3 (16-24)': (16, 24),
+}
+
+
+class Agregados:
+    """Estadísticas combinables; cada atributo es un arreglo (..., n_tags)."""
+
+    __slots__ = ('conteo', 'suma', 'media', 'm2', 'minimo', 'maximo')
+
+    def __init__(self, conteo, suma, media, m2, minimo, maximo):
+        self.conteo = conteo
+        self.suma = suma
+        self.media = media
+        self.m2 = m2
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @classmethod
+    def vacio(cls, forma):
+        return cls(
+            np.zeros(forma, dtype='int64'), np.zeros(forma), np.zeros(forma), np.zeros(forma),
+            np.full(forma, np.inf), np.full(forma, -np.inf)
+        )
+
+    # Estadísticas de bloques contiguos de filas: `cortes` son los índices de
+    # inicio de cada bloque (como en np.add.reduceat). Ignora NaN.
+    @classmethod
+    def desde_bloques(cls, valores, cortes):
+        valores = np.asarray(valores, dtype='float64')
+        validos = ~np.isnan(valores)
+        ceros = np.where(validos, valores, 0.0)
+        conteo = np.add.reduceat(validos, cortes, axis=0).astype('int64')
+        suma = np.add.reduceat(ceros, cortes, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.where(conteo > 0, suma / conteo, 0.0)
+        # Desviaciones respecto a la media de su propio bloque (estable)
+        tamanos = np.diff(np.append(cortes, len(valores)))
+        desvio = np.where(validos, valores - np.repeat(media, tamanos, axis=0), 0.0)
+        m2 = np.add.reduceat(desvio * desvio, cortes, axis=0)
+        minimo = np.minimum.reduceat(np.where(validos, valores, np.inf), cortes, axis=0)
+        maximo = np.maximum.reduceat(np.where(validos, valores, -np.inf), cortes, axis=0)
+        return cls(conteo, suma, media, m2, minimo, maximo)
+
+    @classmethod
+    def desde_matriz(cls, valores):
+        valores = np.asarray(valores, dtype='float64')
+        if not len(valores):
+            return cls.vacio(valores.shape[1:])
+        agregado = cls.desde_bloques(valores, np.array([0]))
+        return agregado[0]
+
+    def __getitem__(self, indice):
+        return Agregados(*(getattr(self, a)[indice] for a in self.__slots__))
+
+    # Une por filas varios conjuntos de agregados (en arreglos nuevos)
+    @classmethod
+    def concatenar(cls, *partes):
+        return cls(*(np.concatenate([getattr(p, a) for p in partes]) for a in cls.__slots__))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, a).nbytes for a in self.__slots__)
+
+    # Fórmula de Chan para unir dos conjuntos de estadísticas
+    def combinar(self, otro):
+        n = self.conteo + otro.conteo
+        delta = otro.media - self.media
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peso = np.where(n > 0, otro.conteo / np.maximum(n, 1), 0.0)
+        return Agregados(
+            n,
+            self.suma + otro.suma,
+            self.media + delta * peso,
+            self.m2 + otro.m2 + delta * delta * self.conteo * peso,
+            np.minimum(self.minimo, otro.minimo),
+            np.maximum(self.maximo, otro.maximo)
+        )
+
+    # Une todas las filas del eje indicado (p. ej. todas las cubetas); sin
+    # filas da los agregados vacíos
+    def reducir(self, eje=0):
+        n = self.conteo.sum(axis=eje)
+        suma = self.suma.sum(axis=eje)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.where(n > 0, suma / np.maximum(n, 1), 0.0)
+        desvio = self.media - np.expand_dims(media, eje)
+        m2 = self.m2.sum(axis=eje) + (self.conteo * desvio * desvio).sum(axis=eje)
+        return Agregados(
+            n, suma, media, m2, self.minimo.min(axis=eje, initial=np.inf), self.maximo.max(axis=eje, initial=-np.inf)
+        )
+
+    @property
+    def promedio(self):
+        return np.where(self.conteo > 0, self.media, np.nan)
+
+    @property
+    def varianza(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.conteo > 1, self.m2 / (self.conteo - 1), np.nan)
+
+    @property
+    def desviacion(self):
+        return np.sqrt(self.varianza)
+
+    def tabla(self, tags):
+        vacio = self.conteo == 0
+        return pd.DataFrame({
+            'Variable': list(tags),
+            'Promedio': self.promedio,
+            'Máximo': np.where(vacio, np.nan, self.maximo),
+            'Mínimo': np.where(vacio, np.nan, self.minimo),
+            'Desv. Est.': self.desviacion,
+            'Muestras': self.conteo,
+        })
+
+
+class EstadisticasIncrementales:
+    """Agregados por cubeta de tiempo (por defecto, una hora) de un conjunto de tags.
+
+    Supone datos en orden temporal: `actualizar` sólo procesa las filas
+    posteriores a la última muestra ya agregada. Los arreglos nunca se
+    modifican en sitio (se reemplazan), así que `instantanea` es barata.
+    """
+
+    def __init__(self, tags, cubeta_ns=UNA_HORA_NS):
+        self.tags = list(tags)
+        self.cubeta_ns = cubeta_ns
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    # Descarta lo agregado (p. ej. si se reescribieron datos ya procesados)
+    def reiniciar(self):
+        with self._lock:
+            self.ultimo_ns = None
+            self._inicios = np.empty(0, dtype='int64')
+            self._cubetas = Agregados.vacio((0, len(self.tags)))
+
+    def actualizar(self, df):
+        tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        with self._lock:
+            desde = 0 if self.ultimo_ns is None else int(np.searchsorted(tiempos, self.ultimo_ns, side='right'))
+            if desde >= len(tiempos):
+                return 0
+            tiempos = tiempos[desde:]
+            valores = df[self.tags].to_numpy(dtype='float64')[desde:]
+            inicios = tiempos - tiempos % self.cubeta_ns
+            claves, cortes = np.unique(inicios, return_index=True)
+            nuevos = Agregados.desde_bloques(valores, cortes)
+            previos, cubetas = self._inicios, self._cubetas
+            # La primera cubeta nueva puede continuar la última existente,
+            # que se reemplaza por la combinación de ambas
+            if len(previos) and claves[0] == previos[-1]:
+                nuevos = Agregados.concatenar(cubetas[-1:].combinar(nuevos[:1]), nuevos[1:])
+                previos, cubetas = previos[:-1], cubetas[:-1]
+            self._inicios = np.concatenate([previos, claves])
+            self._cubetas = Agregados.concatenar(cubetas, nuevos)
+            self.ultimo_ns = int(tiempos[-1])
+            return len(tiempos)
+
+    # Vuelve a agregar el rango [inicio, fin) con las filas de `df` en él,
+    # reemplazando sus cubetas (p. ej. un día ya procesado que se reescribió).
+    # Los límites deben caer en bordes de cubeta.
+    def reemplazar(self, df, inicio, fin):
+        tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        desde, hasta = np.searchsorted(tiempos, [pd.Timestamp(inicio).value, pd.Timestamp(fin).value])
+        tiempos = tiempos[desde:hasta]
+        if len(tiempos):
+            inicios = tiempos - tiempos % self.cubeta_ns
+            claves, cortes = np.unique(inicios, return_index=True)
+            nuevos = Agregados.desde_bloques(df[self.tags].to_numpy(dtype='float64')[desde:hasta], cortes)
+        else:
+            claves, nuevos = np.empty(0, dtype='int64'), Agregados.vacio((0, len(self.tags)))
+        with self._lock:
+            i, j = self._indices(inicio, fin)
+            self._inicios = np.concatenate([self._inicios[:i], claves, self._inicios[j:]])
+            self._cubetas = Agregados.concatenar(self._cubetas[:i], nuevos, self._cubetas[j:])
+            if len(tiempos) and (self.ultimo_ns is None or tiempos[-1] > self.ultimo_ns):
+                self.ultimo_ns = int(tiempos[-1])
+
+    # Agregados combinados de las cubetas que empiezan en [inicio, fin)
+    def resumen(self, inicio=None, fin=None):
+        with self._lock:
+            i, j = self._indices(inicio, fin)
+            return self._cubetas[i:j].reducir(eje=0)
+
+    # Cubetas que empiezan en [inicio, fin): (inicios en ns, Agregados (n, k))
+    def cubetas(self, inicio=None, fin=None):
+        with self._lock:
+            i, j = self._indices(inicio, fin)
+            seleccion = self._cubetas[i:j]
+            return self._inicios[i:j].copy(), Agregados(*(
+                getattr(seleccion, a).copy() for a in Agregados.__slots__
+            ))
+
+    # Descarta las cubetas que empiezan antes de `limite` (retención)
+    def podar(self, limite):
+        with self._lock:
+            i, _ = self._indices(limite, None)
+            if i:
+                self._inicios = self._inicios[i:]
+                self._cubetas = self._cubetas[i:]
+
+    # Copia de sólo lectura del estado actual; comparte los arreglos, que
+    # las actualizaciones posteriores reemplazan sin tocar
+    def instantanea(self):
+        with self._lock:
+            copia = copy.copy(self)
+        copia._lock = threading.Lock()
+        return copia
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._inicios.nbytes + self._cubetas.nbytes
+
+    def _indices(self, inicio, fin):
+        i = 0 if inicio is None else int(np.searchsorted(self._inicios, pd.Timestamp(inicio).value))
+        j = len(self._inicios) if fin is None else int(np.searchsorted(self._inicios, pd.Timestamp(fin).value))
+        return i, j
+
+    # Resumen de un turno del día `dia` (ver TURNOS)
+    def resumen_turno(self, dia, turno):
+        hora_inicio, hora_fin = TURNOS[turno]
+        base = pd.Timestamp(dia)
+        return self.resumen(base + pd.Timedelta(hours=hora_inicio), base + pd.Timedelta(hours=hora_fin))
+
+    # Tabla larga por cubeta: Cubeta, Variable y estadísticas
+    def por_cubeta(self):
+        with self._lock:
+            inicios = self._inicios.copy()
+            cubetas = self._cubetas
+        n_tags = len(self.tags)
+        return pd.DataFrame({
+            'Cubeta': pd.to_datetime(np.repeat(inicios, n_tags)),
+            'Variable': np.tile(np.asarray(self.tags, dtype=object), len(inicios)),
+            'Promedio': cubetas.promedio.ravel(),
+            'Máximo': cubetas.maximo.ravel(),
+            'Mínimo': cubetas.minimo.ravel(),
+            'Desv. Est.': cubetas.desviacion.ravel(),
+            'Muestras': cubetas.conteo.ravel(),
+        })
@@ -0,0 +1,114 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from industrial.registro import cargar_registro
+
+# Motor vectorizado de estados y alarmas.
+#
+# Las bandas de cada variable se compilan una sola vez en una tabla NumPy
+# (una fila por tag) y se clasifican todas las muestras de todos los tags en
+# una sola pasada, obteniendo una matriz int8 de estados. Las bandas salen
+# del registro de tags (tags.toml); fuera de 'bueno' y 'advertencia' la
+# variable está en estado crítico. Sin `registro` se usa el del proceso
+# (cargar_registro); el dashboard pasa el suyo, ampliado con los tags del
+# almacén.
+
+DESCONOCIDO = -1
+BUENO = 0
+ADVERTENCIA = 1
+CRITICO = 2
+
+# Etiqueta y clase CSS de cada código de estado
+ESTADOS = {
+    BUENO: ('Bueno', 'status-good'),
+    ADVERTENCIA: ('Advertencia', 'status-warning'),
+    CRITICO: ('Crítico', 'status-critical'),
+    DESCONOCIDO: ('Desconocido', 'status-warning'),
+}
+
+
+class TablaUmbrales:
+    """Bandas compiladas: columnas bueno_min, bueno_max, adv_min, adv_max."""
+
+    def __init__(self, tags, bandas, con_umbral):
+        self.tags = tags
+        self.bandas = bandas
+        self.con_umbral = con_umbral
+
+    # Tabla de un subconjunto contiguo de columnas
+    def __getitem__(self, columnas):
+        return TablaUmbrales(self.tags[columnas], self.bandas[columnas], self.con_umbral[columnas])
+
+
+# Compila las bandas de los tags indicados (en ese orden de columnas)
+@lru_cache(maxsize=32)
+def compilar_umbrales(tags, registro=None):
+    bandas = (registro or cargar_registro()).bandas_de(tags)
+    return TablaUmbrales(tags, bandas, ~np.isnan(bandas).any(axis=1))
+
+
+def tabla_umbrales(tags, registro=None):
+    return compilar_umbrales(tuple(tags), registro)
+
+
+# Clasifica una matriz (muestras × tags) y devuelve la matriz int8 de estados
+def clasificar(valores, tabla):
+    valores = np.asarray(valores, dtype='float64')
+    if valores.ndim == 1:
+        valores = valores[np.newaxis, :]
+    b = tabla.bandas
+    bueno = (valores >= b[:, 0]) & (valores <= b[:, 1])
+    advertencia = (valores >= b[:, 2]) & (valores <= b[:, 3])
+    desconocido = np.isnan(valores) | ~tabla.con_umbral
+    return np.select(
+        [desconocido, bueno, advertencia],
+        [DESCONOCIDO, BUENO, ADVERTENCIA],
+        default=CRITICO
+    ).astype(np.int8)
+
+
+# Versión escalar, para consultas puntuales de un solo valor
+def obtener_estado(valor, variable, registro=None):
+    estado = clasificar([[valor]], tabla_umbrales([variable], registro))[0, 0]
+    return ESTADOS[int(estado)]
+
+
+# Codifica por tramos (run-length) la matriz de estados: una fila por cada
+# intervalo continuo en el que un tag permanece en el mismo estado.
+# Fin es el instante de la primera muestra del tramo siguiente (o la última
+# muestra del día si el tramo sigue abierto).
+def intervalos_estado(tiempos, estados, tags):
+    tiempos = np.asarray(tiempos, dtype='datetime64[ns]')
+    n, m = estados.shape
+    columnas = ['Variable', 'Estado', 'Inicio', 'Fin', 'Duración', 'Muestras']
+    if n == 0 or m == 0:
+        return pd.DataFrame(columns=columnas)
+    # Cambios de estado recorriendo cada tag (columna) de forma contigua
+    por_tag = np.ascontiguousarray(estados.T)
+    cambio = np.ones((m, n), dtype=bool)
+    cambio[:, 1:] = por_tag[:, 1:] != por_tag[:, :-1]
+    tag_idx, inicio_idx = np.nonzero(cambio)
+    # El tramo termina donde empieza el siguiente del mismo tag
+    fin_idx = np.empty_like(inicio_idx)
+    fin_idx[:-1] = inicio_idx[1:]
+    ultimo_del_tag = np.ones(len(tag_idx), dtype=bool)
+    ultimo_del_tag[:-1] = tag_idx[1:] != tag_idx[:-1]
+    fin_idx[ultimo_del_tag] = n
+    inicio_t = tiempos[inicio_idx]
+    fin_t = np.where(fin_idx < n, tiempos[np.minimum(fin_idx, n - 1)], tiempos[n - 1])
+    return pd.DataFrame({
+        'Variable': np.asarray(tags, dtype=object)[tag_idx],
+        'Estado': por_tag[tag_idx, inicio_idx],
+        'Inicio': inicio_t,
+        'Fin': fin_t,
+        'Duración': fin_t - inicio_t,
+        'Muestras': fin_idx - inicio_idx,
+    }, columns=columnas)
+
+
+# Sólo los intervalos en advertencia o crítico
+def intervalos_alarma(tiempos, estados, tags):
+    intervalos = intervalos_estado(tiempos, estados, tags)
+    return intervalos[intervalos['Estado'] >= ADVERTENCIA].reset_index(drop=True)
@@ -0,0 +1,359 @@
+import argparse
+import gzip
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from industrial.almacenamiento import COLUMNA_TIEMPO, UN_DIA
+from industrial.estadisticas import Agregados
+from industrial.estados import ESTADOS, clasificar, intervalos_alarma, tabla_umbrales
+
+# Exportación de reportes por bloques.
+#
+# Las series se leen del almacén por ventanas de tiempo (una partición diaria
+# a lo sumo, por defecto una hora) y cada bloque se escribe de inmediato en
+# el archivo de salida: Parquet con un grupo de filas por bloque, CSV o CSV
+# gzip por anexado. La memoria depende del tamaño de la ventana y de los
+# tags, nunca de la cantidad de días exportados.
+#
+# Las estadísticas se acumulan por día con Agregados combinables y las
+# alarmas se extraen por día de la matriz int8 de estados (un byte por
+# muestra y tag), igual que el historial del dashboard. Los trabajos corren
+# en un pool de hilos de fondo y publican su progreso; el script sólo lo lee.
+
+DATOS = 'datos'
+ESTADISTICAS = 'estadisticas'
+ALARMAS = 'alarmas'
+
+# Etiqueta de cada contenido exportable
+CONTENIDOS = {
+    DATOS: 'Series (muestras)',
+    ESTADISTICAS: 'Estadísticas por día',
+    ALARMAS: 'Intervalos de alarma',
+}
+
+PARQUET = 'parquet'
+CSV = 'csv'
+CSV_GZ = 'csv.gz'
+
+# Etiqueta, extensión y tipo MIME de cada formato
+FORMATOS = {
+    PARQUET: ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+    CSV: ('CSV', '.csv', 'text/csv'),
+    CSV_GZ: ('CSV comprimido (gzip)', '.csv.gz', 'application/gzip'),
+}
+
+VENTANA = pd.Timedelta(hours=1)
+
+# Estados de un trabajo
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+LISTO = 'listo'
+FALLIDO = 'fallido'
+CANCELADO = 'cancelado'
+
+
+class ExportacionCancelada(Exception):
+    pass
+
+
+# Ventanas [desde, hasta) de a lo sumo `ventana` que cubren los días del
+# almacén dentro de [inicio, fin); nunca cruzan la medianoche
+def ventanas(almacen, inicio, fin, ventana=VENTANA):
+    inicio, fin = pd.Timestamp(inicio), pd.Timestamp(fin)
+    for dia in almacen.dias():
+        dia = pd.Timestamp(dia)
+        desde, hasta_dia = max(inicio, dia), min(fin, dia + UN_DIA)
+        while desde < hasta_dia:
+            hasta = min(desde + ventana, hasta_dia)
+            yield dia.date(), desde, hasta
+            desde = hasta
+
+
+# Las series tal cual, un bloque por ventana no vacía
+def bloques_datos(lecturas, tags):
+    for _, bloque in lecturas:
+        if len(bloque):
+            yield bloque
+
+
+# Una tabla de estadísticas (una fila por tag) por día
+def bloques_estadisticas(lecturas, tags):
+    for dia, grupo in itertools.groupby(lecturas, key=itemgetter(0)):
+        agregado = Agregados.vacio(len(tags))
+        for _, bloque in grupo:
+            if len(bloque):
+                agregado = agregado.combinar(Agregados.desde_matriz(bloque[tags].to_numpy(dtype='float64')))
+        if agregado.conteo.any():
+            tabla = agregado.tabla(tags)
+            tabla.insert(0, 'Día', pd.Timestamp(dia))
+            yield tabla
+
+
+# Intervalos de alarma de cada día; sólo los estados int8 del día quedan en memoria
+def bloques_alarmas(lecturas, tags, registro=None):
+    tabla = tabla_umbrales(tags, registro)
+    for _, grupo in itertools.groupby(lecturas, key=itemgetter(0)):
+        tiempos, estados = [], []
+        for _, bloque in grupo:
+            tiempos.append(bloque[COLUMNA_TIEMPO].to_numpy(dtype='datetime64[ns]'))
+            estados.append(clasificar(bloque[tags].to_numpy(dtype='float64'), tabla))
+        tiempos = np.concatenate(tiempos)
+        if not len(tiempos):
+            continue
+        intervalos = intervalos_alarma(tiempos, np.concatenate(estados), tags)
+        if len(intervalos):
+            intervalos['Estado'] = intervalos['Estado'].map(lambda c: ESTADOS[int(c)][0])
+            yield intervalos
+
+
+GENERADORES = {
+    DATOS: bloques_datos,
+    ESTADISTICAS: bloques_estadisticas,
+    ALARMAS: bloques_alarmas,
+}
+
+
+class EscritorParquet:
+    """Un grupo de filas por bloque; el esquema lo fija el primer bloque."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._escritor = None
+
+    def escribir(self, bloque):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+        if self._escritor is None:
+            self._escritor = pq.ParquetWriter(self.ruta, tabla.schema, compression='zstd')
+        self._escritor.write_table(tabla.cast(self._escritor.schema))
+
+    def cerrar(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self._escritor is None:
+            pq.write_table(pa.table({}), self.ruta)
+        else:
+            self._escritor.close()
+
+
+class EscritorCSV:
+    """Anexa cada bloque al archivo; el encabezado va sólo con el primero."""
+
+    def __init__(self, ruta, comprimido=False):
+        self.ruta = ruta
+        if comprimido:
+            self._archivo = gzip.open(ruta, 'wt', encoding='utf-8', newline='', compresslevel=6)
+        else:
+            self._archivo = open(ruta, 'w', encoding='utf-8', newline='')
+        self._encabezado = True
+
+    def escribir(self, bloque):
+        bloque.to_csv(self._archivo, header=self._encabezado, index=False)
+        self._encabezado = False
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+def crear_escritor(ruta, formato):
+    if formato == PARQUET:
+        return EscritorParquet(ruta)
+    if formato in (CSV, CSV_GZ):
+        return EscritorCSV(ruta, comprimido=formato == CSV_GZ)
+    raise ValueError(f"Formato de exportación desconocido: {formato!r}")
+
+
+# Escribe `contenido` de [inicio, fin) en `ruta` bloque a bloque; devuelve
+# las filas escritas. `progreso(hechas, total)` se llama tras cada ventana y
+# `cancelado()` se consulta antes de leer la siguiente. Las alarmas usan las
+# bandas de `registro` (por defecto, el del proceso).
+def exportar(almacen, ruta, inicio, fin, tags=None, contenido=DATOS, formato=PARQUET,
+             ventana=VENTANA, progreso=None, cancelado=None, registro=None):
+    tags = almacen.tags_validos(tags)
+    generador = GENERADORES[contenido]
+    if contenido == ALARMAS:
+        generador = partial(generador, registro=registro)
+    plan = list(ventanas(almacen, inicio, fin, ventana))
+
+    def lecturas():
+        for k, (dia, desde, hasta) in enumerate(plan, 1):
+            if cancelado is not None and cancelado():
+                raise ExportacionCancelada()
+            yield dia, almacen.leer_rango(desde, hasta, tags)
+            if progreso is not None:
+                progreso(k, len(plan))
+
+    escritor = crear_escritor(ruta, formato)
+    filas = 0
+    try:
+        for bloque in generador(lecturas(), tags):
+            escritor.escribir(bloque)
+            filas += len(bloque)
+    finally:
+        escritor.cerrar()
+    return filas
+
+
+class TrabajoExportacion:
+    """Estado de una exportación en segundo plano (lo leen las sesiones)."""
+
+    def __init__(self, id_, contenido, formato, inicio, fin, tags, ruta):
+        self.id = id_
+        self.contenido = contenido
+        self.formato = formato
+        self.inicio = pd.Timestamp(inicio)
+        self.fin = pd.Timestamp(fin)
+        self.tags = list(tags)
+        self.ruta = ruta
+        self.estado = PENDIENTE
+        self.hechas = 0
+        self.total = 0
+        self.filas = 0
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+        self._cancelar = threading.Event()
+
+    @property
+    def progreso(self):
+        if self.estado == LISTO:
+            return 1.0
+        return self.hechas / self.total if self.total else 0.0
+
+    @property
+    def activo(self):
+        return self.estado in (PENDIENTE, EN_CURSO)
+
+    @property
+    def nombre_archivo(self):
+        ultimo = self.fin - pd.Timedelta(1, 'ns')
+        return f"{self.contenido}_{self.inicio:%Y%m%d}_{ultimo:%Y%m%d}{FORMATOS[self.formato][1]}"
+
+    @property
+    def mime(self):
+        return FORMATOS[self.formato][2]
+
+    @property
+    def bytes(self):
+        return os.path.getsize(self.ruta) if self.estado == LISTO else 0
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    # Contenido del archivo terminado (para st.download_button, que lo pide
+    # recién al hacer clic)
+    def leer(self):
+        with open(self.ruta, 'rb') as archivo:
+            return archivo.read()
+
+
+class ExportadorReportes:
+    """Pool de hilos que ejecuta exportaciones y conserva sus archivos un tiempo."""
+
+    def __init__(self, almacen, directorio=None, hilos=2, retencion=3600.0, ventana=VENTANA, registro=None):
+        self.almacen = almacen
+        self.registro = registro
+        self.directorio = directorio or tempfile.mkdtemp(prefix='dashboard-export-')
+        self.retencion = retencion
+        self.ventana = ventana
+        self._pool = ThreadPoolExecutor(hilos, thread_name_prefix='exportacion')
+        self._trabajos = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def iniciar(self, inicio, fin, tags=None, contenido=DATOS, formato=PARQUET):
+        if contenido not in GENERADORES:
+            raise ValueError(f"Contenido de exportación desconocido: {contenido!r}")
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de exportación desconocido: {formato!r}")
+        self.purgar()
+        tags = self.almacen.tags_validos(tags)
+        with self._lock:
+            id_ = next(self._ids)
+            ruta = os.path.join(self.directorio, f"{id_:06d}{FORMATOS[formato][1]}")
+            trabajo = self._trabajos[id_] = TrabajoExportacion(id_, contenido, formato, inicio, fin, tags, ruta)
+        self._pool.submit(self._ejecutar, trabajo)
+        return trabajo
+
+    def trabajo(self, id_):
+        with self._lock:
+            return self._trabajos.get(id_)
+
+    def _ejecutar(self, trabajo):
+        trabajo.estado = EN_CURSO
+
+        def progreso(hechas, total):
+            trabajo.hechas, trabajo.total = hechas, total
+
+        try:
+            trabajo.filas = exportar(
+                self.almacen, trabajo.ruta, trabajo.inicio, trabajo.fin, trabajo.tags,
+                trabajo.contenido, trabajo.formato, self.ventana, progreso, trabajo._cancelar.is_set,
+                self.registro
+            )
+            trabajo.estado = LISTO
+        except ExportacionCancelada:
+            trabajo.estado = CANCELADO
+        except Exception as e:  # el error se muestra en la sesión que lo pidió
+            trabajo.error = e
+            trabajo.estado = FALLIDO
+        finally:
+            trabajo.terminado = time.time()
+            if trabajo.estado != LISTO and os.path.exists(trabajo.ruta):
+                os.remove(trabajo.ruta)
+
+    # Borra los trabajos terminados hace más de `retencion` segundos
+    def purgar(self):
+        limite = time.time() - self.retencion
+        with self._lock:
+            vencidos = [t for t in self._trabajos.values() if t.terminado is not None and t.terminado < limite]
+            for trabajo in vencidos:
+                del self._trabajos[trabajo.id]
+        for trabajo in vencidos:
+            if os.path.exists(trabajo.ruta):
+                os.remove(trabajo.ruta)
+
+    def cerrar(self):
+        with self._lock:
+            for trabajo in self._trabajos.values():
+                trabajo.cancelar()
+        self._pool.shutdown(wait=True)
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def main():
+    from industrial.almacenamiento import abrir_almacen
+
+    parser = argparse.ArgumentParser(description='Exporta series, estadísticas o alarmas de un almacén')
+    parser.add_argument('almacen', help='directorio del almacén')
+    parser.add_argument('salida', help='archivo de salida')
+    parser.add_argument('--desde', required=True)
+    parser.add_argument('--hasta', required=True, help='exclusivo')
+    parser.add_argument('--tags', nargs='+')
+    parser.add_argument('--contenido', choices=sorted(CONTENIDOS), default=DATOS)
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default=PARQUET)
+    args = parser.parse_args()
+
+    def progreso(hechas, total):
+        print(f"\r{hechas}/{total} ventanas", end='', file=sys.stderr)
+
+    reloj = time.perf_counter()
+    filas = exportar(abrir_almacen(args.almacen), args.salida, args.desde, args.hasta, args.tags,
+                     args.contenido, args.formato, progreso=progreso)
+    print(f"\n{filas:,} filas en {time.perf_counter() - reloj:.1f} s → {args.salida}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+import asyncio
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Fuentes de datos en vivo.
+#
+# Cada fuente lee muchos tags en una sola petición (un round trip por
+# sondeo, no uno por tag) a través de un pool de conexiones asíncrono, con
+# timeout por petición y registro de salud de la conexión. Todo corre en un
+# bucle asyncio de fondo; el hilo del ingestor sólo espera el resultado con
+# un límite de tiempo, así que un dispositivo lento nunca bloquea un rerun
+# del script.
+#
+# Adaptadores incluidos:
+#   FuenteSQLite  historiador SQL (tabla muestras(tag, fecha, valor))
+#   FuentePLC     PLC por socket TCP con un protocolo JSON por líneas;
+#                 ServidorPLCSimulado lo emula localmente
+
+EN_LINEA = 'en_linea'
+DEGRADADO = 'degradado'
+FUERA_DE_LINEA = 'fuera_de_linea'
+SIN_DATOS = 'sin_datos'
+
+
+class FuenteNoDisponible(Exception):
+    """La fuente no respondió a tiempo o rechazó la petición."""
+
+
+class SaludConexion:
+    """Estado de una conexión según sus últimas peticiones."""
+
+    def __init__(self, latencia_degradada=1.0, fallos_fuera_de_linea=3):
+        self.latencia_degradada = latencia_degradada
+        self.fallos_fuera_de_linea = fallos_fuera_de_linea
+        self.latencia = None
+        self.fallos_consecutivos = 0
+        self.exitos = 0
+        self.fallos = 0
+        self.ultimo_exito = None
+        self.ultimo_error = None
+        self._lock = threading.Lock()
+
+    def registrar_exito(self, latencia):
+        with self._lock:
+            # Promedio móvil exponencial de la latencia
+            self.latencia = latencia if self.latencia is None else 0.8 * self.latencia + 0.2 * latencia
+            self.fallos_consecutivos = 0
+            self.exitos += 1
+            self.ultimo_exito = time.time()
+
+    def registrar_fallo(self, error):
+        with self._lock:
+            self.fallos_consecutivos += 1
+            self.fallos += 1
+            self.ultimo_error = error
+
+    @property
+    def estado(self):
+        if self.fallos_consecutivos >= self.fallos_fuera_de_linea:
+            return FUERA_DE_LINEA
+        if self.exitos == 0 and self.fallos == 0:
+            return SIN_DATOS
+        if self.fallos_consecutivos or (self.latencia or 0) > self.latencia_degradada:
+            return DEGRADADO
+        return EN_LINEA
+
+
+class PoolConexiones:
+    """Pool asíncrono acotado: a lo sumo `maximo` conexiones abiertas."""
+
+    def __init__(self, crear, cerrar, maximo=4):
+        self._crear = crear
+        self._cerrar = cerrar
+        self.maximo = maximo
+        self._libres = []
+        self._abiertas = 0
+        self._semaforo = None
+
+    def _sem(self):
+        # Se crea dentro del bucle que lo usa
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.maximo)
+        return self._semaforo
+
+    async def adquirir(self):
+        await self._sem().acquire()
+        try:
+            if self._libres:
+                return self._libres.pop()
+            conexion = await self._crear()
+            self._abiertas += 1
+            return conexion
+        except BaseException:
+            self._sem().release()
+            raise
+
+    async def liberar(self, conexion, descartar=False):
+        try:
+            if descartar:
+                self._abiertas -= 1
+                await self._cerrar(conexion)
+            else:
+                self._libres.append(conexion)
+        finally:
+            self._sem().release()
+
+    async def cerrar(self):
+        libres, self._libres = self._libres, []
+        for conexion in libres:
+            self._abiertas -= 1
+            await self._cerrar(conexion)
+
+
+class FuenteAsincrona:
+    """Base de las fuentes: petición por lotes con pool, timeout y salud."""
+
+    def __init__(self, maximo_conexiones=4, timeout=2.0):
+        self.timeout = timeout
+        self.salud = SaludConexion(latencia_degradada=timeout / 2)
+        self.pool = PoolConexiones(self._conectar, self._desconectar, maximo_conexiones)
+
+    async def _conectar(self):
+        raise NotImplementedError
+
+    async def _desconectar(self, conexion):
+        pass
+
+    async def _peticion(self, conexion, tags, desde_ns):
+        raise NotImplementedError
+
+    # Muestras de `tags` posteriores a `desde_ns` (o la última de cada tag si
+    # es None), como DataFrame ancho Fecha + tags
+    async def leer(self, tags, desde_ns=None):
+        inicio = time.monotonic()
+        try:
+            conexion = await asyncio.wait_for(self.pool.adquirir(), self.timeout)
+        except asyncio.TimeoutError as e:
+            self.salud.registrar_fallo('pool sin conexiones libres')
+            raise FuenteNoDisponible('pool sin conexiones libres') from e
+        except Exception as e:
+            self.salud.registrar_fallo(str(e))
+            raise FuenteNoDisponible(str(e)) from e
+        descartar = False
+        try:
+            restante = max(self.timeout - (time.monotonic() - inicio), 0.01)
+            resultado = await asyncio.wait_for(self._peticion(conexion, list(tags), desde_ns), restante)
+        except asyncio.TimeoutError as e:
+            # El estado de la conexión es incierto tras un timeout
+            descartar = True
+            self.salud.registrar_fallo(f'timeout tras {self.timeout:.1f} s')
+            raise FuenteNoDisponible(f'timeout tras {self.timeout:.1f} s') from e
+        except Exception as e:
+            descartar = True
+            self.salud.registrar_fallo(str(e))
+            raise FuenteNoDisponible(str(e)) from e
+        finally:
+            await self.pool.liberar(conexion, descartar)
+        self.salud.registrar_exito(time.monotonic() - inicio)
+        return resultado
+
+    async def cerrar(self):
+        await self.pool.cerrar()
+
+
+def _ancho(tiempos_ns, tags_fila, valores, tags):
+    largo = pd.DataFrame({'Fecha': tiempos_ns, 'tag': tags_fila, 'valor': valores})
+    ancho = largo.pivot_table(index='Fecha', columns='tag', values='valor', aggfunc='last')
+    ancho = ancho.reindex(columns=tags)
+    ancho.index = pd.to_datetime(ancho.index.to_numpy(dtype='int64'))
+    ancho.columns.name = None
+    return ancho.rename_axis('Fecha').reset_index()
+
+
+class FuenteSQLite(FuenteAsincrona):
+    """Historiador SQL en SQLite; las consultas corren en hilos del pool.
+
+    El historiador es externo: la fuente sólo lo abre en modo lectura y
+    nunca crea ni modifica su esquema.
+    """
+
+    def __init__(self, ruta, maximo_conexiones=4, timeout=2.0):
+        super().__init__(maximo_conexiones, timeout)
+        self.ruta = ruta
+
+    async def _conectar(self):
+        uri = pathlib.Path(self.ruta).absolute().as_uri() + '?mode=ro'
+        return await asyncio.to_thread(sqlite3.connect, uri, uri=True, check_same_thread=False)
+
+    async def _desconectar(self, conexion):
+        await asyncio.to_thread(conexion.close)
+
+    async def _peticion(self, conexion, tags, desde_ns):
+        return await asyncio.to_thread(self._consultar, conexion, tags, desde_ns)
+
+    def _consultar(self, conexion, tags, desde_ns):
+        marcas = ','.join('?' * len(tags))
+        if desde_ns is None:
+            # Último valor de cada tag en una sola consulta
+            sql = (
+                f'SELECT m.tag, m.fecha, m.valor FROM muestras m JOIN '
+                f'(SELECT tag, MAX(fecha) AS fecha FROM muestras WHERE tag IN ({marcas}) GROUP BY tag) u '
+                f'ON m.tag = u.tag AND m.fecha = u.fecha'
+            )
+            filas = conexion.execute(sql, tags).fetchall()
+        else:
+            sql = f'SELECT tag, fecha, valor FROM muestras WHERE tag IN ({marcas}) AND fecha > ? ORDER BY fecha'
+            filas = conexion.execute(sql, [*tags, int(desde_ns)]).fetchall()
+        if not filas:
+            return pd.DataFrame(columns=['Fecha', *tags])
+        tags_fila, fechas, valores = zip(*filas)
+        ancho = _ancho(np.array(fechas, dtype='int64'), tags_fila, np.array(valores, dtype='float64'), tags)
+        if desde_ns is None:
+            # Una sola fila con el último valor conocido de cada tag
+            ancho = ancho.ffill().tail(1).reset_index(drop=True)
+        return ancho
+
+    # Carga un DataFrame ancho en el historiador, creando la tabla si falta
+    # (sólo para pruebas y demos; nunca se usa contra un historiador real)
+    def escribir(self, df):
+        tags = [c for c in df.columns if c != 'Fecha']
+        largo = df.melt(id_vars=['Fecha'], value_vars=tags, var_name='tag', value_name='valor').dropna()
+        fechas = largo['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        with sqlite3.connect(self.ruta) as con:
+            con.execute('CREATE TABLE IF NOT EXISTS muestras (tag TEXT NOT NULL, fecha INTEGER NOT NULL, valor REAL)')
+            con.execute('CREATE INDEX IF NOT EXISTS idx_muestras_tag_fecha ON muestras (tag, fecha)')
+            con.executemany(
+                'INSERT INTO muestras (tag, fecha, valor) VALUES (?, ?, ?)',
+                zip(largo['tag'], fechas.tolist(), largo['valor'].tolist())
+            )
+
+
+class FuentePLC(FuenteAsincrona):
+    """PLC por TCP: petición {"id", "leer": [tags]} -> {"id", "fecha", "valores"}."""
+
+    def __init__(self, host, puerto, maximo_conexiones=2, timeout=2.0):
+        super().__init__(maximo_conexiones, timeout)
+        self.host = host
+        self.puerto = puerto
+        self._siguiente_id = 0
+
+    async def _conectar(self):
+        return await asyncio.open_connection(self.host, self.puerto, limit=2**22)
+
+    async def _desconectar(self, conexion):
+        _, escritor = conexion
+        escritor.close()
+        try:
+            await escritor.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def _peticion(self, conexion, tags, desde_ns):
+        lector, escritor = conexion
+        self._siguiente_id += 1
+        peticion_id = self._siguiente_id
+        escritor.write(json.dumps({'id': peticion_id, 'leer': tags}).encode() + b'\n')
+        await escritor.drain()
+        linea = await lector.readline()
+        if not linea:
+            raise ConnectionError('el PLC cerró la conexión')
+        respuesta = json.loads(linea)
+        if respuesta.get('id') != peticion_id:
+            raise ConnectionError('respuesta fuera de secuencia')
+        if 'error' in respuesta:
+            raise FuenteNoDisponible(respuesta['error'])
+        fila = {'Fecha': [pd.Timestamp(respuesta['fecha'])]}
+        fila.update({t: [respuesta['valores'].get(t, np.nan)] for t in tags})
+        return pd.DataFrame(fila)
+
+
+class ServidorPLCSimulado:
+    """PLC local de prueba: responde con valores de un generador (p. ej. FuenteSimulada)."""
+
+    def __init__(self, generador, host='127.0.0.1', puerto=0, retardo=0.0):
+        self.generador = generador
+        self.host = host
+        self.puerto = puerto
+        self.retardo = retardo
+        self._servidor = None
+
+    async def iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto, limit=2**22)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    async def detener(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+
+    async def _atender(self, lector, escritor):
+        try:
+            while linea := await lector.readline():
+                peticion = json.loads(linea)
+                if self.retardo:
+                    await asyncio.sleep(self.retardo)
+                muestra = self.generador()
+                valores = {
+                    t: float(muestra[t].iloc[-1]) for t in peticion['leer'] if t in muestra.columns
+                }
+                respuesta = {
+                    'id': peticion['id'],
+                    'fecha': muestra['Fecha'].iloc[-1].isoformat(),
+                    'valores': valores,
+                }
+                escritor.write(json.dumps(respuesta).encode() + b'\n')
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+
+class BucleAsincrono:
+    """Bucle asyncio en un hilo de fondo, para usar fuentes desde código síncrono."""
+
+    def __init__(self):
+        self.bucle = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self.bucle.run_forever, name='fuentes-asyncio', daemon=True)
+        self._hilo.start()
+
+    def ejecutar(self, corrutina, timeout=None):
+        futuro = asyncio.run_coroutine_threadsafe(corrutina, self.bucle)
+        try:
+            return futuro.result(timeout)
+        except TimeoutError:
+            futuro.cancel()
+            raise
+
+    def lanzar(self, corrutina):
+        return asyncio.run_coroutine_threadsafe(corrutina, self.bucle)
+
+
+class AdaptadorSincrono:
+    """Convierte una FuenteAsincrona en el callable que espera IngestorEnVivo.
+
+    Pide sólo las muestras posteriores a la última recibida y limita las
+    peticiones en vuelo (contrapresión): si la fuente sigue ocupada con
+    `max_pendientes` sondeos, el siguiente se omite en lugar de encolarse.
+    """
+
+    def __init__(self, fuente, tags, bucle, max_pendientes=1):
+        self.fuente = fuente
+        self.tags = list(tags)
+        self.bucle = bucle
+        self.salud = fuente.salud
+        self.omitidos = 0
+        self._pendientes = threading.BoundedSemaphore(max_pendientes)
+        self._ultimo_ns = None
+
+    def __call__(self):
+        if not self._pendientes.acquire(blocking=False):
+            self.omitidos += 1
+            return None
+        futuro = self.bucle.lanzar(self.fuente.leer(self.tags, self._ultimo_ns))
+        futuro.add_done_callback(lambda _: self._pendientes.release())
+        try:
+            # La fuente ya aplica su propio timeout; el margen cubre el pool
+            lote = futuro.result(self.fuente.timeout * 2)
+        except TimeoutError as e:
+            raise FuenteNoDisponible('sin respuesta de la fuente') from e
+        if lote is not None and not lote.empty:
+            self._ultimo_ns = int(lote['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')[-1])
+        return lote
+
+
+# Fuente según una URI: "sqlite:RUTA", "plc:HOST:PUERTO" o "plc-simulado"
+# (levanta un ServidorPLCSimulado local sobre `generador`)
+def abrir_fuente(uri, bucle, generador=None, timeout=2.0):
+    esquema, _, resto = uri.partition(':')
+    if esquema == 'sqlite':
+        return FuenteSQLite(resto, timeout=timeout)
+    if esquema == 'plc':
+        host, _, puerto = resto.rpartition(':')
+        return FuentePLC(host or '127.0.0.1', int(puerto), timeout=timeout)
+    if esquema == 'plc-simulado':
+        if generador is None:
+            raise ValueError('plc-simulado necesita un generador de muestras')
+        servidor = bucle.ejecutar(ServidorPLCSimulado(generador, retardo=float(resto or 0)).iniciar())
+        fuente = FuentePLC(servidor.host, servidor.puerto, timeout=timeout)
+        fuente.servidor = servidor
+        return fuente
+    raise ValueError(f"Fuente desconocida: {uri!r}")
@@ -0,0 +1,131 @@
+import hashlib
+import json
+
+from industrial.cache import CacheCompartida
+
+# Caché de specs de gráficos.
+#
+# Un gráfico Altair se convierte una sola vez en su spec Vega-Lite con los
+# datos en línea ya serializados en Arrow (lo mismo que hace st.altair_chart
+# en cada rerun). Mientras no cambie la versión de los datos de los que
+# depende, los reruns siguientes reutilizan la spec sin volver a preparar
+# ni codificar los DataFrames y la entregan con st.vega_lite_chart.
+#
+# La clave de una entrada es (tipo de gráfico, clave, versión de datos); al
+# llegar una versión nueva la entrada anterior del mismo gráfico se descarta
+# en el acto, sin esperar al desalojo LRU.
+#
+# altair y pyarrow se importan recién al construir la primera spec: un rerun
+# servido por completo desde la caché no los necesita.
+
+def _arrow_bytes(df):
+    import pyarrow as pa
+
+    tabla = pa.Table.from_pandas(df)
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return destino.getvalue().to_pybytes()
+
+
+class SpecGrafico:
+    """Spec Vega-Lite serializada (JSON) y sus datasets en Arrow IPC."""
+
+    __slots__ = ('spec_json', 'datasets')
+
+    def __init__(self, spec_json, datasets):
+        self.spec_json = spec_json
+        self.datasets = datasets
+
+    # Bytes que llegan al navegador: el JSON de la spec (ASCII, así que un
+    # carácter es un byte) más los datasets en Arrow
+    @property
+    def nbytes(self):
+        return len(self.spec_json) + sum(len(d) for d in self.datasets.values())
+
+    def __sizeof__(self):
+        return self.nbytes
+
+    # Dict nuevo en cada llamada: Streamlit modifica la spec al enviarla
+    def como_dict(self):
+        spec = json.loads(self.spec_json)
+        if self.datasets:
+            spec['datasets'] = dict(self.datasets)
+        return spec
+
+
+# Copia del gráfico (y de sus capas o subgráficos) con cada DataFrame
+# reemplazado por una referencia a un dataset con nombre; el contenido en
+# Arrow queda en `datasets`
+def _nombrar_datos(grafico, datasets):
+    import altair as alt
+    import pandas as pd
+
+    grafico = grafico.copy(deep=False)
+    datos = getattr(grafico, 'data', alt.Undefined)
+    if isinstance(datos, pd.DataFrame):
+        contenido = _arrow_bytes(datos)
+        nombre = 'datos_' + hashlib.md5(contenido, usedforsecurity=False).hexdigest()[:16]
+        datasets[nombre] = contenido
+        grafico.data = alt.NamedData(name=nombre)
+    for atributo in ('layer', 'hconcat', 'vconcat', 'concat'):
+        hijos = getattr(grafico, atributo, alt.Undefined)
+        if isinstance(hijos, list):
+            setattr(grafico, atributo, [_nombrar_datos(h, datasets) for h in hijos])
+    interno = getattr(grafico, 'spec', alt.Undefined)
+    if isinstance(interno, (alt.Chart, alt.LayerChart)):
+        grafico.spec = _nombrar_datos(interno, datasets)
+    return grafico
+
+
+# Spec Vega-Lite sin tocar el estado global de Altair: los datos ya van como
+# datasets con nombre (no pasan por alt.data_transformers) y la spec se arma
+# como no principal, así que no se le mezcla el tema activo. Sólo un tema
+# elegido por el usuario se aplica; el 'default' no, porque Streamlit aplica
+# el suyo.
+def spec_vega_lite(chart):
+    import altair as alt
+
+    datasets = {}
+    spec = _nombrar_datos(chart, datasets).to_dict(context={'top_level': False})
+    if alt.theme.active != 'default':
+        spec = alt.utils.update_nested(alt.theme.get()(), spec, copy=True)
+    spec.setdefault('$schema', alt.SCHEMA_URL)
+    return SpecGrafico(json.dumps(spec), datasets)
+
+
+class CacheGraficos(CacheCompartida):
+    """CacheCompartida de SpecGrafico con invalidación por versión de datos."""
+
+    def __init__(self, presupuesto_bytes=64 * 2**20, ttl=3600.0):
+        super().__init__(presupuesto_bytes, ttl)
+        self.invalidaciones = 0
+        self._versiones = {}
+
+    # Spec del gráfico (`tipo`, `clave`) para la `version` de sus datos;
+    # `construir()` devuelve el gráfico Altair y sólo se llama en un fallo
+    def obtener_spec(self, tipo, clave, version, construir, rango=None, tags=None):
+        with self._lock:
+            previa = self._versiones.get((tipo, clave))
+            if previa is not None and previa != version:
+                if (tipo, clave, previa) in self._entradas:
+                    self._quitar((tipo, clave, previa))
+                    self.invalidaciones += 1
+        spec = self.obtener(
+            (tipo, clave, version), lambda: spec_vega_lite(construir()), rango=rango, tags=tags
+        )
+        with self._lock:
+            self._versiones[(tipo, clave)] = version
+        return spec
+
+    def _quitar(self, clave):
+        super()._quitar(clave)
+        # Sin entrada no hace falta recordar su versión
+        if self._versiones.get(clave[:2]) == clave[2]:
+            del self._versiones[clave[:2]]
+
+    def estadisticas(self):
+        estadisticas = super().estadisticas()
+        estadisticas['invalidaciones'] = self.invalidaciones
+        return estadisticas
+
@@ -0,0 +1,181 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+from industrial.estadisticas import UNA_HORA_NS
+from industrial.estados import ADVERTENCIA, BUENO, CRITICO, DESCONOCIDO, ESTADOS
+
+# Indicadores de disponibilidad a partir del historial de estados.
+#
+# Cada muestra mantiene su estado hasta la muestra siguiente, así que el
+# tiempo en cada estado es la suma de las diferencias entre muestras
+# consecutivas agrupadas por (cubeta, tag, estado): un np.bincount sobre la
+# matriz int8 de estados, sin recorrer intervalos en Python. El estado de la
+# planta en cada instante es el peor de los tags con umbrales (crítico si
+# alguno lo está; desconocido si ninguno tiene dato).
+#
+# Igual que EstadisticasIncrementales, los tiempos se acumulan por cubeta
+# (una hora por defecto) y cada actualización sólo procesa las muestras
+# nuevas; la última muestra queda pendiente hasta que llega la siguiente.
+# Un intervalo se asigna entero a la cubeta en la que empieza.
+
+# Columna de cada estado en las matrices de tiempos (código + 1)
+N_ESTADOS = 4
+
+
+class ResumenKPI:
+    """Segundos por estado de cada tag (k × 4) y de la planta (4,).
+
+    Las columnas son los códigos de estado + 1: desconocido, bueno,
+    advertencia, crítico. `con_umbral` marca los tags que tienen umbrales.
+    """
+
+    __slots__ = ('tags', 'tiempo', 'planta', 'con_umbral')
+
+    def __init__(self, tags, tiempo, planta, con_umbral=None):
+        self.tags = tags
+        self.tiempo = tiempo
+        self.planta = planta
+        self.con_umbral = np.ones(len(tags), dtype=bool) if con_umbral is None else con_umbral
+
+    def segundos(self, estado):
+        return self.planta[estado + 1]
+
+    # Tiempo con dato en al menos un tag con umbrales
+    @property
+    def observado(self):
+        return self.planta.sum() - self.segundos(DESCONOCIDO)
+
+    # Fracción del tiempo observado sin ningún tag en estado crítico
+    @property
+    def disponibilidad(self):
+        if self.observado <= 0:
+            return np.nan
+        return 1.0 - self.segundos(CRITICO) / self.observado
+
+    # Promedio por tag (con umbrales) de la fracción de su tiempo disponible
+    # (con dato y no crítico) que pasó en banda normal. Exigir todos los tags
+    # normales a la vez castigaría a la planta por cada advertencia aislada.
+    @property
+    def calidad(self):
+        tiempo = self.tiempo[self.con_umbral]
+        bueno = tiempo[:, BUENO + 1]
+        disponible = bueno + tiempo[:, ADVERTENCIA + 1]
+        con_tiempo = disponible > 0
+        if not con_tiempo.any():
+            return np.nan
+        return float(np.mean(bueno[con_tiempo] / disponible[con_tiempo]))
+
+    # Estilo OEE: disponibilidad × rendimiento × calidad (`rendimiento` en 0-1)
+    def oee(self, rendimiento=1.0):
+        return self.disponibilidad * rendimiento * self.calidad
+
+    # Por tag: porcentaje del tiempo en cada estado y horas observadas
+    def tabla(self, etiquetas=None):
+        total = self.tiempo.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraccion = self.tiempo / total[:, np.newaxis] * 100
+        tabla = pd.DataFrame({'Variable': list(self.tags if etiquetas is None else etiquetas)})
+        for estado in (BUENO, ADVERTENCIA, CRITICO, DESCONOCIDO):
+            tabla[f'% {ESTADOS[estado][0]}'] = fraccion[:, estado + 1]
+        tabla['Horas'] = total / 3600
+        return tabla
+
+
+class KPIsIncrementales:
+    """Tiempo en cada estado por tag y de la planta, por cubeta de tiempo.
+
+    Igual que EstadisticasIncrementales, los arreglos se reemplazan en vez de
+    modificarse en sitio, así que `instantanea` no copia datos.
+    """
+
+    def __init__(self, tags, con_umbral, cubeta_ns=UNA_HORA_NS):
+        self.tags = list(tags)
+        self.con_umbral = np.asarray(con_umbral, dtype=bool)
+        self.cubeta_ns = cubeta_ns
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.ultimo_ns = None
+            self._pendiente = None
+            self._inicios = np.empty(0, dtype='int64')
+            self._tiempo = np.zeros((0, len(self.tags), N_ESTADOS))
+            self._planta = np.zeros((0, N_ESTADOS))
+
+    # `estados` es la matriz int8 (muestras × tags) alineada con `tiempos`;
+    # sólo se procesan las filas posteriores a la última ya vista
+    def actualizar(self, tiempos, estados):
+        tiempos = np.asarray(tiempos, dtype='datetime64[ns]').view('int64')
+        with self._lock:
+            desde = 0 if self.ultimo_ns is None else int(np.searchsorted(tiempos, self.ultimo_ns, side='right'))
+            if desde >= len(tiempos):
+                return 0
+            nuevos_t = tiempos[desde:]
+            nuevos_e = np.asarray(estados)[desde:]
+            # La muestra pendiente abre el primer intervalo nuevo
+            if self._pendiente is not None:
+                nuevos_t = np.concatenate([[self._pendiente[0]], nuevos_t])
+                nuevos_e = np.concatenate([self._pendiente[1][np.newaxis], nuevos_e])
+            self._pendiente = (int(nuevos_t[-1]), nuevos_e[-1].copy())
+            self.ultimo_ns = int(nuevos_t[-1])
+            if len(nuevos_t) > 1:
+                self._acumular(nuevos_t[:-1], np.diff(nuevos_t) / 1e9, nuevos_e[:-1])
+            return len(tiempos) - desde
+
+    def _acumular(self, inicios, duraciones, estados):
+        k = len(self.tags)
+        cubetas = inicios - inicios % self.cubeta_ns
+        claves, cubeta = np.unique(cubetas, return_inverse=True)
+        nb = len(claves)
+        # (cubeta, tag, estado) → un índice plano para un único bincount
+        indice = (cubeta[:, np.newaxis] * k + np.arange(k)) * N_ESTADOS + (estados.astype('int64') + 1)
+        tiempo = np.bincount(
+            indice.ravel(), weights=np.repeat(duraciones, k), minlength=nb * k * N_ESTADOS
+        ).reshape(nb, k, N_ESTADOS)
+        planta = np.where(self.con_umbral, estados, DESCONOCIDO).max(axis=1, initial=DESCONOCIDO)
+        tiempo_planta = np.bincount(
+            cubeta * N_ESTADOS + (planta.astype('int64') + 1), weights=duraciones, minlength=nb * N_ESTADOS
+        ).reshape(nb, N_ESTADOS)
+        # La primera cubeta nueva puede continuar la última existente
+        n = len(self._inicios)
+        if n and claves[0] == self._inicios[-1]:
+            tiempo[0] += self._tiempo[-1]
+            tiempo_planta[0] += self._planta[-1]
+            n -= 1
+        self._inicios = np.concatenate([self._inicios[:n], claves])
+        self._tiempo = np.concatenate([self._tiempo[:n], tiempo])
+        self._planta = np.concatenate([self._planta[:n], tiempo_planta])
+
+    # Copia de sólo lectura del estado actual (comparte los arreglos)
+    def instantanea(self):
+        with self._lock:
+            copia = copy.copy(self)
+        copia._lock = threading.Lock()
+        return copia
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._inicios.nbytes + self._tiempo.nbytes + self._planta.nbytes
+
+    # Tiempos de las cubetas que empiezan en [inicio, fin)
+    def resumen(self, inicio=None, fin=None):
+        with self._lock:
+            i = 0 if inicio is None else int(np.searchsorted(self._inicios, pd.Timestamp(inicio).value))
+            j = len(self._inicios) if fin is None else int(np.searchsorted(self._inicios, pd.Timestamp(fin).value))
+            return self._resumen(i, j)
+
+    # Resumen de la última cubeta y de la inmediatamente anterior (vacío si
+    # esa hora no tiene datos)
+    def ultimas_cubetas(self):
+        with self._lock:
+            n = len(self._inicios)
+            contigua = n > 1 and self._inicios[-1] - self._inicios[-2] == self.cubeta_ns
+            return self._resumen(max(n - 1, 0), n), self._resumen(n - 2, n - 1) if contigua else self._resumen(0, 0)
+
+    def _resumen(self, i, j):
+        return ResumenKPI(self.tags, self._tiempo[i:j].sum(axis=0), self._planta[i:j].sum(axis=0), self.con_umbral)
@@ -0,0 +1,116 @@
+import numpy as np
+
+# Reducción de puntos antes de graficar.
+#
+# Un gráfico de N píxeles de ancho no puede mostrar más de ~2 puntos por
+# píxel, así que cada serie se recorta a un máximo de puntos antes de
+# serializarla a Vega-Lite. Ambos modos devuelven índices de muestras
+# originales (nunca valores interpolados), de modo que los picos se conservan.
+
+LTTB = 'lttb'
+MINMAX = 'minmax'
+MODOS = (LTTB, MINMAX)
+
+PUNTOS_POR_PIXEL = 2
+MAX_PUNTOS = 1500
+
+
+# Número de puntos para un gráfico de cierto ancho en píxeles
+def puntos_para_ancho(ancho_px, max_puntos=MAX_PUNTOS):
+    return int(min(max_puntos, max(ancho_px, 1) * PUNTOS_POR_PIXEL))
+
+
+def _a_flotante(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').view('int64')
+    x = x.astype('float64')
+    return x - x[0] if len(x) else x
+
+
+# Reparte n índices en cubetas de tamaño casi igual; devuelve los cortes
+def _cortes(inicio, fin, n_cubetas):
+    return np.linspace(inicio, fin, n_cubetas + 1).astype(np.int64)
+
+
+# Largest-Triangle-Three-Buckets: primer y último punto fijos y, en cada
+# cubeta intermedia, el punto que forma el triángulo de mayor área con el
+# punto elegido anterior y el promedio de la cubeta siguiente. El área se
+# calcula vectorizada por cubeta; el bucle sólo recorre los puntos de salida.
+def indices_lttb(x, y, n_salida):
+    x = _a_flotante(x)
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+    cortes = _cortes(1, n - 1, n_salida - 2)
+    # Promedios de todas las cubetas de una vez (sumas acumuladas)
+    cx = np.concatenate([[0.0], np.cumsum(x)])
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    tam = np.maximum(cortes[1:] - cortes[:-1], 1)
+    prom_x = (cx[cortes[1:]] - cx[cortes[:-1]]) / tam
+    prom_y = (cy[cortes[1:]] - cy[cortes[:-1]]) / tam
+    # La "cubeta siguiente" de la última es el punto final
+    prom_x = np.append(prom_x[1:], x[-1])
+    prom_y = np.append(prom_y[1:], y[-1])
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for k in range(n_salida - 2):
+        i, j = cortes[k], cortes[k + 1]
+        if j <= i:
+            indices[k + 1] = a
+            continue
+        bx = x[i:j]
+        by = y[i:j]
+        area = np.abs((x[a] - prom_x[k]) * (by - y[a]) - (x[a] - bx) * (prom_y[k] - y[a]))
+        a = i + int(np.argmax(area))
+        indices[k + 1] = a
+    return np.unique(indices)
+
+
+# Envolvente mín/máx: por cada cubeta se conservan la muestra mínima y la
+# máxima (en orden temporal). Totalmente vectorizado.
+def indices_minmax(y, n_salida):
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    n_cubetas = max(n_salida // 2, 1)
+    if n_salida >= n:
+        return np.arange(n)
+    tam = -(-n // n_cubetas)
+    relleno = np.full(n_cubetas * tam - n, np.nan)
+    matriz = np.concatenate([y, relleno]).reshape(n_cubetas, tam)
+    validas = ~np.all(np.isnan(matriz), axis=1)
+    matriz = np.where(np.isnan(matriz), np.inf, matriz)
+    base = np.arange(n_cubetas) * tam
+    i_min = base + np.argmin(matriz, axis=1)
+    i_max = base + np.argmax(np.where(np.isinf(matriz), -np.inf, matriz), axis=1)
+    indices = np.concatenate([i_min[validas], i_max[validas], [0, n - 1]])
+    return np.unique(indices[indices < n])
+
+
+# Índices a conservar de una serie, descartando muestras sin valor
+def indices_reducidos(x, y, n_salida, modo=LTTB):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de muestreo desconocido: {modo}")
+    y = np.asarray(y, dtype='float64')
+    validos = np.flatnonzero(~np.isnan(y))
+    if len(validos) <= n_salida:
+        return validos
+    if modo == LTTB:
+        locales = indices_lttb(np.asarray(x)[validos], y[validos], n_salida)
+    else:
+        locales = indices_minmax(y[validos], n_salida)
+    return validos[locales]
+
+
+# Reduce un DataFrame ancho a las filas necesarias para graficar las
+# columnas indicadas (unión de los índices elegidos para cada columna)
+def reducir_dataframe(df, columnas, n_salida, modo=LTTB, columna_x='Fecha'):
+    if len(df) <= n_salida:
+        return df
+    x = df[columna_x].to_numpy()
+    indices = [indices_reducidos(x, df[c].to_numpy(), n_salida, modo) for c in columnas]
+    filas = np.unique(np.concatenate(indices)) if indices else np.arange(0)
+    return df.iloc[filas]
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from industrial.registro import cargar_registro
+
+# Normalización de varios tags a una escala común.
+#
+# Los parámetros (desplazamiento y escala de cada tag) se calculan una sola
+# vez sobre la matriz ancha (muestras × tags) y se aplican con una operación
+# vectorizada; el formato largo que piden los gráficos se arma al final,
+# sólo con las muestras que se van a dibujar. Un tag constante (rango o
+# desviación 0) no divide por cero: queda en el centro de la escala.
+
+RANGO = 'rango'
+ZSCORE = 'zscore'
+PORCENTAJE_RANGO = 'porcentaje_rango'
+
+# Etiqueta, título del eje y dominio fijo (None = automático) de cada modo
+MODOS = {
+    RANGO: ('Mín-Máx del período', 'Valor Normalizado (0-100%)', (0, 100)),
+    ZSCORE: ('Z-score', 'Desviaciones respecto a la media', None),
+    PORCENTAJE_RANGO: ('% del rango operativo', '% del rango operativo', None),
+}
+
+
+class Escala:
+    """Por tag: (x - desplazamiento) / escala * factor; `centro` si la escala es 0."""
+
+    __slots__ = ('tags', 'desplazamiento', 'escala', 'factor', 'centro')
+
+    def __init__(self, tags, desplazamiento, escala, factor=1.0, centro=0.0):
+        self.tags = list(tags)
+        self.desplazamiento = np.asarray(desplazamiento, dtype='float64')
+        self.escala = np.asarray(escala, dtype='float64')
+        self.factor = factor
+        self.centro = centro
+
+    def aplicar(self, valores):
+        valores = np.asarray(valores, dtype='float64')
+        valida = self.escala > 0
+        divisor = np.where(valida, self.escala, 1.0)
+        salida = np.where(valida, (valores - self.desplazamiento) / divisor * self.factor, self.centro)
+        # Los NaN de entrada se conservan
+        salida[np.isnan(valores)] = np.nan
+        return salida
+
+
+# Rango operativo de un tag: la banda de advertencia si tiene umbrales
+def rango_operativo(tag, registro=None):
+    bajo, alto = (registro or cargar_registro()).bandas_de([tag])[0, 2:]
+    return None if np.isnan(bajo) else (float(bajo), float(alto))
+
+
+# Parámetros de `modo` a partir de la matriz de referencia (muestras × tags),
+# normalmente el período completo y no sólo lo que se dibuja. Las bandas
+# operativas salen de `registro` (por defecto, el del proceso).
+def calcular_escala(referencia, tags, modo=RANGO, registro=None):
+    referencia = np.asarray(referencia, dtype='float64')
+    if referencia.ndim == 1:
+        referencia = referencia[:, np.newaxis]
+    con_datos = ~np.isnan(referencia).all(axis=0)
+    minimos = np.full(len(tags), np.nan)
+    maximos = np.full(len(tags), np.nan)
+    if con_datos.any():
+        minimos[con_datos] = np.nanmin(referencia[:, con_datos], axis=0)
+        maximos[con_datos] = np.nanmax(referencia[:, con_datos], axis=0)
+    if modo == RANGO:
+        return Escala(tags, minimos, maximos - minimos, factor=100.0, centro=50.0)
+    if modo == ZSCORE:
+        medias = np.full(len(tags), np.nan)
+        desviaciones = np.full(len(tags), np.nan)
+        if con_datos.any():
+            medias[con_datos] = np.nanmean(referencia[:, con_datos], axis=0)
+            desviaciones[con_datos] = np.nanstd(referencia[:, con_datos], axis=0)
+        return Escala(tags, medias, desviaciones)
+    if modo == PORCENTAJE_RANGO:
+        # Tags sin rango operativo usan el mínimo y máximo observados
+        operativos = (registro or cargar_registro()).bandas_de(tags)[:, 2:]
+        sin_rango = np.isnan(operativos).any(axis=1)
+        bajos = np.where(sin_rango, minimos, operativos[:, 0])
+        altos = np.where(sin_rango, maximos, operativos[:, 1])
+        return Escala(tags, bajos, altos - bajos, factor=100.0, centro=50.0)
+    raise ValueError(f"Modo de normalización desconocido: {modo!r}")
+
+
+# Normaliza las columnas `tags` de `df`; devuelve un DataFrame ancho con la
+# columna de tiempo y los tags normalizados
+def normalizar(df, tags, modo=RANGO, referencia=None, columna_x='Fecha', registro=None):
+    referencia = df if referencia is None else referencia
+    escala = calcular_escala(referencia[tags].to_numpy(dtype='float64'), tags, modo, registro)
+    normalizados = escala.aplicar(df[tags].to_numpy(dtype='float64'))
+    salida = pd.DataFrame(normalizados, columns=tags, index=df.index)
+    salida.insert(0, columna_x, df[columna_x])
+    return salida
+
+
+# Formato largo para el gráfico (Fecha, Variable, Valor, Valor_Norm) armado
+# con arreglos NumPy a partir de las matrices anchas ya reducidas
+def formato_largo(df, normalizado, tags, etiquetas=None, columna_x='Fecha'):
+    n, k = len(df), len(tags)
+    etiquetas = tags if etiquetas is None else etiquetas
+    return pd.DataFrame({
+        columna_x: np.tile(df[columna_x].to_numpy(), k),
+        'Variable': np.repeat(np.asarray(etiquetas, dtype=object), n),
+        'Valor': df[tags].to_numpy(dtype='float64').ravel(order='F'),
+        'Valor_Norm': normalizado[tags].to_numpy(dtype='float64').ravel(order='F'),
+    })
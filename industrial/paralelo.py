@@ -0,0 +1,310 @@
+import mmap
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import deque
+from multiprocessing.connection import Listener, wait
+
+import numpy as np
+import pandas as pd
+
+from industrial.estadisticas import Agregados
+from industrial.estados import clasificar, intervalos_alarma, tabla_umbrales
+from industrial.muestreo import LTTB, indices_reducidos
+
+# Analítica por tag en paralelo.
+#
+# Con cientos de tags, agregar, reducir series para gráficos y extraer
+# intervalos de alarma son cálculos independientes por columna. El ejecutor
+# copia la matriz (tiempos + una fila contigua por tag) una sola vez a un
+# archivo mapeado en memoria (en /dev/shm si existe), reparte rangos de tags
+# entre los procesos del pool y cada proceso trabaja sobre vistas de ese
+# mapa: por la conexión sólo viajan la ruta del bloque, los índices del
+# rango y resultados pequeños.
+#
+# Con pocos tags el costo de coordinar supera la ganancia, así que por
+# debajo de `min_tags` el mismo código corre en serie en el proceso actual.
+#
+# Los workers son intérpretes lanzados con `python -m industrial.trabajador`
+# (ver PoolTrabajadores): no pasan por el arranque de multiprocessing, así
+# que no vuelven a ejecutar el script de Streamlit ni heredan su estado.
+
+AGREGADOS = 'agregados'
+MUESTREO = 'muestreo'
+ALARMAS = 'alarmas'
+
+MIN_TAGS = 64
+
+# Segundos de espera para que los workers se conecten al crear el pool
+ARRANQUE = 30.0
+
+# Directorio de los bloques compartidos (memoria si el sistema la ofrece)
+DIRECTORIO_BLOQUES = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class ErrorPool(RuntimeError):
+    """Un worker del pool no arrancó o terminó sin responder."""
+
+
+class ResultadoAnalitico:
+    """Resultados reensamblados en el orden de los tags pedidos."""
+
+    __slots__ = ('tags', 'agregados', 'indices', 'alarmas')
+
+    def __init__(self, tags, agregados=None, indices=None, alarmas=None):
+        self.tags = tags
+        self.agregados = agregados
+        self.indices = indices
+        self.alarmas = alarmas
+
+
+def _calcular(tiempos, valores, tags, operaciones, estados=None):
+    """`valores` es (tags × muestras) y `estados`, si ya se clasificó, (muestras
+    × tags); devuelve un dict por operación."""
+    resultado = {}
+    if AGREGADOS in operaciones:
+        agregados = Agregados.desde_bloques(valores.T, operaciones[AGREGADOS])
+        resultado[AGREGADOS] = tuple(getattr(agregados, a) for a in Agregados.__slots__)
+    if MUESTREO in operaciones:
+        n_salida, modo = operaciones[MUESTREO]
+        resultado[MUESTREO] = [indices_reducidos(tiempos, fila, n_salida, modo) for fila in valores]
+    if ALARMAS in operaciones:
+        if estados is None:
+            estados = clasificar(valores.T, operaciones[ALARMAS])
+        resultado[ALARMAS] = intervalos_alarma(tiempos.view('datetime64[ns]'), estados, tags)
+    return resultado
+
+
+# Bloque compartido: tiempos (int64, n), valores (float64, k × n) si alguna
+# operación los usa y estados (int8, k × n) si ya vienen clasificados
+def _vistas_bloque(buf, n, k, con_valores, con_estados):
+    tiempos = np.ndarray((n,), dtype='int64', buffer=buf)
+    desplazamiento = 8 * n
+    valores = estados = None
+    if con_valores:
+        valores = np.ndarray((k, n), dtype='float64', buffer=buf, offset=desplazamiento)
+        desplazamiento += 8 * n * k
+    if con_estados:
+        estados = np.ndarray((k, n), dtype='int8', buffer=buf, offset=desplazamiento)
+    return tiempos, valores, estados
+
+
+def _tarea(ruta, n, k, j0, j1, tags, operaciones, con_valores, con_estados):
+    # El proceso creador es quien borra el archivo del bloque
+    with open(ruta, 'rb') as archivo:
+        bloque = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+    # La tabla de umbrales viaja completa; cada tarea usa sus columnas
+    if ALARMAS in operaciones:
+        operaciones = {**operaciones, ALARMAS: operaciones[ALARMAS][j0:j1]}
+    try:
+        tiempos, valores, estados = _vistas_bloque(bloque, n, k, con_valores, con_estados)
+        resultado = _calcular(
+            tiempos,
+            None if valores is None else valores[j0:j1],
+            tags,
+            operaciones,
+            None if estados is None else estados[j0:j1].T,
+        )
+        del tiempos, valores, estados
+        return resultado
+    finally:
+        bloque.close()
+
+
+def _reensamblar(tags, partes, operaciones):
+    resultado = ResultadoAnalitico(list(tags))
+    if AGREGADOS in operaciones:
+        resultado.agregados = Agregados(*(
+            np.concatenate([p[AGREGADOS][a] for p in partes], axis=-1)
+            for a in range(len(Agregados.__slots__))
+        ))
+    if MUESTREO in operaciones:
+        indices = [i for p in partes for i in p[MUESTREO]]
+        resultado.indices = dict(zip(tags, indices))
+    if ALARMAS in operaciones:
+        resultado.alarmas = pd.concat([p[ALARMAS] for p in partes], ignore_index=True)
+    return resultado
+
+
+class PoolTrabajadores:
+    """`procesos` workers de industrial.trabajador, uno por conexión.
+
+    Cada worker es un intérprete nuevo (subprocess) que se conecta a un
+    Listener con una clave aleatoria; `mapear` reparte tareas (función,
+    argumentos) entre los workers libres y devuelve los resultados en el
+    orden de las tareas. Un mapeo a la vez; tras un ErrorPool el pool ya no
+    sirve y hay que cerrarlo.
+    """
+
+    def __init__(self, procesos, arranque=ARRANQUE):
+        clave = secrets.token_bytes(32)
+        # Los workers importan este paquete aunque el proceso se haya
+        # lanzado desde otro directorio
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        entorno = dict(os.environ)
+        entorno['PYTHONPATH'] = os.pathsep.join(filter(None, [raiz, entorno.get('PYTHONPATH')]))
+        self._procesos = []
+        self._conexiones = []
+        self._lock = threading.Lock()
+        with Listener(authkey=clave) as escucha:
+            for _ in range(procesos):
+                proceso = subprocess.Popen(
+                    [sys.executable, '-m', 'industrial.trabajador', escucha.address],
+                    stdin=subprocess.PIPE, env=entorno
+                )
+                proceso.stdin.write(clave)
+                proceso.stdin.close()
+                self._procesos.append(proceso)
+            # accept() no tiene timeout: se espera en un hilo y, si algún
+            # worker no se conecta a tiempo, cerrar el Listener lo destraba
+            hilo = threading.Thread(target=self._aceptar, args=(escucha, procesos), daemon=True)
+            hilo.start()
+            hilo.join(arranque)
+        hilo.join()
+        if len(self._conexiones) < procesos:
+            self.cerrar()
+            raise ErrorPool(f"Sólo {len(self._conexiones)} de {procesos} workers se conectaron")
+
+    def _aceptar(self, escucha, procesos):
+        try:
+            for _ in range(procesos):
+                self._conexiones.append(escucha.accept())
+        except OSError:
+            pass
+
+    def mapear(self, tareas):
+        with self._lock:
+            resultados = [None] * len(tareas)
+            pendientes = deque(enumerate(tareas))
+            libres = list(self._conexiones)
+            ocupadas = {}
+            error = None
+            while pendientes or ocupadas:
+                # Tras un error no se reparte más, pero se esperan las
+                # respuestas en curso para no desincronizar las conexiones
+                while pendientes and libres and error is None:
+                    conexion = libres.pop()
+                    indice, tarea = pendientes.popleft()
+                    try:
+                        conexion.send(tarea)
+                    except OSError as e:
+                        raise ErrorPool("Un worker del pool no acepta tareas") from e
+                    ocupadas[conexion] = indice
+                if not ocupadas:
+                    break
+                for conexion in wait(list(ocupadas)):
+                    indice = ocupadas.pop(conexion)
+                    try:
+                        correcto, valor = conexion.recv()
+                    except (EOFError, OSError) as e:
+                        raise ErrorPool("Un worker del pool terminó sin responder") from e
+                    libres.append(conexion)
+                    if correcto:
+                        resultados[indice] = valor
+                    elif error is None:
+                        error = valor
+            if error is not None:
+                raise error
+            return resultados
+
+    # Cerrar las conexiones termina a los workers
+    def cerrar(self, espera=5.0):
+        for conexion in self._conexiones:
+            conexion.close()
+        for proceso in self._procesos:
+            try:
+                proceso.wait(espera)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+                proceso.wait()
+
+
+class EjecutorAnalitico:
+    """Pool de procesos (creado al primer uso) para analítica por tag."""
+
+    def __init__(self, procesos=None, min_tags=MIN_TAGS):
+        self.procesos = procesos or os.cpu_count() or 1
+        self.min_tags = min_tags
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def disponible(self):
+        return self.procesos > 1
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = PoolTrabajadores(self.procesos)
+            return self._pool
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.cerrar()
+                self._pool = None
+
+    def analizar(self, df, tags, cortes=None, n_salida=None, modo=LTTB, alarmas=False, estados=None,
+                 registro=None, en_serie=None):
+        """Agregados por bloques de filas (`cortes`, como en np.add.reduceat),
+        índices reducidos a `n_salida` puntos e intervalos de alarma de `tags`.
+
+        Con `estados` (la matriz int8 muestras × tags ya clasificada) las
+        alarmas sólo extraen los tramos y, si no se pide nada más, los
+        valores de `df` no se copian. Sin ella, se clasifica con las bandas
+        de `registro` (por defecto, el del proceso).
+        """
+        tags = list(tags)
+        operaciones = {}
+        if cortes is not None:
+            operaciones[AGREGADOS] = np.asarray(cortes, dtype='int64')
+        if n_salida is not None:
+            operaciones[MUESTREO] = (n_salida, modo)
+        if alarmas:
+            operaciones[ALARMAS] = tabla_umbrales(tags, registro)
+        con_valores = bool(set(operaciones) - {ALARMAS}) or estados is None
+        tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        if en_serie is None:
+            en_serie = not self.disponible or len(tags) < self.min_tags
+        if en_serie or not len(tiempos):
+            valores = np.ascontiguousarray(df[tags].to_numpy(dtype='float64').T) if con_valores else None
+            parte = _calcular(tiempos, valores, tags, operaciones, estados)
+            return _reensamblar(tags, [parte], operaciones)
+        return self._en_paralelo(df, tiempos, tags, operaciones, con_valores, estados)
+
+    def _en_paralelo(self, df, tiempos, tags, operaciones, con_valores, estados):
+        n, k = len(tiempos), len(tags)
+        con_estados = estados is not None
+        tamano = 8 * n + (8 * n * k if con_valores else 0) + (n * k if con_estados else 0)
+        fd, ruta = tempfile.mkstemp(prefix='analitica-', dir=DIRECTORIO_BLOQUES)
+        try:
+            os.ftruncate(fd, tamano)
+            with mmap.mmap(fd, tamano) as bloque:
+                destino_t, destino_v, destino_e = _vistas_bloque(bloque, n, k, con_valores, con_estados)
+                destino_t[:] = tiempos
+                if con_valores:
+                    for j, tag in enumerate(tags):
+                        destino_v[j] = df[tag].to_numpy(dtype='float64')
+                if con_estados:
+                    destino_e[:] = estados.T
+                del destino_t, destino_v, destino_e
+            # Algunas tareas más que procesos para equilibrar la carga
+            limites = np.linspace(0, k, min(k, self.procesos * 4) + 1).astype(int)
+            tareas = [
+                (_tarea, (ruta, n, k, j0, j1, tags[j0:j1], operaciones, con_valores, con_estados))
+                for j0, j1 in zip(limites[:-1], limites[1:]) if j1 > j0
+            ]
+            try:
+                partes = self._obtener_pool().mapear(tareas)
+            except ErrorPool:
+                # Un worker caído: se descarta el pool (el próximo uso lo
+                # vuelve a crear) y esta vez se calcula en serie
+                self.cerrar()
+                partes = [funcion(*argumentos) for funcion, argumentos in tareas]
+        finally:
+            os.close(fd)
+            os.remove(ruta)
+        return _reensamblar(tags, partes, operaciones)
@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+# Medición del costo de cada sección del dashboard por rerun.
+#
+# El script crea un Perfilador al comienzo de cada ejecución y marca sus
+# secciones; con la medición desactivada todas las llamadas son no-ops. Al
+# terminar, las mediciones se publican en RESULTADOS para que un arnés de
+# benchmark las lea, y se pueden exportar en formato de texto de Prometheus
+# o como JSONL. RESULTADOS mezcla los reruns de todas las sesiones del
+# proceso: el panel de diagnóstico exporta los que guarda cada sesión.
+#
+# tracemalloc es global del proceso: lo enciende el primer Perfilador con
+# memoria y lo apaga el último en liberarse (si no estaba ya encendido). Un
+# Perfilador se libera en `terminar` o, si el rerun se corta antes (st.rerun,
+# una excepción), al descartarse el objeto. El pico también es global, así
+# que una sección sólo informa memoria si ningún otro Perfilador la midió a
+# la vez; con varias sesiones midiendo, esas secciones quedan sin dato.
+
+VARIABLE_ENTORNO = 'DASHBOARD_PERFILADO'
+
+# Últimos reruns medidos en este proceso (el más reciente al final)
+RESULTADOS = deque(maxlen=100)
+_lock_resultados = threading.Lock()
+
+_lock_tracemalloc = threading.Lock()
+_usuarios_tracemalloc = 0
+_tracemalloc_propio = False
+
+
+def _tomar_tracemalloc():
+    global _usuarios_tracemalloc, _tracemalloc_propio
+    with _lock_tracemalloc:
+        if _usuarios_tracemalloc == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_propio = True
+        _usuarios_tracemalloc += 1
+
+
+def _soltar_tracemalloc():
+    global _usuarios_tracemalloc, _tracemalloc_propio
+    with _lock_tracemalloc:
+        _usuarios_tracemalloc -= 1
+        if _usuarios_tracemalloc == 0 and _tracemalloc_propio:
+            tracemalloc.stop()
+            _tracemalloc_propio = False
+
+
+# Verdadero si sólo un Perfilador usa tracemalloc (el pico es confiable)
+def _medicion_exclusiva():
+    with _lock_tracemalloc:
+        return _usuarios_tracemalloc == 1
+
+
+class Perfilador:
+    """Tiempo de pared y, opcionalmente, pico de memoria (tracemalloc) por sección."""
+
+    def __init__(self, activo=True, memoria=False):
+        self.activo = activo
+        self.memoria = memoria and activo
+        self.mediciones = []
+        self.graficos = []
+        self._abierta = None
+        self._inicio_rerun = time.perf_counter()
+        self._liberar = None
+        if self.memoria:
+            _tomar_tracemalloc()
+            self._liberar = weakref.finalize(self, _soltar_tracemalloc)
+
+    # Activo según DASHBOARD_PERFILADO: vacío/0 = apagado, 1 = tiempos,
+    # "memoria" = tiempos y memoria
+    @classmethod
+    def desde_entorno(cls):
+        valor = os.environ.get(VARIABLE_ENTORNO, '').strip().lower()
+        if valor in ('', '0', 'false', 'no'):
+            return cls(activo=False)
+        return cls(activo=True, memoria=valor == 'memoria')
+
+    def _abrir(self, nombre):
+        actual, exclusiva = 0, False
+        if self.memoria and _medicion_exclusiva():
+            tracemalloc.reset_peak()
+            actual, _ = tracemalloc.get_traced_memory()
+            exclusiva = True
+        self._abierta = (nombre, time.perf_counter(), actual, exclusiva)
+
+    def _cerrar(self):
+        if self._abierta is None:
+            return
+        nombre, inicio, memoria_inicial, exclusiva = self._abierta
+        medicion = {'seccion': nombre, 'segundos': time.perf_counter() - inicio}
+        if self.memoria:
+            medicion['pico_bytes'] = medicion['neto_bytes'] = None
+            if exclusiva and _medicion_exclusiva():
+                actual, pico = tracemalloc.get_traced_memory()
+                medicion['pico_bytes'] = pico - memoria_inicial
+                medicion['neto_bytes'] = actual - memoria_inicial
+        self.mediciones.append(medicion)
+        self._abierta = None
+
+    # Marca el inicio de una sección y cierra la anterior (modo "vuelta")
+    def marcar(self, nombre):
+        if not self.activo:
+            return
+        self._cerrar()
+        self._abrir(nombre)
+
+    @contextmanager
+    def seccion(self, nombre):
+        if not self.activo:
+            yield
+            return
+        previa = self._abierta
+        self._cerrar()
+        self._abrir(nombre)
+        try:
+            yield
+        finally:
+            self._cerrar()
+            if previa is not None:
+                self._abrir(previa[0])
+
+    # Bytes que un gráfico envía al navegador, atribuidos a la sección abierta
+    def registrar_grafico(self, nombre, bytes_):
+        if not self.activo:
+            return
+        seccion = self._abierta[0] if self._abierta is not None else None
+        self.graficos.append({'seccion': seccion, 'grafico': nombre, 'bytes': int(bytes_)})
+
+    # Cierra la última sección y publica el rerun en RESULTADOS; `extra`
+    # agrega datos del rerun (p. ej. estadísticas de cachés)
+    def terminar(self, **extra):
+        if not self.activo:
+            return None
+        self._cerrar()
+        resultado = {
+            'fecha': time.time(),
+            'secciones': self.mediciones,
+            'graficos': self.graficos,
+            'total_segundos': time.perf_counter() - self._inicio_rerun,
+            **extra,
+        }
+        if self._liberar is not None:
+            self._liberar()
+        with _lock_resultados:
+            RESULTADOS.append(resultado)
+        return resultado
+
+
+def _etiquetas(**valores):
+    if not valores:
+        return ''
+    pares = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in valores.items()
+    )
+    return '{' + pares + '}'
+
+
+# Un rerun medido en formato de texto de Prometheus (para un textfile
+# collector o un endpoint que lo sirva)
+def a_prometheus(resultado, prefijo='dashboard'):
+    lineas = []
+
+    def metrica(nombre, tipo, ayuda, muestras):
+        if not muestras:
+            return
+        lineas.append(f'# HELP {prefijo}_{nombre} {ayuda}')
+        lineas.append(f'# TYPE {prefijo}_{nombre} {tipo}')
+        for etiquetas, valor in muestras:
+            lineas.append(f'{prefijo}_{nombre}{_etiquetas(**etiquetas)} {valor}')
+
+    metrica('rerun_segundos', 'gauge', 'Tiempo de pared del último rerun.',
+            [({}, resultado['total_segundos'])])
+    secciones = resultado['secciones']
+    metrica('seccion_segundos', 'gauge', 'Tiempo de pared por sección en el último rerun.',
+            [({'seccion': m['seccion']}, m['segundos']) for m in secciones])
+    metrica('seccion_pico_bytes', 'gauge', 'Pico de memoria asignada (tracemalloc) por sección.',
+            [({'seccion': m['seccion']}, m['pico_bytes']) for m in secciones if m.get('pico_bytes') is not None])
+    metrica('grafico_bytes', 'gauge', 'Bytes enviados al navegador por gráfico.',
+            [({'seccion': g['seccion'], 'grafico': g['grafico']}, g['bytes'])
+             for g in resultado.get('graficos', [])])
+    caches = resultado.get('caches', {})
+    for campo, tipo, ayuda in (
+        ('aciertos', 'counter', 'Aciertos acumulados de la caché.'),
+        ('fallos', 'counter', 'Fallos acumulados de la caché.'),
+        ('tasa_aciertos', 'gauge', 'Proporción de aciertos de la caché.'),
+        ('bytes', 'gauge', 'Bytes ocupados por la caché.'),
+    ):
+        nombre = f'cache_{campo}_total' if tipo == 'counter' else f'cache_{campo}'
+        metrica(nombre, tipo, ayuda,
+                [({'cache': c}, e[campo]) for c, e in caches.items() if campo in e])
+    return '\n'.join(lineas) + '\n'
+
+
+# Reruns medidos como JSON Lines (uno por línea, del más viejo al más nuevo)
+def a_jsonl(resultados):
+    return ''.join(json.dumps(r, default=float) + '\n' for r in resultados)
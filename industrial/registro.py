@@ -0,0 +1,171 @@
+import os
+import tomllib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Registro de metadatos de tags.
+#
+# Lo que el dashboard sabe de cada tag (nombre visible, unidad, bandas de
+# estado, color, prioridad, si va en la vista combinada y cambio máximo por
+# minuto) se declara en un archivo TOML (tags.toml) y se
+# carga una sola vez en arreglos paralelos indexados por un id entero. Los
+# caminos calientes traducen nombres a ids con un solo get_indexer y toman
+# etiquetas, bandas y colores ya calculados: sumar cientos de tags es editar
+# el archivo, sin trabajo de cadenas en cada rerun.
+#
+# Un tag que no figura en el archivo recibe valores por defecto: etiqueta
+# derivada del nombre, sin unidad ni bandas, color de la paleta y sin
+# prioridad.
+
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(__file__), 'tags.toml')
+
+PALETA = (
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+)
+
+# Prioridad de los tags que no la declaran (van siempre al final)
+SIN_PRIORIDAD = np.iinfo(np.int32).max
+
+
+def etiqueta_por_defecto(nombre):
+    return nombre.replace('_', ' ').title()
+
+
+class RegistroTags:
+    """Metadatos en arreglos paralelos; el id de un tag es su posición."""
+
+    __slots__ = ('nombres', 'indice', 'etiquetas', 'unidades', 'bandas', 'con_umbral',
+                 'colores', 'prioridades', 'cambios_maximos', 'combinada')
+
+    def __init__(self, nombres, etiquetas, unidades, bandas, colores, prioridades, cambios_maximos=None,
+                 combinada=None):
+        self.nombres = np.asarray(nombres, dtype=object)
+        self.indice = pd.Index(self.nombres)
+        if not self.indice.is_unique:
+            raise ValueError(f"Tags repetidos en el registro: {sorted(self.indice[self.indice.duplicated()])}")
+        self.etiquetas = np.asarray(etiquetas, dtype=object)
+        self.unidades = np.asarray(unidades, dtype=object)
+        # Columnas bueno_min, bueno_max, adv_min, adv_max (NaN sin bandas)
+        self.bandas = np.asarray(bandas, dtype='float64').reshape(len(self.nombres), 4)
+        self.con_umbral = ~np.isnan(self.bandas).any(axis=1)
+        self.colores = np.asarray(colores, dtype=object)
+        self.prioridades = np.asarray(prioridades, dtype='int32')
+        if cambios_maximos is None:
+            cambios_maximos = np.full(len(self.nombres), np.nan)
+        self.cambios_maximos = np.asarray(cambios_maximos, dtype='float64')
+        if combinada is None:
+            combinada = np.zeros(len(self.nombres), dtype=bool)
+        self.combinada = np.asarray(combinada, dtype=bool)
+
+    @classmethod
+    def desde_entradas(cls, entradas):
+        nombres, etiquetas, unidades, bandas, colores, prioridades, cambios, combinada = ([] for _ in range(8))
+        for k, entrada in enumerate(entradas):
+            nombre = entrada['nombre']
+            bueno, advertencia = entrada.get('bueno'), entrada.get('advertencia')
+            if (bueno is None) != (advertencia is None):
+                raise ValueError(f"El tag {nombre!r} necesita las bandas 'bueno' y 'advertencia' juntas")
+            nombres.append(nombre)
+            etiquetas.append(entrada.get('etiqueta') or etiqueta_por_defecto(nombre))
+            unidades.append(entrada.get('unidad', ''))
+            bandas.append((*bueno, *advertencia) if bueno is not None else (np.nan,) * 4)
+            colores.append(entrada.get('color') or PALETA[k % len(PALETA)])
+            prioridades.append(entrada.get('prioridad', SIN_PRIORIDAD))
+            cambios.append(entrada.get('cambio_maximo', np.nan))
+            combinada.append(entrada.get('combinada', False))
+        return cls(nombres, etiquetas, unidades, bandas, colores, prioridades, cambios, combinada)
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        with open(ruta, 'rb') as archivo:
+            return cls.desde_entradas(tomllib.load(archivo).get('tag', []))
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def __contains__(self, tag):
+        return tag in self.indice
+
+    # Registro con todos los `tags` (los que faltan, con valores por defecto)
+    def ampliar(self, tags):
+        faltantes = [t for t in dict.fromkeys(tags) if t not in self.indice]
+        if not faltantes:
+            return self
+        n = len(self)
+        return RegistroTags(
+            np.concatenate([self.nombres, np.asarray(faltantes, dtype=object)]),
+            np.concatenate([self.etiquetas, [etiqueta_por_defecto(t) for t in faltantes]]),
+            np.concatenate([self.unidades, [''] * len(faltantes)]),
+            np.vstack([self.bandas, np.full((len(faltantes), 4), np.nan)]),
+            np.concatenate([self.colores, [PALETA[(n + k) % len(PALETA)] for k in range(len(faltantes))]]),
+            np.concatenate([self.prioridades, np.full(len(faltantes), SIN_PRIORIDAD, dtype='int32')]),
+            np.concatenate([self.cambios_maximos, np.full(len(faltantes), np.nan)]),
+            np.concatenate([self.combinada, np.zeros(len(faltantes), dtype=bool)]),
+        )
+
+    # Ids de `tags` (-1 para los que no están registrados)
+    def ids(self, tags):
+        return self.indice.get_indexer(pd.Index(tags, dtype=object))
+
+    def id(self, tag):
+        return self.indice.get_loc(tag)
+
+    def etiqueta(self, tag):
+        return self.etiquetas[self.id(tag)]
+
+    # Etiquetas de una lista, Serie o arreglo de nombres (los no registrados
+    # se devuelven tal cual)
+    def etiquetar(self, tags):
+        etiquetas = np.array(tags, dtype=object)
+        ids = self.ids(etiquetas)
+        registrados = ids >= 0
+        etiquetas[registrados] = self.etiquetas[ids[registrados]]
+        return etiquetas
+
+    def unidad(self, tag):
+        return self.unidades[self.id(tag)]
+
+    def color(self, tag):
+        return self.colores[self.id(tag)]
+
+    def colores_de(self, tags):
+        return list(self.colores[self.ids(tags)])
+
+    # Bandas (k × 4) de `tags`, en ese orden; NaN si no tienen
+    def bandas_de(self, tags):
+        ids = self.ids(tags)
+        bandas = np.full((len(ids), 4), np.nan)
+        registrados = ids >= 0
+        bandas[registrados] = self.bandas[ids[registrados]]
+        return bandas
+
+    # Cambio máximo por minuto de `tags` (NaN si no lo declaran)
+    def cambios_maximos_de(self, tags):
+        ids = self.ids(tags)
+        cambios = np.full(len(ids), np.nan)
+        cambios[ids >= 0] = self.cambios_maximos[ids[ids >= 0]]
+        return cambios
+
+    # Tags de `tags` con prioridad declarada, de la más alta a la más baja;
+    # con `combinada`, sólo los marcados para la vista combinada
+    def principales(self, tags, n=None, combinada=False):
+        tags = np.asarray(list(tags), dtype=object)
+        ids = self.ids(tags)
+        registrados = ids >= 0
+        if combinada:
+            registrados[registrados] = self.combinada[ids[registrados]]
+        prioridades = np.full(len(ids), SIN_PRIORIDAD, dtype='int32')
+        prioridades[registrados] = self.prioridades[ids[registrados]]
+        orden = np.argsort(prioridades, kind='stable')
+        orden = orden[prioridades[orden] < SIN_PRIORIDAD]
+        return list(tags[orden[:n]])
+
+
+# Registro del proceso: el archivo de DASHBOARD_TAGS o el tags.toml del
+# paquete, leído una sola vez
+@lru_cache(maxsize=4)
+def cargar_registro(ruta=None):
+    return RegistroTags.desde_archivo(ruta or os.environ.get('DASHBOARD_TAGS') or RUTA_POR_DEFECTO)
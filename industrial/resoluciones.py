@@ -0,0 +1,163 @@
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from industrial.estadisticas import EstadisticasIncrementales
+
+# Niveles de resolución precalculados (rollups).
+#
+# Además de los datos crudos del almacén se mantienen cubetas de 1 minuto,
+# 15 minutos y 1 hora con conteo, media, mínimo y máximo por tag. Una
+# consulta por rango usa el nivel más grueso que todavía entrega suficientes
+# puntos para el gráfico, así que ver un mes cuesta lo mismo que ver una hora.
+# Los niveles se actualizan sólo con las muestras nuevas.
+
+CRUDO = 'Crudo'
+
+
+# Resumen de las filas de `df` hasta `hasta_ns` inclusive (todas si es None):
+# cantidad y hash de tiempos y valores, para saber si un día sólo creció
+def _huella(df, tags, hasta_ns=None):
+    tiempos = df['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+    filas = len(tiempos) if hasta_ns is None else int(np.searchsorted(tiempos, hasta_ns, side='right'))
+    resumen = hashlib.blake2b(tiempos[:filas].tobytes(), digest_size=16)
+    resumen.update(np.ascontiguousarray(df[tags].to_numpy(dtype='float64')[:filas]).tobytes())
+    return filas, resumen.digest()
+
+
+class Nivel:
+    __slots__ = ('nombre', 'cubeta', 'retencion')
+
+    def __init__(self, nombre, cubeta, retencion):
+        self.nombre = nombre
+        self.cubeta = pd.Timedelta(cubeta)
+        self.retencion = pd.Timedelta(retencion)
+
+
+# De más fino a más grueso; la retención acota la memoria de cada nivel
+NIVELES = (
+    Nivel('1 min', '1min', '2D'),
+    Nivel('15 min', '15min', '8D'),
+    Nivel('1 hora', '1h', '35D'),
+)
+
+# Puntos mínimos que debe aportar un nivel para usarse en un gráfico
+PUNTOS_MINIMOS = 200
+
+
+class RollupMultinivel:
+    """Cubetas de varios niveles para un conjunto de tags, alimentadas desde un almacén."""
+
+    def __init__(self, tags, niveles=NIVELES, puntos_minimos=PUNTOS_MINIMOS):
+        self.tags = list(tags)
+        self.niveles = list(niveles)
+        self.puntos_minimos = puntos_minimos
+        self._agregados = {
+            n.nombre: EstadisticasIncrementales(self.tags, cubeta_ns=n.cubeta.value)
+            for n in self.niveles
+        }
+        self._versiones = {}
+        self._huellas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ultimo_ns(self):
+        return self._agregados[self.niveles[0].nombre].ultimo_ns
+
+    def actualizar(self, df):
+        procesadas = 0
+        for agregados in self._agregados.values():
+            procesadas = agregados.actualizar(df)
+        if procesadas:
+            self._podar()
+        return procesadas
+
+    # Vuelve a agregar el día `dia` completo en todos los niveles (todas las
+    # cubetas caben en un día, así que sus bordes coinciden con los del día)
+    def reemplazar_dia(self, df, dia):
+        inicio = pd.Timestamp(dia)
+        for agregados in self._agregados.values():
+            agregados.reemplazar(df, inicio, inicio + pd.Timedelta(days=1))
+        self._podar()
+
+    def _podar(self):
+        if self.ultimo_ns is not None:
+            for nivel in self.niveles:
+                self._agregados[nivel.nombre].podar(pd.Timestamp(self.ultimo_ns) - nivel.retencion)
+
+    # Incorpora los días del almacén cuya versión cambió desde la última vez
+    # (memoria acotada a una partición). Un día posterior a la última muestra
+    # agregada sólo puede traer muestras nuevas y se continúa; el de la última
+    # muestra se continúa si conserva intactas las filas ya agregadas (misma
+    # huella), y cualquier otro día que cambió se vuelve a agregar completo.
+    def sincronizar(self, almacen):
+        with self._lock:
+            dias = almacen.dias()
+            if not dias:
+                return
+            retencion = max(n.retencion for n in self.niveles)
+            limite = pd.Timestamp(dias[-1]) + pd.Timedelta(days=1) - retencion
+            versiones = {d: almacen.version_dia(d) for d in dias if pd.Timestamp(d) >= limite}
+            for dia, version in versiones.items():
+                if self._versiones.get(dia) == version:
+                    continue
+                df = almacen.leer_dia(dia, self.tags)
+                if self.ultimo_ns is None or pd.Timestamp(dia) > pd.Timestamp(self.ultimo_ns):
+                    self.actualizar(df)
+                elif (pd.Timestamp(dia) == pd.Timestamp(self.ultimo_ns).normalize()
+                        and self._huellas.get(dia) == _huella(df, self.tags, self.ultimo_ns)):
+                    self.actualizar(df)
+                else:
+                    self.reemplazar_dia(df, dia)
+                self._huellas[dia] = _huella(df, self.tags)
+            self._versiones = versiones
+            self._huellas = {d: h for d, h in self._huellas.items() if d in versiones}
+
+    # Nivel más grueso con al menos `puntos_minimos` cubetas en el rango y
+    # que todavía conserve su inicio (None = datos crudos)
+    def elegir_nivel(self, inicio, fin):
+        inicio = pd.Timestamp(inicio)
+        duracion = pd.Timestamp(fin) - inicio
+        if self.ultimo_ns is None:
+            return None
+        elegido = None
+        for nivel in self.niveles:
+            if duracion / nivel.cubeta < self.puntos_minimos:
+                break
+            if inicio < pd.Timestamp(self.ultimo_ns).floor(nivel.cubeta) - nivel.retencion:
+                continue
+            elegido = nivel
+        return elegido
+
+    # Series del rango [inicio, fin) por tag, desde el nivel adecuado:
+    # (nombre del nivel, {tag: DataFrame Fecha, Promedio, Mínimo, Máximo, Muestras})
+    def consultar(self, almacen, inicio, fin, tags):
+        nivel = self.elegir_nivel(inicio, fin)
+        if nivel is None:
+            crudos = almacen.leer_rango(inicio, fin, tags)
+            return CRUDO, {
+                tag: pd.DataFrame({
+                    'Fecha': crudos['Fecha'],
+                    'Promedio': crudos[tag],
+                    'Mínimo': crudos[tag],
+                    'Máximo': crudos[tag],
+                    'Muestras': np.ones(len(crudos), dtype='int64'),
+                })
+                for tag in tags
+            }
+        inicios, cubetas = self._agregados[nivel.nombre].cubetas(inicio, fin)
+        fechas = pd.to_datetime(inicios)
+        series = {}
+        for tag in tags:
+            k = self.tags.index(tag)
+            con_datos = cubetas.conteo[:, k] > 0
+            series[tag] = pd.DataFrame({
+                'Fecha': fechas[con_datos],
+                'Promedio': cubetas.promedio[con_datos, k],
+                'Mínimo': cubetas.minimo[con_datos, k],
+                'Máximo': cubetas.maximo[con_datos, k],
+                'Muestras': cubetas.conteo[con_datos, k],
+            })
+        return nivel.nombre, series
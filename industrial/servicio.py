@@ -0,0 +1,334 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from industrial.anomalias import DetectorAnomalias
+from industrial.cache import tamano_bytes
+from industrial.correlacion import CorrelacionIncremental
+from industrial.estadisticas import EstadisticasIncrementales
+from industrial.estados import clasificar, intervalos_alarma, tabla_umbrales
+from industrial.kpis import KPIsIncrementales
+from industrial.registro import cargar_registro
+
+# Servicio de vistas derivadas compartido por todas las sesiones.
+#
+# Un solo objeto por proceso calcula, una vez por versión de los datos de un
+# día, todo lo que el dashboard deriva de ellos: valores actuales, matriz de
+# estados, historial de alarmas, agregados por hora, tiempo en cada estado
+# (disponibilidad), correlación y anomalías. Las
+# sesiones sólo leen la última instantánea publicada, así que el costo de
+# CPU no crece con la cantidad de pantallas conectadas.
+#
+# Un hilo de fondo vigila los días que alguna sesión consultó hace poco y
+# publica la instantánea nueva apenas cambia la partición; quien necesite
+# enterarse sin sondear puede bloquear en `esperar`.
+#
+# El detector de anomalías es lo único que cuesta por fila en Python: cuando
+# a un día le faltan muchas filas (la primera lectura de un día de alta
+# frecuencia) se pone al día en un hilo aparte, por tramos, y la instantánea
+# se publica sin esperarlo; cada tramo republica la misma versión con los
+# eventos hasta donde llegó.
+
+
+# Último valor finito de cada tag en el día y el anterior a él (NaN si no
+# hay): un corte de señal no deja las tarjetas en "nan". Sólo se recorre la
+# columna completa de los tags a los que les falta alguna de las dos últimas
+# muestras.
+def _ultimos_finitos(datos, tags):
+    actuales = np.full(len(tags), np.nan)
+    previos = np.full(len(tags), np.nan)
+    for j, tag in enumerate(tags):
+        if tag not in datos:
+            continue
+        columna = datos[tag].to_numpy(dtype='float64')
+        finitos = columna[-2:][np.isfinite(columna[-2:])]
+        if len(finitos) < 2:
+            finitos = columna[np.isfinite(columna)][-2:]
+        if len(finitos):
+            actuales[j] = finitos[-1]
+        if len(finitos) > 1:
+            previos[j] = finitos[-2]
+    return pd.Series(actuales, index=tags), pd.Series(previos, index=tags)
+
+
+class VistasDia:
+    """Instantánea inmutable de las vistas de un día para una versión de datos.
+
+    `estadisticas`, `kpis` y `correlacion` son copias de sólo lectura de los
+    objetos incrementales del día tomadas al publicar: el hilo del servicio
+    sigue actualizando los originales sin que las sesiones lo noten.
+    """
+
+    __slots__ = (
+        'dia', 'version', 'tags', 'datos', 'valores_actuales', 'valores_previos',
+        'matriz_estados', 'estados_actuales', 'historial_alarmas', 'estadisticas', 'resumen',
+        'kpis', 'resumen_kpis', 'correlacion', 'matriz_correlacion', 'anomalias',
+        'anomalias_al_dia', 'publicada',
+    )
+
+    def __init__(self, **campos):
+        for nombre in self.__slots__:
+            setattr(self, nombre, campos.get(nombre))
+
+    # Copia con algunos campos reemplazados
+    def con(self, **campos):
+        return VistasDia(**{**{n: getattr(self, n) for n in self.__slots__}, **campos})
+
+
+class _EstadoDia:
+    """Objetos incrementales de un día (se actualizan sólo con filas nuevas)."""
+
+    def __init__(self, tags, tabla, registro):
+        self.estadisticas = EstadisticasIncrementales(tags)
+        self.kpis = KPIsIncrementales(tags, tabla.con_umbral)
+        self.correlacion = CorrelacionIncremental(tags)
+        self.anomalias = DetectorAnomalias(tags, cambio_maximo=registro.cambios_maximos_de(tags))
+        self.lock = threading.Lock()
+        # Hilo que pone al día el detector de anomalías (None si está al día)
+        self.al_dia = None
+        self.vistas = None
+        self.ultimo_acceso = time.monotonic()
+
+
+class ServicioVistas:
+    """Calcula y publica VistasDia; a lo sumo `max_dias` días en memoria.
+
+    Los días retenidos además no superan en conjunto `presupuesto_bytes`
+    (datos y matriz de estados de sus instantáneas más el estado de los
+    objetos incrementales); se descartan los usados hace más tiempo, nunca el
+    último consultado.
+
+    Las bandas y los límites de cambio salen de `registro` (por defecto, el
+    del proceso). Con `cache` (una CacheCompartida) las lecturas del día pasan por ella,
+    con la versión de la partición en la clave. Con `ejecutor` (un
+    EjecutorAnalitico) la extracción de intervalos de alarma se reparte
+    entre procesos cuando hay muchos tags. Más de `max_filas_anomalias`
+    filas sin pasar por el detector de anomalías se procesan en segundo
+    plano.
+    """
+
+    def __init__(self, almacen, tags=None, registro=None, cache=None, ejecutor=None, max_dias=8,
+                 presupuesto_bytes=256 * 2**20, periodo=1.0, inactividad=300.0, max_filas_anomalias=2000):
+        self.almacen = almacen
+        self.cache = cache
+        self.ejecutor = ejecutor
+        self.tags = list(tags or almacen.tags)
+        self.registro = registro or cargar_registro()
+        self.max_dias = max_dias
+        self.presupuesto_bytes = presupuesto_bytes
+        self.periodo = periodo
+        self.inactividad = inactividad
+        self.max_filas_anomalias = max_filas_anomalias
+        self.calculos = 0
+        self.lecturas = 0
+        self._tabla = tabla_umbrales(self.tags, self.registro)
+        self._dias = OrderedDict()
+        self._lock = threading.Lock()
+        self._publicacion = threading.Condition(self._lock)
+        self._detener = threading.Event()
+        self._hilo = None
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        if self.activo:
+            return self
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name='servicio-vistas', daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self, espera=None):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(espera)
+
+    def _ciclo(self):
+        while not self._detener.wait(self.periodo):
+            limite = time.monotonic() - self.inactividad
+            with self._lock:
+                dias = [(d, e) for d, e in self._dias.items() if e.ultimo_acceso >= limite]
+            for dia, estado in dias:
+                try:
+                    self._refrescar(dia, estado)
+                except Exception:  # un día ilegible no detiene al resto
+                    pass
+
+    def _estado(self, dia):
+        with self._lock:
+            estado = self._dias.get(dia)
+            if estado is None:
+                estado = self._dias[dia] = _EstadoDia(self.tags, self._tabla, self.registro)
+                self._podar()
+            return estado
+
+    # Descarta los días usados hace más tiempo mientras se excedan `max_dias`
+    # o el presupuesto de bytes (con self._lock tomado)
+    def _podar(self):
+        ocupado = sum(self._bytes(e) for e in self._dias.values())
+        while len(self._dias) > 1 and (len(self._dias) > self.max_dias or ocupado > self.presupuesto_bytes):
+            _, estado = self._dias.popitem(last=False)
+            ocupado -= self._bytes(estado)
+
+    @staticmethod
+    def _bytes(estado):
+        incrementales = (estado.estadisticas.nbytes + estado.kpis.nbytes + estado.correlacion.nbytes
+                         + estado.anomalias.nbytes)
+        vistas = estado.vistas
+        if vistas is None:
+            return incrementales
+        return incrementales + tamano_bytes(vistas.datos) + vistas.matriz_estados.nbytes
+
+    # Instantánea vigente del día; sólo la primera sesión que llega tras un
+    # cambio de versión la calcula, el resto la recibe ya hecha
+    def vistas(self, dia):
+        estado = self._estado(dia)
+        estado.ultimo_acceso = time.monotonic()
+        vistas = self._refrescar(dia, estado)
+        with self._lock:
+            self.lecturas += 1
+            if self._dias.get(dia) is estado:
+                self._dias.move_to_end(dia)
+        return vistas
+
+    def _refrescar(self, dia, estado):
+        version = self.almacen.version_dia(dia)
+        previas = estado.vistas
+        if previas is not None and previas.version == version:
+            return previas
+        with estado.lock:
+            previas = estado.vistas
+            if previas is not None and previas.version == version:
+                return previas
+            vistas = self._calcular(dia, version, estado, previas)
+            # Se publica sin soltar estado.lock: así ninguna republicación de
+            # _poner_al_dia puede quedar después con una versión anterior
+            with self._publicacion:
+                estado.vistas = vistas
+                self.calculos += 1
+                if estado.al_dia is not None and estado.al_dia.ident is None:
+                    estado.al_dia.start()
+                self._podar()
+                self._publicacion.notify_all()
+        return vistas
+
+    # Procesa por tramos las filas pendientes del detector de anomalías de la
+    # instantánea vigente y la republica tras cada tramo
+    def _poner_al_dia(self, estado):
+        al_dia = False
+        while not al_dia:
+            with estado.lock:
+                vistas = estado.vistas
+                estado.anomalias.actualizar(vistas.datos, self.max_filas_anomalias)
+                al_dia = estado.anomalias.pendientes(vistas.datos) == 0
+                if al_dia:
+                    estado.al_dia = None
+                with self._publicacion:
+                    estado.vistas = vistas.con(anomalias=estado.anomalias.eventos(), anomalias_al_dia=al_dia)
+                    self._publicacion.notify_all()
+
+    def _calcular(self, dia, version, estado, previas):
+        datos = self._leer(dia, version)
+        valores = datos[self.tags].to_numpy(dtype='float64')
+        # Si sólo se agregaron filas al final se clasifican únicamente esas;
+        # cualquier otra reescritura recalcula todo desde cero
+        n_previas = 0 if previas is None else len(previas.datos)
+        if n_previas and self._solo_crecio(previas.datos, datos, valores):
+            matriz_estados = np.concatenate(
+                [previas.matriz_estados, clasificar(valores[n_previas:], self._tabla)]
+            ) if len(datos) > n_previas else previas.matriz_estados
+        else:
+            matriz_estados = clasificar(valores, self._tabla)
+            estado.estadisticas.reiniciar()
+            estado.kpis.reiniciar()
+            estado.correlacion.reiniciar()
+            estado.anomalias.reiniciar()
+        matriz_estados.flags.writeable = False
+        estado.estadisticas.actualizar(datos)
+        estado.kpis.actualizar(datos['Fecha'], matriz_estados)
+        estado.correlacion.actualizar(datos)
+        if estado.al_dia is None:
+            if estado.anomalias.pendientes(datos) <= self.max_filas_anomalias:
+                estado.anomalias.actualizar(datos)
+            else:
+                estado.al_dia = threading.Thread(
+                    target=self._poner_al_dia, args=(estado,), name='anomalias-al-dia', daemon=True
+                )
+        ultimos, previos = _ultimos_finitos(datos, self.tags)
+        return VistasDia(
+            dia=dia,
+            version=version,
+            tags=self.tags,
+            datos=datos,
+            valores_actuales=ultimos,
+            valores_previos=previos,
+            matriz_estados=matriz_estados,
+            estados_actuales=dict(zip(self.tags, matriz_estados[-1])) if len(matriz_estados) else {},
+            historial_alarmas=self._alarmas(datos, matriz_estados),
+            estadisticas=estado.estadisticas.instantanea(),
+            resumen=estado.estadisticas.resumen(),
+            kpis=estado.kpis.instantanea(),
+            resumen_kpis=estado.kpis.resumen(),
+            correlacion=estado.correlacion.instantanea(),
+            matriz_correlacion=estado.correlacion.matriz(),
+            anomalias=estado.anomalias.eventos(),
+            anomalias_al_dia=estado.al_dia is None,
+            publicada=time.time(),
+        )
+
+    # True si `datos` conserva intactas (tiempos y valores) todas las filas de
+    # `previos`, es decir, si la nueva versión sólo agregó filas al final
+    def _solo_crecio(self, previos, datos, valores):
+        n = len(previos)
+        if len(datos) < n:
+            return False
+        tiempos = datos['Fecha'].to_numpy(dtype='datetime64[ns]')[:n]
+        return (np.array_equal(previos['Fecha'].to_numpy(dtype='datetime64[ns]'), tiempos)
+                and np.array_equal(previos[self.tags].to_numpy(dtype='float64'), valores[:n], equal_nan=True))
+
+    def _alarmas(self, datos, matriz_estados):
+        if self.ejecutor is not None and len(self.tags) >= self.ejecutor.min_tags:
+            return self.ejecutor.analizar(
+                datos, self.tags, alarmas=True, estados=matriz_estados, registro=self.registro
+            ).alarmas
+        return intervalos_alarma(datos['Fecha'].to_numpy(), matriz_estados, self.tags)
+
+    def _leer(self, dia, version):
+        if self.cache is None:
+            return self.almacen.leer_dia(dia, self.tags)
+        inicio = pd.Timestamp(dia)
+        return self.cache.obtener(
+            ('dia', dia, tuple(self.tags), version),
+            lambda: self.almacen.leer_dia(dia, self.tags),
+            rango=(inicio, inicio + pd.Timedelta(days=1)),
+            tags=self.tags
+        )
+
+    # Bloquea hasta que el día tenga una versión distinta de `version` (o
+    # venza el timeout); devuelve la instantánea vigente
+    def esperar(self, dia, version, timeout=None):
+        estado = self._estado(dia)
+        with self._publicacion:
+            self._publicacion.wait_for(
+                lambda: estado.vistas is not None and estado.vistas.version != version, timeout
+            )
+            return estado.vistas
+
+    # Descarta lo calculado del día (se recalcula desde cero en la próxima lectura)
+    def invalidar(self, dia):
+        with self._lock:
+            self._dias.pop(dia, None)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'dias': len(self._dias),
+                'calculos': self.calculos,
+                'lecturas': self.lecturas,
+                'activo': self.activo,
+            }
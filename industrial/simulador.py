@@ -0,0 +1,237 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Simulador de planta para pruebas de carga.
+#
+# Genera cualquier cantidad de tags a cualquier frecuencia, por bloques, sin
+# tener nunca el conjunto completo en memoria. Cada señal combina:
+#   media + deriva lineal (se reinicia en cada mantenimiento) + ciclo diario + ruido
+#   + escalones (cambios de régimen) + excursiones de alarma + caídas (NaN)
+# Los eventos (escalones, excursiones, caídas) se deciden con un hash del
+# (semilla, tag, ventana de tiempo), así que son reproducibles y no dependen
+# de cómo se parta la generación en bloques. El ruido usa un generador
+# sembrado por (semilla, día, bloque).
+
+
+class ConfigTag:
+    """Parámetros de la señal simulada de un tag."""
+
+    __slots__ = (
+        'nombre', 'media', 'desviacion', 'deriva_dia', 'ciclo_diario',
+        'prob_escalon', 'magnitud_escalon', 'duracion_escalon',
+        'prob_excursion', 'magnitud_excursion', 'duracion_excursion',
+        'prob_caida', 'duracion_caida',
+    )
+
+    def __init__(self, nombre, media, desviacion, deriva_dia=0.0, ciclo_diario=0.0,
+                 prob_escalon=0.05, magnitud_escalon=None, duracion_escalon='2h',
+                 prob_excursion=0.02, magnitud_excursion=None, duracion_excursion='10min',
+                 prob_caida=0.005, duracion_caida='5min'):
+        self.nombre = nombre
+        self.media = media
+        self.desviacion = desviacion
+        self.deriva_dia = deriva_dia
+        self.ciclo_diario = ciclo_diario
+        self.prob_escalon = prob_escalon
+        self.magnitud_escalon = 1.5 * desviacion if magnitud_escalon is None else magnitud_escalon
+        self.duracion_escalon = pd.Timedelta(duracion_escalon)
+        self.prob_excursion = prob_excursion
+        self.magnitud_excursion = 4 * desviacion if magnitud_excursion is None else magnitud_excursion
+        self.duracion_excursion = pd.Timedelta(duracion_excursion)
+        self.prob_caida = prob_caida
+        self.duracion_caida = pd.Timedelta(duracion_caida)
+
+
+# Tags de la planta (media, desviación) tal como los muestra el dashboard
+TAGS_PLANTA = [
+    ConfigTag('Temperatura_Reactor_1', 250, 10, ciclo_diario=3),
+    ConfigTag('Presion_Sistema', 15, 2),
+    ConfigTag('Flujo_Entrada', 100, 5, ciclo_diario=2),
+    ConfigTag('Nivel_Tanque', 75, 8, deriva_dia=-1),
+    ConfigTag('Consumo_Energia', 450, 25, ciclo_diario=30),
+    ConfigTag('pH_Proceso', 7.2, 0.3),
+    ConfigTag('Vibration_Motor', 0.5, 0.1, deriva_dia=0.01),
+    ConfigTag('Eficiencia_Proceso', 85, 5),
+]
+
+
+# Los primeros tags son los de la planta; el resto, Sensor_NNN con escalas
+# variadas pero reproducibles
+def configurar_tags(n_tags, semilla=42):
+    tags = TAGS_PLANTA[:n_tags]
+    rng = np.random.default_rng(semilla)
+    for k in range(max(0, n_tags - len(TAGS_PLANTA))):
+        media = float(10 ** rng.uniform(-1, 3))
+        tags.append(ConfigTag(
+            f'Sensor_{k:03d}', media, media * rng.uniform(0.01, 0.1),
+            deriva_dia=media * rng.normal(0, 0.005), ciclo_diario=media * rng.uniform(0, 0.03)
+        ))
+    return tags
+
+
+# splitmix64 vectorizado: uniforme en [0, 1) para cada (semilla, tag, ventana)
+def _uniforme_hash(semilla, tag, ventanas, sal):
+    with np.errstate(over='ignore'):
+        x = (np.asarray(ventanas, dtype=np.uint64)
+             + np.uint64(semilla) * np.uint64(0x9E3779B97F4A7C15)
+             + np.uint64(tag) * np.uint64(0xBF58476D1CE4E5B9)
+             + np.uint64(sal) * np.uint64(0x94D049BB133111EB))
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype('float64') / float(1 << 53)
+
+
+class SimuladorPlanta:
+    """Generador reproducible y por bloques de series de proceso."""
+
+    def __init__(self, tags, frecuencia='1s', semilla=42, origen='2024-01-01',
+                 dias_mantenimiento=7, celdas_por_bloque=4_000_000):
+        self.tags = list(tags)
+        self.dias_mantenimiento = dias_mantenimiento
+        self.frecuencia = pd.Timedelta(frecuencia)
+        self.semilla = semilla
+        self.origen = pd.Timestamp(origen)
+        self.celdas_por_bloque = celdas_por_bloque
+        self._medias = np.array([t.media for t in self.tags], dtype='float64')
+        self._desv = np.array([t.desviacion for t in self.tags], dtype='float64')
+        self._deriva = np.array([t.deriva_dia for t in self.tags], dtype='float64')
+        self._ciclo = np.array([t.ciclo_diario for t in self.tags], dtype='float64')
+
+    @property
+    def nombres(self):
+        return [t.nombre for t in self.tags]
+
+    @property
+    def filas_por_bloque(self):
+        return max(1, self.celdas_por_bloque // max(len(self.tags), 1))
+
+    def generar(self, inicio, fin):
+        """Itera DataFrames anchos (Fecha + tags) que cubren [inicio, fin).
+
+        Los bloques nunca cruzan la medianoche, así que cada uno cae en una
+        sola partición diaria del almacén.
+        """
+        inicio = pd.Timestamp(inicio).ceil(self.frecuencia)
+        fin = pd.Timestamp(fin)
+        dia = inicio.normalize()
+        while dia < fin:
+            desde = max(inicio, dia)
+            hasta = min(fin, dia + pd.Timedelta(days=1))
+            fechas_dia = pd.date_range(dia, dia + pd.Timedelta(days=1), freq=self.frecuencia, inclusive='left')
+            # Bloques alineados al día: la misma muestra cae siempre en el mismo
+            # bloque (y recibe el mismo ruido) sin importar el rango pedido
+            for b, i in enumerate(range(0, len(fechas_dia), self.filas_por_bloque)):
+                fechas = fechas_dia[i:i + self.filas_por_bloque]
+                if fechas[-1] < desde or fechas[0] >= hasta:
+                    continue
+                bloque = self._bloque(fechas, dia, b)
+                seleccion = (bloque['Fecha'] >= desde) & (bloque['Fecha'] < hasta)
+                yield bloque[seleccion.to_numpy()].reset_index(drop=True)
+            dia += pd.Timedelta(days=1)
+
+    def generar_dataframe(self, inicio, fin):
+        partes = list(self.generar(inicio, fin))
+        if not partes:
+            return pd.DataFrame(columns=['Fecha', *self.nombres])
+        return pd.concat(partes, ignore_index=True)
+
+    # Escribe [inicio, fin) en un almacén; devuelve filas escritas. Los
+    # bloques se juntan por día y cada partición se escribe una sola vez
+    # (escribir bloque por bloque reescribiría el día entero en cada uno)
+    def escribir_en_almacen(self, almacen, inicio, fin, progreso=None):
+        filas = 0
+        pendientes = []
+
+        def volcar():
+            nonlocal filas
+            dia = pd.concat(pendientes, ignore_index=True)
+            almacen.escribir(dia)
+            filas += len(dia)
+            pendientes.clear()
+            if progreso is not None:
+                progreso(filas, dia['Fecha'].iloc[-1])
+
+        for bloque in self.generar(inicio, fin):
+            if not len(bloque):
+                continue
+            if pendientes and bloque['Fecha'].iloc[0].normalize() != pendientes[0]['Fecha'].iloc[0].normalize():
+                volcar()
+            pendientes.append(bloque)
+        if pendientes:
+            volcar()
+        return filas
+
+    def _bloque(self, fechas, dia, indice):
+        n, k = len(fechas), len(self.tags)
+        t_ns = fechas.as_unit('ns').asi8 - self.origen.value
+        dias = t_ns / 86400e9
+        rng = np.random.default_rng([self.semilla, int(dia.value // 86400e9) + 10**6, indice])
+        valores = (
+            self._medias
+            + np.outer(dias % self.dias_mantenimiento, self._deriva)
+            + np.outer(np.sin(2 * np.pi * (dias % 1.0)), self._ciclo)
+            + rng.standard_normal((n, k)) * self._desv
+        )
+        for j, tag in enumerate(self.tags):
+            self._eventos(valores[:, j], t_ns, j, tag)
+        datos = {'Fecha': fechas}
+        datos.update({nombre: valores[:, j] for j, nombre in enumerate(self.nombres)})
+        return pd.DataFrame(datos)
+
+    def _eventos(self, columna, t_ns, j, tag):
+        # Escalones: cada ventana de `duracion_escalon` puede tener un offset
+        if tag.prob_escalon > 0:
+            ventana = t_ns // tag.duracion_escalon.value
+            u = _uniforme_hash(self.semilla, j, ventana, 1)
+            signo = _uniforme_hash(self.semilla, j, ventana, 2) * 2 - 1
+            columna += np.where(u < tag.prob_escalon, signo * tag.magnitud_escalon, 0.0)
+        # Excursiones: pulso triangular que lleva el valor fuera de banda
+        if tag.prob_excursion > 0:
+            duracion = tag.duracion_excursion.value
+            ventana = t_ns // duracion
+            u = _uniforme_hash(self.semilla, j, ventana, 3)
+            signo = np.where(_uniforme_hash(self.semilla, j, ventana, 4) < 0.5, -1.0, 1.0)
+            fase = (t_ns % duracion) / duracion
+            forma = 1 - np.abs(2 * fase - 1)
+            columna += np.where(u < tag.prob_excursion, signo * tag.magnitud_excursion * forma, 0.0)
+        # Caídas del sensor: ventanas sin dato
+        if tag.prob_caida > 0:
+            ventana = t_ns // tag.duracion_caida.value
+            u = _uniforme_hash(self.semilla, j, ventana, 5)
+            columna[u < tag.prob_caida] = np.nan
+
+
+def main():
+    from industrial.almacenamiento import FORMATOS
+
+    parser = argparse.ArgumentParser(description='Genera datos simulados de planta en un almacén en disco')
+    parser.add_argument('salida', help='directorio del almacén')
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='parquet')
+    parser.add_argument('--inicio', default='2024-09-01')
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--frecuencia', default='1s')
+    parser.add_argument('--tags', type=int, default=len(TAGS_PLANTA))
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    simulador = SimuladorPlanta(configurar_tags(args.tags, args.semilla), args.frecuencia, args.semilla)
+    almacen = FORMATOS[args.formato](args.salida, simulador.nombres)
+    inicio = pd.Timestamp(args.inicio)
+    reloj = time.perf_counter()
+
+    def progreso(filas, hasta):
+        print(f"\r{filas:,} filas · hasta {hasta:%Y-%m-%d %H:%M}", end='', file=sys.stderr)
+
+    filas = simulador.escribir_en_almacen(almacen, inicio, inicio + pd.Timedelta(days=args.dias), progreso)
+    segundos = time.perf_counter() - reloj
+    print(f"\n{filas:,} filas × {args.tags} tags en {segundos:.1f} s "
+          f"({filas * args.tags / max(segundos, 1e-9):,.0f} valores/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
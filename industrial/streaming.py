@@ -0,0 +1,513 @@
+import hashlib
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from industrial.fuentes import SaludConexion
+from industrial.muestreo import LTTB, indices_reducidos
+
+# Ingesta en vivo.
+#
+# Un hilo de fondo consulta una fuente de datos a intervalos regulares y
+# agrega las muestras nuevas a un buffer circular acotado por tag. Las
+# sesiones del dashboard sólo leen lo que llegó desde su última lectura
+# (número de secuencia), así el costo de cada refresco depende de los datos
+# nuevos y no del historial del día. Con un DetectorAnomalias, cada lote
+# ingresado pasa también por él (O(1) por muestra).
+#
+# Para retener horas de historial a alta frecuencia, BufferCompacto guarda
+# cada tag en bloques con tiempos implícitos (más desvíos si hay jitter) y valores
+# float32 o cuantizados a 8/12/16 bits (ver benchmarks/historial.py). Las
+# ventanas largas se grafican con `reducida`, que guarda la reducción de cada
+# bloque sellado y en cada refresco sólo reduce el bloque abierto.
+
+
+class BufferCircular:
+    """Últimas `capacidad` muestras (tiempo ns, valor) de un tag."""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._tiempos = np.zeros(capacidad, dtype='int64')
+        self._valores = np.full(capacidad, np.nan)
+        # Muestras escritas desde la creación; sirve como número de secuencia
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacidad)
+
+    def agregar(self, tiempos, valores):
+        tiempos = np.asarray(tiempos, dtype='int64')
+        valores = np.asarray(valores, dtype='float64')
+        n = len(valores)
+        if n > self.capacidad:
+            self.total += n - self.capacidad
+            tiempos = tiempos[-self.capacidad:]
+            valores = valores[-self.capacidad:]
+            n = self.capacidad
+        pos = self.total % self.capacidad
+        primero = min(n, self.capacidad - pos)
+        self._tiempos[pos:pos + primero] = tiempos[:primero]
+        self._valores[pos:pos + primero] = valores[:primero]
+        self._tiempos[:n - primero] = tiempos[primero:]
+        self._valores[:n - primero] = valores[primero:]
+        self.total += n
+
+    # Las n muestras más recientes, en orden temporal (copias)
+    def ultimos(self, n):
+        n = min(n, len(self))
+        inicio = (self.total - n) % self.capacidad
+        fin = inicio + n
+        if fin <= self.capacidad:
+            return self._tiempos[inicio:fin].copy(), self._valores[inicio:fin].copy()
+        resto = fin - self.capacidad
+        return (
+            np.concatenate([self._tiempos[inicio:], self._tiempos[:resto]]),
+            np.concatenate([self._valores[inicio:], self._valores[:resto]])
+        )
+
+    # Muestras con secuencia >= `secuencia` (las más viejas pueden haberse
+    # sobrescrito si el lector se atrasó más que la capacidad del buffer)
+    def desde(self, secuencia):
+        return self.ultimos(self.total - max(secuencia, self.total - len(self)))
+
+    # Las n muestras más recientes reducidas a unos `n_salida` puntos
+    def reducida(self, n, n_salida, modo=LTTB):
+        return _reducir(*self.ultimos(n), n_salida, modo)
+
+
+# Codificaciones de valores de BufferCompacto
+FLOAT32 = 'float32'
+CUANTIZADO = 'cuantizado'
+
+# Bits por valor admitidos en los bloques cuantizados
+BITS = (8, 12, 16)
+
+
+# Códigos enteros (< 2**bits) a bytes: 8 y 16 bits tal cual, 12 bits dos
+# códigos cada tres bytes
+def _empaquetar(codigos, bits):
+    if bits == 8:
+        return codigos.astype(np.uint8)
+    if bits == 16:
+        return codigos.astype('<u2').view(np.uint8)
+    a = codigos[0::2].astype(np.uint16)
+    b = codigos[1::2].astype(np.uint16)
+    trios = np.empty((len(a), 3), dtype=np.uint8)
+    trios[:, 0] = a >> 4
+    trios[:, 1] = ((a & 0xF) << 4) | (b >> 8)
+    trios[:, 2] = b & 0xFF
+    return trios.ravel()
+
+
+def _desempaquetar(datos, bits):
+    if bits == 8:
+        return datos
+    if bits == 16:
+        return datos.view('<u2')
+    trios = datos.reshape(-1, 3).astype(np.uint16)
+    codigos = np.empty(2 * len(trios), dtype=np.uint16)
+    codigos[0::2] = (trios[:, 0] << 4) | (trios[:, 1] >> 4)
+    codigos[1::2] = ((trios[:, 1] & 0xF) << 8) | trios[:, 2]
+    return codigos
+
+
+class BufferCompacto:
+    """Historial largo de un tag en bloques comprimidos; misma interfaz que BufferCircular.
+
+    Las muestras entran a un bloque abierto (desvíos int32 respecto de su
+    primera muestra, en unidades de `resolucion_ns`, y valores float32); al
+    llenarse, el bloque se sella en un anillo de bloques:
+      - tiempos: inicio + i · paso medio del bloque; si el muestreo no es
+        regular, más el desvío de cada muestra respecto de esa grilla con el
+        entero más chico que alcance (int8 para jitter de hasta ±127 ms).
+        Error <= resolucion_ns / 2, sin acumularse. Los tags de una misma
+        fuente comparten tiempos, así que un arreglo de desvíos idéntico al
+        de otro buffer se guarda una sola vez
+      - valores: float32, o cuantizados a `bits` (8, 12 o 16) sobre el rango
+        del bloque y empaquetados (error <= rango / (2 · (2**bits - 2)); NaN
+        e infinitos se guardan como NaN)
+    Al llenarse el anillo se descarta el bloque más viejo entero, así que se
+    retienen al menos las últimas `capacidad` muestras. Sólo en FLOAT32 la
+    decodificación de un bloque es una vista sin copia; `reducida` guarda la
+    reducción de cada bloque sellado para no volver a decodificarlo.
+    """
+
+    # Desvíos de tiempo sellados por cualquier buffer, por contenido
+    _desvios_compartidos = weakref.WeakValueDictionary()
+    _lock_desvios = threading.Lock()
+
+    def __init__(self, capacidad, codificacion=CUANTIZADO, tam_bloque=1024, resolucion_ns=1_000_000, bits=12):
+        if codificacion == CUANTIZADO and bits not in BITS:
+            raise ValueError(f"bits debe ser uno de {BITS}")
+        if codificacion == CUANTIZADO and bits == 12 and tam_bloque % 2:
+            raise ValueError("Con 12 bits el tamaño de bloque debe ser par")
+        self.capacidad = capacidad
+        self.codificacion = codificacion
+        self.tam_bloque = tam_bloque
+        self.resolucion_ns = resolucion_ns
+        self.bits = bits
+        n_bloques = max(1, -(-capacidad // tam_bloque))
+        if codificacion == FLOAT32:
+            self._valores = np.zeros((n_bloques, tam_bloque), dtype=np.float32)
+        else:
+            self._valores = np.zeros((n_bloques, tam_bloque * bits // 8), dtype=np.uint8)
+        self._inicios = np.zeros(n_bloques, dtype='int64')
+        # Paso de la grilla y desvíos (None = muestreo regular) en unidades
+        # de resolución
+        self._pasos = np.zeros(n_bloques, dtype='int64')
+        self._desvios = [None] * n_bloques
+        self._minimos = np.zeros(n_bloques)
+        self._escalas = np.ones(n_bloques)
+        self._primero = 0
+        self._sellados = 0
+        # Bloques sellados desde la creación (numera los bloques)
+        self._sellos = 0
+        self._inicio_abierto = 0
+        self._t_abierto = np.zeros(tam_bloque, dtype=np.int32)
+        self._v_abierto = np.full(tam_bloque, np.nan, dtype=np.float32)
+        self._n_abierto = 0
+        # (número de bloque, puntos, modo) -> serie reducida del bloque
+        self._reducidos = {}
+        self.total = 0
+
+    def __len__(self):
+        return self._sellados * self.tam_bloque + self._n_abierto
+
+    # Bytes que ocupa el buffer (el anillo se reserva completo al crearlo;
+    # los desvíos compartidos se cuentan en cada buffer que los usa)
+    @property
+    def nbytes(self):
+        desvios = sum(d.nbytes for d in self._desvios if d is not None)
+        return (self._valores.nbytes + self._inicios.nbytes + self._pasos.nbytes + self._minimos.nbytes
+                + self._escalas.nbytes + self._t_abierto.nbytes + self._v_abierto.nbytes + desvios)
+
+    def agregar(self, tiempos, valores):
+        tiempos = np.asarray(tiempos, dtype='int64')
+        valores = np.asarray(valores, dtype='float64')
+        hecho = 0
+        while hecho < len(valores):
+            n = min(len(valores) - hecho, self.tam_bloque - self._n_abierto)
+            if self._n_abierto == 0:
+                self._inicio_abierto = int(tiempos[hecho])
+            relativos = np.rint((tiempos[hecho:hecho + n] - self._inicio_abierto) / self.resolucion_ns)
+            if len(relativos) and np.abs(relativos).max() > np.iinfo(np.int32).max:
+                raise ValueError("El bloque abarca demasiado tiempo para resolucion_ns; usar una resolución mayor")
+            self._t_abierto[self._n_abierto:self._n_abierto + n] = relativos
+            self._v_abierto[self._n_abierto:self._n_abierto + n] = valores[hecho:hecho + n]
+            self._n_abierto += n
+            hecho += n
+            if self._n_abierto == self.tam_bloque:
+                self._sellar()
+        self.total += len(valores)
+
+    def _sellar(self):
+        n_bloques = len(self._inicios)
+        if self._sellados < n_bloques:
+            bloque = (self._primero + self._sellados) % n_bloques
+            self._sellados += 1
+        else:
+            bloque = self._primero
+            self._primero = (self._primero + 1) % n_bloques
+        self._sellos += 1
+        relativos = self._t_abierto.astype('int64')
+        inicio = self._inicio_abierto + int(relativos[0]) * self.resolucion_ns
+        relativos -= relativos[0]
+        paso = int(np.rint(relativos[-1] / max(self.tam_bloque - 1, 1)))
+        desvios = relativos - np.arange(self.tam_bloque, dtype='int64') * paso
+        self._inicios[bloque] = inicio
+        self._pasos[bloque] = paso
+        self._desvios[bloque] = None if not desvios.any() else self._compartir(desvios)
+        valores = self._v_abierto
+        if self.codificacion == FLOAT32:
+            self._valores[bloque] = valores
+        else:
+            sin_dato = 2**self.bits - 1
+            validos = np.isfinite(valores)
+            minimo = float(valores[validos].min()) if validos.any() else 0.0
+            rango = float(valores[validos].max()) - minimo if validos.any() else 0.0
+            escala = rango / (sin_dato - 1) if rango > 0 else 1.0
+            codigos = np.full(self.tam_bloque, sin_dato, dtype=np.uint16)
+            codigos[validos] = np.rint((valores[validos] - minimo) / escala)
+            self._valores[bloque] = _empaquetar(codigos, self.bits)
+            self._minimos[bloque] = minimo
+            self._escalas[bloque] = escala
+        self._n_abierto = 0
+
+    # Desvíos en el entero más chico que alcance; si otro buffer ya selló
+    # los mismos, se reutiliza su arreglo (de sólo lectura)
+    @classmethod
+    def _compartir(cls, desvios):
+        bajo, alto = desvios.min(), desvios.max()
+        tipo = next(t for t in (np.int8, np.int16, np.int32, np.int64)
+                    if np.iinfo(t).min <= bajo and alto <= np.iinfo(t).max)
+        desvios = desvios.astype(tipo)
+        clave = (desvios.dtype.str, hashlib.blake2b(desvios.tobytes(), digest_size=16).digest())
+        with cls._lock_desvios:
+            existente = cls._desvios_compartidos.get(clave)
+            if existente is not None and np.array_equal(existente, desvios):
+                return existente
+            desvios.flags.writeable = False
+            cls._desvios_compartidos[clave] = desvios
+            return desvios
+
+    # Tiempos y valores de un bloque sellado; en FLOAT32 los valores son una
+    # vista de sólo lectura del anillo (sin copia)
+    def _decodificar(self, bloque):
+        relativos = np.arange(self.tam_bloque, dtype='int64') * self._pasos[bloque]
+        if self._desvios[bloque] is not None:
+            relativos += self._desvios[bloque]
+        tiempos = self._inicios[bloque] + relativos * self.resolucion_ns
+        if self.codificacion == FLOAT32:
+            valores = self._valores[bloque].view()
+            valores.flags.writeable = False
+        else:
+            codigos = _desempaquetar(self._valores[bloque], self.bits)
+            valores = np.where(
+                codigos == 2**self.bits - 1, np.nan, self._minimos[bloque] + codigos * self._escalas[bloque]
+            )
+        return tiempos, valores
+
+    # Tiempos (int64) y valores del bloque abierto
+    def _abierto(self, desde=0):
+        relativos = self._t_abierto[desde:self._n_abierto].astype('int64')
+        return self._inicio_abierto + relativos * self.resolucion_ns, self._v_abierto[desde:self._n_abierto]
+
+    # Bloques retenidos, del más viejo al más nuevo (el abierto al final);
+    # sirve para recorrer 24-72 h sin armar un arreglo único
+    def bloques(self):
+        n_bloques = len(self._inicios)
+        for i in range(self._sellados):
+            yield self._decodificar((self._primero + i) % n_bloques)
+        if self._n_abierto:
+            yield self._abierto()
+
+    # Las n muestras más recientes, en orden temporal (tiempos int64 y
+    # valores float64, como BufferCircular)
+    def ultimos(self, n):
+        n = min(n, len(self))
+        abierto_t, abierto_v = self._abierto(max(0, self._n_abierto - n))
+        partes_t, partes_v = [abierto_t], [abierto_v]
+        faltan = n - len(abierto_t)
+        n_bloques = len(self._inicios)
+        i = self._sellados - 1
+        while faltan > 0:
+            tiempos, valores = self._decodificar((self._primero + i) % n_bloques)
+            tomar = min(faltan, self.tam_bloque)
+            partes_t.append(tiempos[-tomar:])
+            partes_v.append(valores[-tomar:])
+            faltan -= tomar
+            i -= 1
+        return (
+            np.concatenate(partes_t[::-1]).astype('int64', copy=False),
+            np.concatenate(partes_v[::-1]).astype('float64', copy=False)
+        )
+
+    def desde(self, secuencia):
+        return self.ultimos(self.total - max(secuencia, self.total - len(self)))
+
+    # Las n muestras más recientes reducidas a unos `n_salida` puntos para
+    # graficar. Cada bloque se reduce por separado con una cuota de puntos
+    # proporcional a sus muestras; la de los bloques sellados completos
+    # queda en caché, así que en régimen sólo se reducen el bloque abierto y
+    # el más viejo de la ventana (que suele entrar a medias).
+    def reducida(self, n, n_salida, modo=LTTB):
+        n = min(n, len(self))
+        if n <= n_salida:
+            return self.ultimos(n)
+        cuota = n_salida / n
+        n_bloques = len(self._inicios)
+        primer_numero = self._sellos - self._sellados
+        # Las entradas de bloques que ya salieron del anillo se descartan
+        for clave in [c for c in self._reducidos if c[0] < primer_numero]:
+            del self._reducidos[clave]
+        partes_t, partes_v = [], []
+        abierto_t, abierto_v = self._abierto(max(0, self._n_abierto - n))
+        faltan = n - len(abierto_t)
+        i = self._sellados - 1
+        while faltan > 0:
+            tomar = min(faltan, self.tam_bloque)
+            if tomar == self.tam_bloque:
+                clave = (primer_numero + i, max(2, round(cuota * self.tam_bloque)), modo)
+                reducido = self._reducidos.get(clave)
+                if reducido is None:
+                    reducido = self._reducidos[clave] = _reducir(
+                        *self._decodificar((self._primero + i) % n_bloques), clave[1], modo
+                    )
+            else:
+                tiempos, valores = self._decodificar((self._primero + i) % n_bloques)
+                reducido = _reducir(tiempos[-tomar:], valores[-tomar:], max(2, round(cuota * tomar)), modo)
+            partes_t.append(reducido[0])
+            partes_v.append(reducido[1])
+            faltan -= tomar
+            i -= 1
+        partes_t.reverse()
+        partes_v.reverse()
+        reducido = _reducir(abierto_t, abierto_v, max(2, round(cuota * len(abierto_t))), modo)
+        partes_t.append(reducido[0])
+        partes_v.append(reducido[1])
+        return (
+            np.concatenate(partes_t).astype('int64', copy=False),
+            np.concatenate(partes_v).astype('float64', copy=False)
+        )
+
+
+# Muestras elegidas (sin NaN) de una serie para graficarla con `n_salida` puntos
+def _reducir(tiempos, valores, n_salida, modo):
+    indices = indices_reducidos(tiempos, valores, n_salida, modo)
+    return tiempos[indices], np.asarray(valores[indices], dtype='float64')
+
+
+class FuenteSimulada:
+    """Genera una muestra por llamada: caminata aleatoria con reversión a la media."""
+
+    def __init__(self, medias, desviaciones, iniciales=None, reversion=0.1, semilla=None):
+        self.tags = list(medias)
+        self._medias = np.array([medias[t] for t in self.tags], dtype='float64')
+        self._desv = np.array([desviaciones[t] for t in self.tags], dtype='float64')
+        iniciales = iniciales or medias
+        self._valores = np.array([iniciales[t] for t in self.tags], dtype='float64')
+        self._reversion = reversion
+        self._rng = np.random.default_rng(semilla)
+
+    def __call__(self):
+        ruido = self._rng.normal(0, 1, len(self.tags)) * self._desv * np.sqrt(2 * self._reversion)
+        self._valores += self._reversion * (self._medias - self._valores) + ruido
+        fila = {'Fecha': [pd.Timestamp.now()]}
+        fila.update({t: [v] for t, v in zip(self.tags, self._valores)})
+        return pd.DataFrame(fila)
+
+
+class IngestorEnVivo:
+    """Hilo de fondo que alimenta un buffer por tag desde una fuente.
+
+    `buffer` crea el buffer de cada tag a partir de la capacidad
+    (BufferCircular o BufferCompacto). Con `inactividad` el hilo se detiene
+    solo cuando pasan esos segundos sin que nadie lea los buffers; `iniciar`
+    lo vuelve a poner en marcha.
+    """
+
+    def __init__(self, fuente, tags, capacidad=3600, periodo=1.0, detector=None, buffer=BufferCircular,
+                 inactividad=None):
+        self.fuente = fuente
+        self.tags = list(tags)
+        self.periodo = periodo
+        self.detector = detector
+        self.buffers = {t: buffer(capacidad) for t in self.tags}
+        self.inactividad = inactividad
+        self.ultimo_error = None
+        # Las fuentes asíncronas llevan su propia salud (pool, timeouts)
+        self.salud = getattr(fuente, 'salud', None) or SaludConexion(latencia_degradada=periodo)
+        self._registra_salud = not hasattr(fuente, 'salud')
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._ultima_lectura = time.monotonic()
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        self._ultima_lectura = time.monotonic()
+        if self.activo:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name='ingestor-en-vivo', daemon=True)
+        self._hilo.start()
+
+    def detener(self, espera=None):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(espera)
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            inicio = time.monotonic()
+            if self.inactividad is not None and inicio - self._ultima_lectura > self.inactividad:
+                break
+            try:
+                self.ingresar(self.fuente())
+                self.ultimo_error = None
+                if self._registra_salud:
+                    self.salud.registrar_exito(time.monotonic() - inicio)
+            except Exception as e:  # la fuente puede fallar; el hilo sigue vivo
+                self.ultimo_error = e
+                if self._registra_salud:
+                    self.salud.registrar_fallo(str(e))
+            self._detener.wait(max(0.0, self.periodo - (time.monotonic() - inicio)))
+
+    # Agrega un lote ancho (Fecha + tags) a los buffers
+    def ingresar(self, lote):
+        if lote is None or lote.empty:
+            return
+        tiempos = lote['Fecha'].to_numpy(dtype='datetime64[ns]').view('int64')
+        with self._lock:
+            for tag in self.tags:
+                if tag in lote.columns:
+                    self.buffers[tag].agregar(tiempos, lote[tag].to_numpy(dtype='float64'))
+        if self.detector is not None:
+            self.detector.actualizar(lote)
+
+    # Secuencia actual de cada tag, para pedir luego sólo lo nuevo
+    def secuencias(self):
+        self._ultima_lectura = time.monotonic()
+        with self._lock:
+            return {t: b.total for t, b in self.buffers.items()}
+
+    # Muestras nuevas por tag desde las secuencias dadas, a lo sumo las
+    # `maximo` más recientes: {tag: (tiempos, valores)}
+    def nuevas_desde(self, secuencias, tags=None, maximo=None):
+        self._ultima_lectura = time.monotonic()
+        with self._lock:
+            return self._nuevas(secuencias, tags or self.tags, maximo)
+
+    # Como nuevas_desde pero en un DataFrame ancho, junto con las secuencias
+    # con las que pedir lo siguiente (ambas tomadas en el mismo instante)
+    def filas_nuevas(self, secuencias, tags, maximo=None):
+        self._ultima_lectura = time.monotonic()
+        with self._lock:
+            series = self._nuevas(secuencias, tags, maximo)
+            totales = {t: self.buffers[t].total for t in tags}
+        return _tabla_ancha(series), totales
+
+    def _nuevas(self, secuencias, tags, maximo):
+        nuevas = {}
+        for t in tags:
+            buffer = self.buffers[t]
+            desde = secuencias.get(t, 0)
+            if maximo is not None:
+                desde = max(desde, buffer.total - maximo)
+            nuevas[t] = buffer.desde(desde)
+        return nuevas
+
+    # Ventana de las últimas n muestras de varios tags como DataFrame ancho
+    def ventana(self, tags, n):
+        self._ultima_lectura = time.monotonic()
+        with self._lock:
+            series = {t: self.buffers[t].ultimos(n) for t in tags}
+        return _tabla_ancha(series)
+
+    # Últimas n muestras de un tag reducidas a unos `n_salida` puntos para
+    # graficar (con BufferCompacto, la reducción de los bloques sellados se
+    # reutiliza entre refrescos)
+    def ventana_reducida(self, tag, n, n_salida, modo=LTTB):
+        self._ultima_lectura = time.monotonic()
+        with self._lock:
+            serie = {tag: self.buffers[tag].reducida(n, n_salida, modo)}
+        return _tabla_ancha(serie)
+
+
+# DataFrame ancho (Fecha + tags) a partir de {tag: (tiempos, valores)}; los
+# tags de una misma fuente comparten marcas de tiempo, así que se alinean
+# por el final
+def _tabla_ancha(series):
+    if not series:
+        return pd.DataFrame(columns=['Fecha'])
+    largo = min(len(v) for _, v in series.values())
+    tiempos = next(iter(series.values()))[0][-largo:] if largo else np.empty(0, 'int64')
+    datos = {'Fecha': pd.to_datetime(tiempos)}
+    datos.update({t: v[-largo:] if largo else v[:0] for t, (_, v) in series.items()})
+    return pd.DataFrame(datos)
@@ -0,0 +1,40 @@
+import sys
+from multiprocessing.connection import Client
+
+# Worker del pool analítico (ver industrial.paralelo).
+#
+# Cada worker es un intérprete nuevo lanzado como
+#
+#     python -m industrial.trabajador <dirección>
+#
+# que recibe la clave de la conexión por stdin. Su __main__ es este módulo,
+# así que nunca vuelve a ejecutar el script de Streamlit ni hereda hilos o
+# estado del servidor web. Atiende tareas (función, argumentos) en orden y
+# responde (True, resultado) o (False, excepción); termina cuando el pool
+# cierra la conexión.
+
+
+def atender(conexion):
+    while True:
+        try:
+            funcion, argumentos = conexion.recv()
+        except EOFError:
+            return
+        try:
+            respuesta = (True, funcion(*argumentos))
+        except Exception as e:  # el error se relanza en el proceso que pidió la tarea
+            respuesta = (False, e)
+        try:
+            conexion.send(respuesta)
+        except Exception as e:  # resultado o excepción que no se pueden serializar
+            conexion.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+def main():
+    clave = sys.stdin.buffer.read()
+    with Client(sys.argv[1], authkey=clave) as conexion:
+        atender(conexion)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,32 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import time
-import altair as alt
+import os
+from collections import deque
+
+from industrial.perfilado import Perfilador, a_jsonl, a_prometheus
+from industrial.almacenamiento import AlmacenMemoria, abrir_almacen
+from industrial.simulador import SimuladorPlanta, configurar_tags
+from industrial.cache import CacheCompartida
+from industrial.graficos import CacheGraficos
+from industrial.streaming import BufferCompacto, FuenteSimulada, IngestorEnVivo
+from industrial.fuentes import (
+    DEGRADADO, EN_LINEA, FUERA_DE_LINEA, AdaptadorSincrono, BucleAsincrono, abrir_fuente
+)
+from industrial.muestreo import LTTB, MINMAX, puntos_para_ancho, reducir_dataframe
+from industrial.normalizacion import MODOS as MODOS_ESCALA, normalizar
+from industrial.normalizacion import formato_largo as formato_largo_normalizado
+from industrial.correlacion import formato_largo, pares_significativos
+from industrial.resoluciones import CRUDO, RollupMultinivel
+from industrial.estadisticas import TURNOS
+from industrial.servicio import ServicioVistas
+from industrial.paralelo import EjecutorAnalitico
+from industrial.estados import ADVERTENCIA, BUENO, CRITICO, ESTADOS
+from industrial.registro import cargar_registro
+from industrial.anomalias import DetectorAnomalias
+from industrial.exportacion import (
+    CONTENIDOS, FALLIDO, FORMATOS as FORMATOS_EXPORTACION, LISTO, ExportadorReportes
+)
 
 # Configuración de la página
 st.set_page_config(
@@ -99,60 +123,290 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Función para generar datos simulados
-@st.cache_data
+# Función para generar datos simulados. El tamaño se configura por entorno
+# (DASHBOARD_SIM_DIAS, DASHBOARD_SIM_FRECUENCIA, DASHBOARD_SIM_TAGS); para
+# volúmenes grandes conviene generar un almacén en disco con
+# `python -m industrial.simulador` y apuntar DASHBOARD_ALMACEN a él
 def generar_datos_industriales():
-    np.random.seed(42)
-    # Generar más puntos para mejor visualización
-    fechas = pd.date_range(start='2024-09-20', end='2024-09-22 23:59', freq='30min')
-    
-    datos = {
-        'Fecha': fechas,
-        'Temperatura_Reactor_1': 250 + np.random.normal(0, 10, len(fechas)),
-        'Presion_Sistema': 15 + np.random.normal(0, 2, len(fechas)),
-        'Flujo_Entrada': 100 + np.random.normal(0, 5, len(fechas)),
-        'Nivel_Tanque': 75 + np.random.normal(0, 8, len(fechas)),
-        'Consumo_Energia': 450 + np.random.normal(0, 25, len(fechas)),
-        'pH_Proceso': 7.2 + np.random.normal(0, 0.3, len(fechas)),
-        'Vibration_Motor': 0.5 + np.random.normal(0, 0.1, len(fechas)),
-        'Eficiencia_Proceso': 85 + np.random.normal(0, 5, len(fechas))
-    }
+    simulador = SimuladorPlanta(
+        configurar_tags(int(os.environ.get('DASHBOARD_SIM_TAGS', 8))),
+        frecuencia=os.environ.get('DASHBOARD_SIM_FRECUENCIA', '30min'),
+        semilla=42
+    )
+    inicio = pd.Timestamp('2024-09-20')
+    dias = int(os.environ.get('DASHBOARD_SIM_DIAS', 3))
+    return simulador.generar_dataframe(inicio, inicio + pd.Timedelta(days=dias))
+
+# Almacén de series: en disco si DASHBOARD_ALMACEN apunta a uno (particiones
+# diarias Parquet o .npy), si no, los datos simulados en memoria
+@st.cache_resource
+def obtener_almacen():
+    ruta = os.environ.get('DASHBOARD_ALMACEN')
+    if ruta:
+        return abrir_almacen(ruta)
+    return AlmacenMemoria(generar_datos_industriales())
+
+# Metadatos de los tags (tags.toml o DASHBOARD_TAGS), ampliados con los del
+# almacén que no figuran en el archivo
+@st.cache_resource
+def obtener_registro(_almacen):
+    return cargar_registro().ampliar(_almacen.tags)
+
+# Caché de lecturas compartida por todas las sesiones (sin copias por sesión)
+@st.cache_resource
+def obtener_cache():
+    return CacheCompartida(
+        presupuesto_bytes=int(os.environ.get('DASHBOARD_CACHE_MB', 256)) * 2**20,
+        ttl=300.0
+    )
+
+# Specs de gráficos ya serializadas, compartidas por todas las sesiones
+@st.cache_resource
+def obtener_cache_graficos():
+    return CacheGraficos(
+        presupuesto_bytes=int(os.environ.get('DASHBOARD_CACHE_GRAFICOS_MB', 64)) * 2**20
+    )
+
+# Dibuja un gráfico desde la caché de specs; `construir` sólo se ejecuta si
+# cambió la versión de los datos o la combinación de controles es nueva
+def mostrar_grafico(tipo, clave, version, construir, rango=None, tags=None, nombre=None):
+    spec = obtener_cache_graficos().obtener_spec(tipo, clave, version, construir, rango=rango, tags=tags)
+    perfilador.registrar_grafico(nombre or tipo, spec.nbytes)
+    st.vega_lite_chart(spec.como_dict(), use_container_width=True)
+
+# Ingestor en vivo compartido por todas las sesiones: un hilo de fondo que
+# agrega muestras nuevas a un buffer circular por variable. La fuente se
+# elige con DASHBOARD_FUENTE ("sqlite:RUTA", "plc:HOST:PUERTO",
+# "plc-simulado"); sin ella se usa un simulador en proceso. Las fuentes
+# externas se consultan en un bucle asyncio aparte, con timeout, así que un
+# dispositivo lento sólo atrasa el panel en vivo, nunca el rerun. Cada lote
+# pasa también por un detector de anomalías con estado propio. El historial
+# en vivo (DASHBOARD_VIVO_HORAS, 24 por defecto) se guarda comprimido. El
+# sondeo se detiene solo cuando ninguna sesión lo lee durante dos minutos
+# (todas apagaron la actualización automática) y se reanuda con la próxima.
+@st.cache_resource
+def obtener_ingestor(_almacen):
+    tags = list(_almacen.tags)
+    referencia = _almacen.leer_dia(_almacen.rango_fechas()[1])
+    fuente = FuenteSimulada(
+        medias=referencia[tags].mean().to_dict(),
+        desviaciones=referencia[tags].std().fillna(0).to_dict(),
+        iniciales=referencia[tags].iloc[-1].to_dict()
+    )
+    uri = os.environ.get('DASHBOARD_FUENTE')
+    if uri:
+        bucle = BucleAsincrono()
+        fuente = AdaptadorSincrono(abrir_fuente(uri, bucle, generador=fuente), tags, bucle)
+    horas = float(os.environ.get('DASHBOARD_VIVO_HORAS', 24))
+    # Los eventos se retienen por días enteros: los que cubren el historial
+    detector = DetectorAnomalias(
+        tags, cambio_maximo=obtener_registro(_almacen).cambios_maximos_de(tags), dias=int(np.ceil(horas / 24)) + 1
+    )
+    ingestor = IngestorEnVivo(
+        fuente, tags, capacidad=int(horas * 3600), periodo=1.0, detector=detector, buffer=BufferCompacto,
+        inactividad=120.0
+    )
+    ingestores_creados()[id(_almacen)] = ingestor
+    return ingestor
+
+# Ingestores ya creados en el proceso por almacén: el pie consulta su salud
+# sin crear uno (crearlo abre la fuente y, con DASHBOARD_FUENTE, el bucle
+# asyncio y el PLC simulado)
+@st.cache_resource
+def ingestores_creados():
+    return {}
+
+# Capa de anomalías (triángulos rojos) para superponer a un gráfico de
+# tendencia; `eventos` viene de DetectorAnomalias.eventos
+def capa_anomalias(eventos, titulo):
+    import altair as alt
+
+    return alt.Chart(eventos).mark_point(
+        shape='triangle-up', size=80, filled=True, color='red'
+    ).encode(
+        x='Fecha:T',
+        y=alt.Y('Valor:Q', title=titulo),
+        tooltip=['Fecha:T', 'Tipo:N', alt.Tooltip('Valor:Q', format='.2f'), alt.Tooltip('Puntaje:Q', format='.1f')]
+    )
+
+# Panel en vivo: se ejecuta como fragmento, así cada refresco redibuja sólo
+# esta sección. Cada sesión guarda su ventana de las últimas
+# MUESTRAS_EN_VIVO muestras y en cada refresco le agrega únicamente las
+# llegadas desde el anterior. Las ventanas más largas del gráfico se leen
+# del historial compartido del ingestor en lugar de copiarse a cada sesión.
+MUESTRAS_EN_VIVO = 600
+
+# Ventanas del gráfico en vivo (minutos); sólo se ofrecen las que entran
+# en el historial del ingestor
+VENTANAS_EN_VIVO = {'10 minutos': 10, '1 hora': 60, '6 horas': 360, '24 horas': 1440}
+
+def panel_en_vivo(ingestor, variables, registro):
+    import altair as alt
+
+    st.markdown("## 📡 Monitoreo en Vivo")
     
-    return pd.DataFrame(datos)
-
-# Función para determinar el estado de una variable
-def obtener_estado_variable(valor, variable):
-    estados = {
-        'Temperatura_Reactor_1': {'bueno': (240, 260), 'advertencia': (230, 270), 'critico': (0, 230)},
-        'Presion_Sistema': {'bueno': (12, 18), 'advertencia': (10, 20), 'critico': (0, 10)},
-        'Flujo_Entrada': {'bueno': (90, 110), 'advertencia': (80, 120), 'critico': (0, 80)},
-        'Nivel_Tanque': {'bueno': (60, 90), 'advertencia': (40, 100), 'critico': (0, 40)},
-        'pH_Proceso': {'bueno': (6.8, 7.6), 'advertencia': (6.5, 8.0), 'critico': (0, 6.5)},
-        'Eficiencia_Proceso': {'bueno': (80, 100), 'advertencia': (70, 80), 'critico': (0, 70)}
-    }
+    clave, ventana, secuencias = st.session_state.get('ventana_en_vivo', (None, None, {}))
+    if clave != tuple(variables):
+        ventana, secuencias = None, {}
+    nuevas, secuencias = ingestor.filas_nuevas(secuencias, variables, MUESTRAS_EN_VIVO)
+    if ventana is not None and len(nuevas):
+        ventana = pd.concat([ventana, nuevas], ignore_index=True).iloc[-MUESTRAS_EN_VIVO:].reset_index(drop=True)
+    elif ventana is None:
+        ventana = nuevas
+    st.session_state['ventana_en_vivo'] = (tuple(variables), ventana, secuencias)
+    n_nuevas = len(nuevas)
     
-    if variable in estados:
-        if estados[variable]['bueno'][0] <= valor <= estados[variable]['bueno'][1]:
-            return 'Bueno', 'status-good'
-        elif estados[variable]['advertencia'][0] <= valor <= estados[variable]['advertencia'][1]:
-            return 'Advertencia', 'status-warning'
-        else:
-            return 'Crítico', 'status-critical'
+    if ingestor.ultimo_error is not None:
+        st.warning(f"⚠️ Error en la ingesta: {ingestor.ultimo_error}")
+    
+    if ventana.empty:
+        st.info("Esperando datos en vivo...")
+        return
+    
+    st.caption(
+        f"{n_nuevas} muestras nuevas desde el último refresco · "
+        f"último dato {ventana['Fecha'].iloc[-1].strftime('%H:%M:%S')}"
+    )
+    
+    cols_vivo = st.columns(len(variables))
+    # Últimos dos valores finitos de cada variable: valor actual y delta real
+    # (un corte de señal muestra el último valor conocido, o "—" si no hay)
+    for i, variable in enumerate(variables):
+        valores = ventana[variable].to_numpy()
+        valores = valores[np.isfinite(valores)]
+        delta = valores[-1] - valores[-2] if len(valores) > 1 else None
+        with cols_vivo[i]:
+            st.metric(
+                label=registro.etiqueta(variable),
+                value=f"{valores[-1]:.2f}" if len(valores) else "—",
+                delta=None if delta is None else f"{delta:+.2f}"
+            )
     
-    return 'Desconocido', 'status-warning'
+    col_variable, col_periodo = st.columns([3, 1])
+    with col_variable:
+        variable_vivo = st.selectbox(
+            "Variable en vivo",
+            variables,
+            format_func=registro.etiqueta,
+            key='variable_en_vivo'
+        )
+    capacidad = ingestor.buffers[variable_vivo].capacidad
+    ventanas = [v for v, minutos in VENTANAS_EN_VIVO.items() if minutos * 60 / ingestor.periodo <= capacidad]
+    with col_periodo:
+        periodo_vivo = st.selectbox("Ventana", ventanas or ['10 minutos'], key='periodo_en_vivo')
+    muestras = int(VENTANAS_EN_VIVO[periodo_vivo] * 60 / ingestor.periodo)
+    if muestras <= MUESTRAS_EN_VIVO:
+        serie = reducir_dataframe(ventana[['Fecha', variable_vivo]].iloc[-muestras:], [variable_vivo],
+                                  puntos_para_ancho(800))
+    else:
+        # Las ventanas largas salen ya reducidas del buffer, que guarda la
+        # reducción de cada bloque sellado entre refrescos
+        serie = ingestor.ventana_reducida(variable_vivo, muestras, puntos_para_ancho(800))
+    chart_vivo = alt.Chart(serie).mark_line(strokeWidth=2, color=registro.color(variable_vivo)).encode(
+        x=alt.X('Fecha:T', title='Tiempo'),
+        y=alt.Y(f'{variable_vivo}:Q', title=registro.etiqueta(variable_vivo), scale=alt.Scale(zero=False)),
+        tooltip=['Fecha:T', f'{variable_vivo}:Q']
+    )
+    anomalias_vivo = ingestor.detector.eventos(desde=serie['Fecha'].iloc[0])
+    anomalias_vivo = anomalias_vivo[anomalias_vivo['Variable'] == variable_vivo]
+    if not anomalias_vivo.empty:
+        chart_vivo = chart_vivo + capa_anomalias(anomalias_vivo, registro.etiqueta(variable_vivo))
+    chart_vivo = chart_vivo.properties(
+        height=250,
+        title=f"{registro.etiqueta(variable_vivo)} - ventana de {periodo_vivo}"
+    )
+    st.altair_chart(chart_vivo, use_container_width=True)
+
+# Servicio único por proceso que calcula las vistas derivadas de cada día
+# (valores actuales, estados, alarmas, agregados, correlación) una vez por
+# versión de datos y las publica a todas las sesiones; los días retenidos
+# se acotan a DASHBOARD_SERVICIO_MB
+@st.cache_resource
+def obtener_servicio(_almacen):
+    return ServicioVistas(
+        _almacen, registro=obtener_registro(_almacen), cache=obtener_cache(), ejecutor=obtener_ejecutor(),
+        presupuesto_bytes=int(os.environ.get('DASHBOARD_SERVICIO_MB', 256)) * 2**20
+    ).iniciar()
+
+# Pool de procesos para la analítica por tag con muchos tags
+# (DASHBOARD_PROCESOS; por defecto uno por CPU, 1 = siempre en serie)
+@st.cache_resource
+def obtener_ejecutor():
+    procesos = os.environ.get('DASHBOARD_PROCESOS')
+    return EjecutorAnalitico(procesos=int(procesos) if procesos else None)
+
+# Niveles de resolución (1 min / 15 min / 1 h) de todo el almacén,
+# compartidos entre sesiones y alimentados sólo con datos nuevos
+@st.cache_resource
+def obtener_rollups(_almacen):
+    return RollupMultinivel(_almacen.tags)
+
+# Exportaciones en segundo plano compartidas por el proceso; cada sesión
+# sólo recuerda el id de su último trabajo
+@st.cache_resource
+def obtener_exportador(_almacen):
+    return ExportadorReportes(_almacen, registro=obtener_registro(_almacen))
+
+# Estado del último trabajo de exportación de la sesión; mientras corre, el
+# fragmento se refresca solo y, al terminar, un rerun completo lo detiene
+def panel_exportacion(exportador, refrescando):
+    trabajo = exportador.trabajo(st.session_state.get('exportacion'))
+    if trabajo is None:
+        return
+    descripcion = f"{CONTENIDOS[trabajo.contenido]} · {FORMATOS_EXPORTACION[trabajo.formato][0]}"
+    if trabajo.activo:
+        st.progress(trabajo.progreso, text=f"{descripcion}: {trabajo.hechas}/{trabajo.total} ventanas")
+        if st.button("Cancelar", key='cancelar_exportacion'):
+            trabajo.cancelar()
+        return
+    if refrescando:
+        st.rerun()
+    if trabajo.estado == LISTO:
+        st.success(f"{descripcion}: {trabajo.filas:,} filas · {trabajo.bytes / 1024:,.0f} KB")
+        st.download_button(
+            "⬇️ Descargar",
+            trabajo.leer,
+            file_name=trabajo.nombre_archivo,
+            mime=trabajo.mime,
+            on_click='ignore'
+        )
+    elif trabajo.estado == FALLIDO:
+        st.error(f"La exportación falló: {trabajo.error}")
+    else:
+        st.info("Exportación cancelada")
+
+# Fracción 0-1 como porcentaje ('—' sin datos)
+def porcentaje(fraccion):
+    return '—' if np.isnan(fraccion) else f"{fraccion:.1%}"
+
+# Duración de cada opción del selector "Rango de Tiempo"
+RANGOS_TIEMPO = {
+    "Última Hora": pd.Timedelta(hours=1),
+    "Últimas 24 Horas": pd.Timedelta(hours=24),
+    "Última Semana": pd.Timedelta(days=7),
+    "Último Mes": pd.Timedelta(days=30)
+}
+
+# Medición por sección de este rerun (opt-in con DASHBOARD_PERFILADO o
+# desde el panel de diagnóstico de la barra lateral)
+perfilador = Perfilador.desde_entorno()
+if not perfilador.activo and st.session_state.get('diagnostico'):
+    perfilador = Perfilador(memoria=st.session_state.get('diagnostico_memoria', False))
 
 # Título principal
 st.markdown('<h1 class="main-header">🏭 Dashboard de Control Industrial</h1>', unsafe_allow_html=True)
 
+perfilador.marcar('carga')
 # Cargar datos
-df = generar_datos_industriales()
+almacen = obtener_almacen()
+registro = obtener_registro(almacen)
 
+perfilador.marcar('controles')
 # Sidebar para controles
 st.sidebar.title("⚙️ Controles del Sistema")
 
 # Selector de fecha
-fecha_min = df['Fecha'].min().date()
-fecha_max = df['Fecha'].max().date()
+fecha_min, fecha_max = almacen.rango_fechas()
 fecha_actual = datetime.now().date()
 
 # Si la fecha actual está fuera del rango, usar la fecha máxima disponible
@@ -169,7 +423,7 @@ fecha_seleccionada = st.sidebar.date_input(
 )
 
 # Selector de variables
-variables_disponibles = [col for col in df.columns if col != 'Fecha']
+variables_disponibles = list(almacen.tags)
 variables_seleccionadas = st.sidebar.multiselect(
     "Variables a Mostrar",
     variables_disponibles,
@@ -179,246 +433,146 @@ variables_seleccionadas = st.sidebar.multiselect(
 # Filtro de tiempo
 rango_tiempo = st.sidebar.selectbox(
     "Rango de Tiempo",
-    ["Última Hora", "Últimas 24 Horas", "Última Semana", "Último Mes"]
+    list(RANGOS_TIEMPO),
+    index=1
+)
+
+# Reducción de puntos de los gráficos (conserva picos)
+modo_muestreo = st.sidebar.selectbox(
+    "Muestreo de Gráficos",
+    [LTTB, MINMAX],
+    format_func={LTTB: "LTTB (forma de la curva)", MINMAX: "Envolvente Mín/Máx"}.get
 )
 
 # Botón de actualización automática
-auto_refresh = st.sidebar.checkbox("Actualización Automática (cada 30s)")
+auto_refresh = st.sidebar.checkbox("Actualización Automática")
+if auto_refresh:
+    intervalo_refresco = st.sidebar.select_slider(
+        "Intervalo de actualización (s)",
+        options=[1, 5, 10, 30],
+        value=30
+    )
 
 # Información del sistema
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📊 Info del Sistema")
-st.sidebar.info(f"Total de registros: {len(df):,}")
+st.sidebar.info(f"Total de registros: {almacen.num_registros():,}")
 st.sidebar.info(f"Última actualización: {datetime.now().strftime('%H:%M:%S')}")
 
-if auto_refresh:
-    time.sleep(1)
-    st.rerun()
+if auto_refresh and variables_seleccionadas:
+    ingestor = obtener_ingestor(almacen)
+    ingestor.iniciar()
+    st.fragment(panel_en_vivo, run_every=intervalo_refresco)(ingestor, variables_seleccionadas[:4], registro)
 
-# Filtrar datos según la fecha seleccionada
-datos_filtrados = df[df['Fecha'].dt.date == fecha_seleccionada]
+perfilador.marcar('filtro')
+# Vistas del día ya calculadas por el servicio compartido; la versión de la
+# partición cambia cuando llegan muestras nuevas
+vistas = obtener_servicio(almacen).vistas(fecha_seleccionada)
+datos_filtrados = vistas.datos
+version_dia = vistas.version
+rango_dia = (pd.Timestamp(fecha_seleccionada), pd.Timestamp(fecha_seleccionada) + pd.Timedelta(days=1))
 
 if not datos_filtrados.empty:
+    perfilador.marcar('estado')
     # Estado general del sistema
     st.markdown("## 🚦 Estado General del Sistema")
     
+    # Último estado de los tags con umbrales y disponibilidad del día según
+    # el tiempo que la planta pasó en cada estado
+    con_umbral = registro.con_umbral[registro.ids(vistas.tags)]
+    codigos_actuales = vistas.matriz_estados[-1][con_umbral]
+    n_normales = int((codigos_actuales == BUENO).sum())
+    n_en_alerta = int((codigos_actuales >= ADVERTENCIA).sum())
+    resumen_kpis = vistas.resumen_kpis
+    indice_tag = {tag: k for k, tag in enumerate(vistas.estadisticas.tags)}
+    eficiencia_dia = (
+        vistas.resumen.promedio[indice_tag['Eficiencia_Proceso']] if 'Eficiencia_Proceso' in indice_tag else np.nan
+    )
+    # Rendimiento del OEE: la eficiencia media del proceso (1 si no se mide)
+    rendimiento = 1.0 if np.isnan(eficiencia_dia) else min(max(eficiencia_dia / 100, 0.0), 1.0)
+    oee_dia = resumen_kpis.oee(rendimiento)
+    
     col_estado1, col_estado2, col_estado3, col_estado4 = st.columns(4)
     
     with col_estado1:
-        st.markdown('<div class="alert-low"><strong>🟢 Sistemas Operativos</strong><br>6/8 variables normales</div>', unsafe_allow_html=True)
+        clase = 'alert-low' if n_normales == len(codigos_actuales) else 'alert-medium'
+        st.markdown(f'<div class="{clase}"><strong>🟢 Sistemas Operativos</strong><br>{n_normales}/{len(codigos_actuales)} variables normales</div>', unsafe_allow_html=True)
     
     with col_estado2:
-        st.markdown('<div class="alert-medium"><strong>🟡 Advertencias</strong><br>2 variables en alerta</div>', unsafe_allow_html=True)
+        clase = 'alert-high' if (codigos_actuales == CRITICO).any() else 'alert-medium' if n_en_alerta else 'alert-low'
+        st.markdown(f'<div class="{clase}"><strong>🟡 Advertencias</strong><br>{n_en_alerta} variables en alerta</div>', unsafe_allow_html=True)
     
     with col_estado3:
-        st.markdown('<div class="alert-low"><strong>⚡ Eficiencia</strong><br>87.3% promedio</div>', unsafe_allow_html=True)
+        if np.isnan(eficiencia_dia):
+            texto_eficiencia = f"OEE {porcentaje(oee_dia)}"
+        else:
+            texto_eficiencia = f"{eficiencia_dia:.1f}% promedio · OEE {porcentaje(oee_dia)}"
+        st.markdown(f'<div class="alert-low"><strong>⚡ Eficiencia</strong><br>{texto_eficiencia}</div>', unsafe_allow_html=True)
     
     with col_estado4:
-        st.markdown('<div class="alert-low"><strong>🔧 Uptime</strong><br>99.2% disponibilidad</div>', unsafe_allow_html=True)
+        clase = 'alert-low' if resumen_kpis.disponibilidad >= 0.95 else 'alert-medium'
+        st.markdown(f'<div class="{clase}"><strong>🔧 Uptime</strong><br>{porcentaje(resumen_kpis.disponibilidad)} disponibilidad</div>', unsafe_allow_html=True)
 
+    perfilador.marcar('metricas')
     # Métricas en tiempo real
     st.markdown("## 📊 Métricas en Tiempo Real")
     
     cols = st.columns(4)
-    valores_actuales = datos_filtrados.iloc[-1]  # Último valor del día
+    valores_actuales = vistas.valores_actuales  # Último valor del día
+    valores_previos = vistas.valores_previos  # Muestra anterior (para el delta)
+    # Estados de todas las muestras del día (matriz int8 del servicio)
+    estados_actuales = vistas.estados_actuales
     
-    metricas = [
-        ("Temperatura Reactor", "Temperatura_Reactor_1", "°C"),
-        ("Presión Sistema", "Presion_Sistema", "Bar"),
-        ("Flujo Entrada", "Flujo_Entrada", "L/min"),
-        ("Nivel Tanque", "Nivel_Tanque", "%")
-    ]
+    # Las cuatro variables de mayor prioridad del registro
+    metricas = registro.principales(variables_disponibles, 4)
     
-    for i, (nombre, variable, unidad) in enumerate(metricas):
+    for i, variable in enumerate(metricas):
         if variable in valores_actuales:
             valor = valores_actuales[variable]
-            estado, clase_css = obtener_estado_variable(valor, variable)
+            delta = valor - valores_previos[variable]
+            estado, clase_css = ESTADOS[int(estados_actuales[variable])]
             
             with cols[i]:
                 st.metric(
-                    label=f"{nombre}",
-                    value=f"{valor:.1f} {unidad}",
-                    delta=f"{np.random.uniform(-2, 2):.1f}"
+                    label=registro.etiqueta(variable),
+                    value="—" if np.isnan(valor) else f"{valor:.1f} {registro.unidad(variable)}".rstrip(),
+                    delta=None if np.isnan(delta) else f"{delta:+.1f}"
                 )
                 st.markdown(f'<div class="{clase_css}">{estado}</div>', unsafe_allow_html=True)
 
-    # Gráficos principales usando Altair
-    st.markdown("## 📈 Tendencias de Variables")
-    
-    if len(variables_seleccionadas) > 0:
-        # Gráficos individuales
-        cols_graficos = st.columns(2)
-        
-        colores = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
-        
-        for i, variable in enumerate(variables_seleccionadas[:6]):
-            col_idx = i % 2
-            
-            with cols_graficos[col_idx]:
-                # Crear gráfico con Altair
-                chart = alt.Chart(datos_filtrados).mark_line(
-                    point=alt.OverlayMarkDef(color=colores[i % len(colores)]),
-                    strokeWidth=3,
-                    color=colores[i % len(colores)]
-                ).encode(
-                    x=alt.X('Fecha:T', title='Tiempo'),
-                    y=alt.Y(f'{variable}:Q', title=variable.replace('_', ' ').title()),
-                    tooltip=['Fecha:T', f'{variable}:Q']
-                ).properties(
-                    width=350,
-                    height=250,
-                    title=variable.replace('_', ' ').title()
-                ).interactive()
-                
-                st.altair_chart(chart, use_container_width=True)
-    
-    # Gráfico de líneas combinado
-    st.markdown("### 📊 Vista Combinada de Variables Principales")
-    
-    if len(variables_seleccionadas) >= 2:
-        # Seleccionar principales variables para comparación
-        vars_principales = ['Temperatura_Reactor_1', 'Presion_Sistema', 'Flujo_Entrada', 'Eficiencia_Proceso']
-        vars_a_mostrar = [v for v in vars_principales if v in variables_seleccionadas][:4]
-        
-        if len(vars_a_mostrar) >= 2:
-            # Preparar datos para gráfico combinado
-            datos_melted = datos_filtrados.melt(
-                id_vars=['Fecha'], 
-                value_vars=vars_a_mostrar,
-                var_name='Variable',
-                value_name='Valor'
-            )
-            
-            # Normalizar valores para comparación (0-100%)
-            for var in vars_a_mostrar:
-                if var in datos_filtrados.columns:
-                    min_val = datos_filtrados[var].min()
-                    max_val = datos_filtrados[var].max()
-                    mask = datos_melted['Variable'] == var
-                    datos_melted.loc[mask, 'Valor_Norm'] = (
-                        (datos_melted.loc[mask, 'Valor'] - min_val) / 
-                        (max_val - min_val) * 100
-                    )
-            
-            chart_combined = alt.Chart(datos_melted).mark_line(strokeWidth=3).encode(
-                x=alt.X('Fecha:T', title='Tiempo'),
-                y=alt.Y('Valor_Norm:Q', title='Valor Normalizado (0-100%)', scale=alt.Scale(domain=[0, 100])),
-                color=alt.Color('Variable:N', title='Variables', scale=alt.Scale(range=colores)),
-                tooltip=['Fecha:T', 'Variable:N', 'Valor:Q', 'Valor_Norm:Q']
-            ).properties(
-                width=800,
-                height=400,
-                title='Tendencias Normalizadas de Variables Industriales'
-            ).interactive()
-            
-            st.altair_chart(chart_combined, use_container_width=True)
-
-    # Análisis de correlación simplificado
-    st.markdown("## 🔍 Análisis de Correlación")
-    
-    variables_numericas = datos_filtrados.select_dtypes(include=[np.number]).columns.tolist()
-    if len(variables_numericas) > 1:
-        # Calcular correlaciones y mostrar en tabla
-        matriz_correlacion = datos_filtrados[variables_numericas].corr()
-        
-        st.markdown("### Matriz de Correlación")
-        # Mostrar matriz sin estilos de color (que requieren matplotlib)
-        st.dataframe(matriz_correlacion.round(3), use_container_width=True)
-        
-        # Crear un heatmap simple usando Altair
-        st.markdown("### Visualización de Correlaciones")
-        
-        # Preparar datos para heatmap con Altair
-        corr_data = []
-        for i, var1 in enumerate(variables_numericas):
-            for j, var2 in enumerate(variables_numericas):
-                corr_data.append({
-                    'Variable_X': var1.replace('_', ' ').title(),
-                    'Variable_Y': var2.replace('_', ' ').title(),
-                    'Correlacion': matriz_correlacion.loc[var1, var2],
-                    'X_pos': i,
-                    'Y_pos': j
-                })
-        
-        df_corr = pd.DataFrame(corr_data)
-        
-        # Crear heatmap con Altair
-        heatmap = alt.Chart(df_corr).mark_rect().encode(
-            x=alt.X('Variable_X:O', title='Variables', axis=alt.Axis(labelAngle=-45)),
-            y=alt.Y('Variable_Y:O', title='Variables'),
-            color=alt.Color('Correlacion:Q', 
-                          scale=alt.Scale(scheme='redblue', domain=[-1, 1]),
-                          title='Correlación'),
-            tooltip=['Variable_X:O', 'Variable_Y:O', 'Correlacion:Q']
-        ).properties(
-            width=500,
-            height=400,
-            title='Mapa de Calor - Correlaciones entre Variables'
-        )
-        
-        # Añadir texto con valores de correlación
-        text = alt.Chart(df_corr).mark_text(
-            fontSize=8,
-            fontWeight='bold'
-        ).encode(
-            x=alt.X('Variable_X:O'),
-            y=alt.Y('Variable_Y:O'),
-            text=alt.Text('Correlacion:Q', format='.2f'),
-            color=alt.condition(
-                alt.datum.Correlacion > 0.5,
-                alt.value('white'),
-                alt.value('black')
-            )
-        )
-        
-        st.altair_chart(heatmap + text, use_container_width=True)
-        
-        # Mostrar correlaciones más fuertes
-        st.markdown("### Correlaciones Significativas (|r| > 0.5)")
-        correlaciones_fuertes = []
-        
-        for i in range(len(variables_numericas)):
-            for j in range(i+1, len(variables_numericas)):
-                var1 = variables_numericas[i]
-                var2 = variables_numericas[j]
-                corr = matriz_correlacion.loc[var1, var2]
-                
-                if abs(corr) > 0.5:
-                    correlaciones_fuertes.append({
-                        'Variable 1': var1.replace('_', ' ').title(),
-                        'Variable 2': var2.replace('_', ' ').title(),
-                        'Correlación': f"{corr:.3f}",
-                        'Interpretación': 'Fuerte Positiva' if corr > 0.7 else 'Fuerte Negativa' if corr < -0.7 else 'Moderada'
-                    })
-        
-        if correlaciones_fuertes:
-            df_correlaciones = pd.DataFrame(correlaciones_fuertes)
-            st.dataframe(df_correlaciones, use_container_width=True)
-        else:
-            st.info("No se encontraron correlaciones significativas entre las variables.")
-    
+    perfilador.marcar('alarmas')
     # Sistema de alarmas
     st.markdown("## 🚨 Sistema de Alarmas")
     
-    alarmas = []
-    for variable in variables_disponibles:
-        if variable in valores_actuales:
-            valor = valores_actuales[variable]
-            estado, _ = obtener_estado_variable(valor, variable)
-            
-            if estado != 'Bueno':
-                prioridad = 'Alta' if estado == 'Crítico' else 'Media'
-                alarmas.append({
-                    'Prioridad': prioridad,
-                    'Variable': variable.replace('_', ' ').title(),
-                    'Valor Actual': f"{valor:.2f}",
-                    'Estado': estado,
-                    'Timestamp': datetime.now().strftime("%H:%M:%S"),
-                    'Acción Recomendada': 'Revisar inmediatamente' if estado == 'Crítico' else 'Monitorear'
-                })
-    
-    if alarmas:
-        df_alarmas = pd.DataFrame(alarmas)
+    # Último estado de cada tag por id: sólo se arman filas para los que no
+    # están en estado bueno, ordenados por la prioridad del registro
+    codigos = vistas.matriz_estados[-1]
+    ids_tags = registro.ids(vistas.tags)
+    en_alarma = np.flatnonzero(codigos != BUENO)
+    en_alarma = en_alarma[np.argsort(registro.prioridades[ids_tags[en_alarma]], kind='stable')]
+    # Anomalías detectadas en la última muestra del día (prioridad media)
+    anomalias_dia = vistas.anomalias
+    anomalias_actuales = anomalias_dia[anomalias_dia['Fecha'] == vistas.datos['Fecha'].iloc[-1]]
+    
+    if len(en_alarma) or not anomalias_actuales.empty:
+        criticas = codigos[en_alarma] == CRITICO
+        df_alarmas = pd.concat([
+            pd.DataFrame({
+                'Prioridad': np.where(criticas, 'Alta', 'Media'),
+                'Variable': registro.etiquetas[ids_tags[en_alarma]],
+                'Valor Actual': np.char.mod('%.2f', valores_actuales[vistas.tags].to_numpy(dtype='float64')[en_alarma]),
+                'Estado': [ESTADOS[int(c)][0] for c in codigos[en_alarma]],
+                'Acción Recomendada': np.where(criticas, 'Revisar inmediatamente', 'Monitorear')
+            }),
+            pd.DataFrame({
+                'Prioridad': 'Media',
+                'Variable': registro.etiquetar(anomalias_actuales['Variable']),
+                'Valor Actual': np.char.mod('%.2f', anomalias_actuales['Valor'].to_numpy(dtype='float64')),
+                'Estado': 'Anomalía: ' + anomalias_actuales['Tipo'].to_numpy(dtype=object),
+                'Acción Recomendada': 'Verificar tendencia'
+            }),
+        ], ignore_index=True)
+        df_alarmas.insert(4, 'Timestamp', datetime.now().strftime("%H:%M:%S"))
         
         # Separar por prioridad
         alarmas_altas = df_alarmas[df_alarmas['Prioridad'] == 'Alta']
@@ -434,91 +588,451 @@ if not datos_filtrados.empty:
     else:
         st.success("✅ Todas las variables están en estado normal")
     
-    # Estadísticas del día
-    st.markdown("## 📋 Resumen del Día")
+    # Historial de alarmas del día (intervalos fuera de la banda normal)
+    historial_alarmas = vistas.historial_alarmas.copy(deep=False)
+    if not historial_alarmas.empty:
+        st.markdown("### 🕒 Historial de Alarmas del Día")
+        historial_alarmas['Variable'] = registro.etiquetar(historial_alarmas['Variable'])
+        historial_alarmas['Estado'] = historial_alarmas['Estado'].map(lambda c: ESTADOS[int(c)][0])
+        st.dataframe(
+            historial_alarmas.sort_values('Inicio', ascending=False, kind='stable'),
+            use_container_width=True,
+            hide_index=True
+        )
     
-    col1, col2 = st.columns(2)
+    # Anomalías del día (desvíos respecto del comportamiento reciente, aun
+    # dentro de las bandas)
+    if not vistas.anomalias_al_dia:
+        st.caption("🔎 Detector de anomalías procesando el historial del día...")
+    if not anomalias_dia.empty:
+        st.markdown("### 🔎 Anomalías Detectadas del Día")
+        anomalias_tabla = anomalias_dia.copy(deep=False)
+        anomalias_tabla['Variable'] = registro.etiquetar(anomalias_tabla['Variable'])
+        st.dataframe(
+            anomalias_tabla.sort_values('Fecha', ascending=False, kind='stable'),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Valor': st.column_config.NumberColumn(format="%.2f"),
+                'Puntaje': st.column_config.NumberColumn(format="%.1f")
+            }
+        )
     
-    with col1:
-        st.markdown("### 📊 Estadísticas Generales")
-        
-        # Crear tabla de estadísticas
-        stats_data = []
-        for variable in variables_seleccionadas[:6]:
-            if variable in datos_filtrados.columns:
-                stats_data.append({
-                    'Variable': variable.replace('_', ' ').title(),
-                    'Promedio': f"{datos_filtrados[variable].mean():.2f}",
-                    'Máximo': f"{datos_filtrados[variable].max():.2f}",
-                    'Mínimo': f"{datos_filtrados[variable].min():.2f}",
-                    'Desv. Est.': f"{datos_filtrados[variable].std():.2f}"
-                })
-        
-        if stats_data:
-            df_stats = pd.DataFrame(stats_data)
-            st.dataframe(df_stats, use_container_width=True)
+    # Secciones pesadas en pestañas perezosas: con on_change='rerun' cada
+    # pestaña sabe si está abierta y sólo se ejecuta la elegida, así que el
+    # estado, las métricas y las alarmas se dibujan sin esperar a gráficos y
+    # tablas que no se están mirando
+    tab_tendencias, tab_combinada, tab_correlacion, tab_resumen = st.tabs(
+        ["📈 Tendencias", "📊 Vista Combinada", "🔍 Correlación", "📋 Resumen del Día"],
+        key='seccion',
+        on_change='rerun'
+    )
     
-    with col2:
-        st.markdown("### 🎯 Indicadores de Rendimiento")
-        
-        # Calcular KPIs
-        if 'Eficiencia_Proceso' in datos_filtrados.columns:
-            eficiencia_promedio = datos_filtrados['Eficiencia_Proceso'].mean()
+    with tab_tendencias:
+        if tab_tendencias.open:
+            perfilador.marcar('tendencias')
+            # Gráficos principales usando Altair
+            st.markdown("## 📈 Tendencias de Variables")
             
-            # Mostrar eficiencia con progress bar
-            st.markdown("#### Eficiencia del Proceso")
-            st.progress(min(eficiencia_promedio / 100, 1.0))
+            if len(variables_seleccionadas) > 0:
+                # Gráficos individuales
+                cols_graficos = st.columns(2)
+                
+                # El rango termina al final del día seleccionado y se sirve desde el
+                # nivel de resolución más grueso que aún da puntos suficientes
+                fin_rango = pd.Timestamp(fecha_seleccionada) + pd.Timedelta(days=1)
+                inicio_rango = fin_rango - RANGOS_TIEMPO[rango_tiempo]
+                rollups = obtener_rollups(almacen)
+                rollups.sincronizar(almacen)
+                nivel_rango = rollups.elegir_nivel(inicio_rango, fin_rango)
+                nivel_rango = CRUDO if nivel_rango is None else nivel_rango.nombre
+                version_rango = almacen.version_rango(inicio_rango, fin_rango)
+                st.caption(f"{rango_tiempo} hasta {fin_rango:%Y-%m-%d %H:%M} · resolución: {nivel_rango}")
+                
+                def grafico_tendencia(variable, color, titulo):
+                    import altair as alt
+
+                    _, series_rango = rollups.consultar(almacen, inicio_rango, fin_rango, [variable])
+                    # Reducir la serie al ancho del gráfico antes de serializarla
+                    datos_grafico = reducir_dataframe(
+                        series_rango[variable], ['Promedio'],
+                        puntos_para_ancho(350), modo_muestreo
+                    )
+                    # Marcadores sólo cuando la serie es lo bastante corta
+                    marcadores = len(datos_grafico) <= 200
+                    
+                    # Crear gráfico con Altair
+                    base = alt.Chart(datos_grafico).encode(
+                        x=alt.X('Fecha:T', title='Tiempo')
+                    )
+                    chart = base.mark_line(
+                        point=alt.OverlayMarkDef(color=color) if marcadores else False,
+                        strokeWidth=3,
+                        color=color
+                    ).encode(
+                        y=alt.Y('Promedio:Q', title=titulo, scale=alt.Scale(zero=False)),
+                        tooltip=['Fecha:T', alt.Tooltip('Promedio:Q', title=variable)]
+                    )
+                    # Con datos agregados, banda mín/máx de cada cubeta
+                    if nivel_rango != CRUDO:
+                        banda = base.mark_area(opacity=0.2, color=color).encode(
+                            y='Mínimo:Q',
+                            y2='Máximo:Q'
+                        )
+                        chart = banda + chart
+                    # Anomalías del día seleccionado que caen en el rango
+                    anomalias_rango = anomalias_dia[
+                        (anomalias_dia['Variable'] == variable)
+                        & (anomalias_dia['Fecha'] >= inicio_rango) & (anomalias_dia['Fecha'] < fin_rango)
+                    ]
+                    if not anomalias_rango.empty:
+                        chart = chart + capa_anomalias(anomalias_rango, titulo)
+                    return chart.properties(
+                        width=350,
+                        height=250,
+                        title=titulo
+                    ).interactive()
+                
+                for i, variable in enumerate(variables_seleccionadas[:6]):
+                    col_idx = i % 2
+                    color = registro.color(variable)
+                    titulo = registro.etiqueta(variable)
+                    
+                    with cols_graficos[col_idx]:
+                        mostrar_grafico(
+                            'tendencia',
+                            (variable, color, inicio_rango, fin_rango, modo_muestreo, len(anomalias_dia)),
+                            version_rango,
+                            lambda: grafico_tendencia(variable, color, titulo),
+                            rango=(inicio_rango, fin_rango),
+                            tags=[variable],
+                            nombre=f'tendencia {variable}'
+                        )
+    
+    with tab_combinada:
+        if tab_combinada.open:
+            perfilador.marcar('combinada')
+            # Gráfico de líneas combinado
+            st.markdown("### 📊 Vista Combinada de Variables Principales")
             
-            # Métricas de rendimiento
-            col_eff1, col_eff2 = st.columns(2)
-            with col_eff1:
-                st.metric("Eficiencia Actual", f"{eficiencia_promedio:.1f}%")
-            with col_eff2:
-                target = 85
-                delta = eficiencia_promedio - target
-                st.metric("vs Objetivo (85%)", f"{delta:+.1f}%")
+            if len(variables_seleccionadas) >= 2:
+                # Variables marcadas para la vista combinada en el registro
+                vars_a_mostrar = registro.principales(variables_seleccionadas, 4, combinada=True)
+                
+                if len(vars_a_mostrar) >= 2:
+                    modo_escala = st.selectbox(
+                        "Escala común",
+                        list(MODOS_ESCALA),
+                        format_func=lambda m: MODOS_ESCALA[m][0],
+                        key='escala_combinada'
+                    )
+                    _, titulo_escala, dominio_escala = MODOS_ESCALA[modo_escala]
+                    
+                    def grafico_combinado():
+                        import altair as alt
+
+                        # Escala calculada sobre todo el día; se normalizan y pasan a
+                        # formato largo sólo los puntos que se dibujan
+                        datos_combinados = reducir_dataframe(
+                            datos_filtrados, vars_a_mostrar, puntos_para_ancho(800), modo_muestreo
+                        )
+                        datos_normalizados = normalizar(
+                            datos_combinados, vars_a_mostrar, modo_escala, referencia=datos_filtrados,
+                            registro=registro
+                        )
+                        etiquetas = list(registro.etiquetar(vars_a_mostrar))
+                        datos_melted = formato_largo_normalizado(
+                            datos_combinados, datos_normalizados, vars_a_mostrar, etiquetas
+                        )
+                        
+                        escala_y = alt.Scale(domain=list(dominio_escala)) if dominio_escala else alt.Scale(zero=False)
+                        return alt.Chart(datos_melted).mark_line(strokeWidth=3).encode(
+                            x=alt.X('Fecha:T', title='Tiempo'),
+                            y=alt.Y('Valor_Norm:Q', title=titulo_escala, scale=escala_y),
+                            color=alt.Color(
+                                'Variable:N', title='Variables',
+                                scale=alt.Scale(domain=etiquetas, range=registro.colores_de(vars_a_mostrar))
+                            ),
+                            tooltip=['Fecha:T', 'Variable:N', 'Valor:Q', 'Valor_Norm:Q']
+                        ).properties(
+                            width=800,
+                            height=400,
+                            title='Tendencias Normalizadas de Variables Industriales'
+                        ).interactive()
+                    
+                    mostrar_grafico(
+                        'combinada',
+                        (fecha_seleccionada, tuple(vars_a_mostrar), modo_escala, modo_muestreo),
+                        version_dia,
+                        grafico_combinado,
+                        rango=rango_dia,
+                        tags=vars_a_mostrar
+                    )
+    
+    with tab_correlacion:
+        if tab_correlacion.open:
+            perfilador.marcar('correlacion')
+            # Análisis de correlación simplificado
+            st.markdown("## 🔍 Análisis de Correlación")
+            
+            variables_numericas = datos_filtrados.select_dtypes(include=[np.number]).columns.tolist()
+            if len(variables_numericas) > 1:
+                # Matriz desde las sumas cacheadas; sólo se suman las muestras nuevas
+                correlacion_dia = vistas.correlacion
+                matriz_correlacion = vistas.matriz_correlacion
+                
+                st.markdown("### Matriz de Correlación")
+                # Mostrar matriz sin estilos de color (que requieren matplotlib)
+                st.dataframe(matriz_correlacion.round(3), use_container_width=True)
+                
+                # Crear un heatmap simple usando Altair
+                st.markdown("### Visualización de Correlaciones")
+                
+                def grafico_correlaciones():
+                    import altair as alt
+
+                    # Preparar datos para heatmap con Altair
+                    etiquetas_corr = registro.etiquetar(variables_numericas)
+                    df_corr = formato_largo(matriz_correlacion, etiquetas_corr)
+                    
+                    # Crear heatmap con Altair
+                    heatmap = alt.Chart(df_corr).mark_rect().encode(
+                        x=alt.X('Variable_X:O', title='Variables', axis=alt.Axis(labelAngle=-45)),
+                        y=alt.Y('Variable_Y:O', title='Variables'),
+                        color=alt.Color('Correlacion:Q', 
+                                      scale=alt.Scale(scheme='redblue', domain=[-1, 1]),
+                                      title='Correlación'),
+                        tooltip=['Variable_X:O', 'Variable_Y:O', 'Correlacion:Q']
+                    ).properties(
+                        width=500,
+                        height=400,
+                        title='Mapa de Calor - Correlaciones entre Variables'
+                    )
+                    
+                    # Añadir texto con valores de correlación
+                    text = alt.Chart(df_corr).mark_text(
+                        fontSize=8,
+                        fontWeight='bold'
+                    ).encode(
+                        x=alt.X('Variable_X:O'),
+                        y=alt.Y('Variable_Y:O'),
+                        text=alt.Text('Correlacion:Q', format='.2f'),
+                        color=alt.condition(
+                            alt.datum.Correlacion > 0.5,
+                            alt.value('white'),
+                            alt.value('black')
+                        )
+                    )
+                    
+                    return heatmap + text
+                
+                mostrar_grafico(
+                    'correlacion',
+                    (fecha_seleccionada, tuple(variables_numericas)),
+                    version_dia,
+                    grafico_correlaciones,
+                    rango=rango_dia,
+                    tags=variables_numericas
+                )
+                
+                # Mostrar correlaciones más fuertes
+                st.markdown("### Correlaciones Significativas (|r| > 0.5)")
+                correlaciones_fuertes = pares_significativos(matriz_correlacion, umbral=0.5)
+                
+                if not correlaciones_fuertes.empty:
+                    r = correlaciones_fuertes['Correlación']
+                    correlaciones_fuertes['Interpretación'] = np.select(
+                        [r > 0.7, r < -0.7], ['Fuerte Positiva', 'Fuerte Negativa'], default='Moderada'
+                    )
+                    for columna in ['Variable 1', 'Variable 2']:
+                        correlaciones_fuertes[columna] = registro.etiquetar(correlaciones_fuertes[columna])
+                    st.dataframe(
+                        correlaciones_fuertes,
+                        use_container_width=True,
+                        column_config={'Correlación': st.column_config.NumberColumn(format="%.3f")}
+                    )
+                else:
+                    st.info("No se encontraron correlaciones significativas entre las variables.")
+                
+                # Correlación móvil entre dos variables (ventanas de horas completas)
+                with st.expander("📉 Correlación Móvil", key='exp_correlacion_movil', on_change='rerun') as expansor:
+                    if expansor.open:
+                        col_corr1, col_corr2, col_corr3 = st.columns(3)
+                        with col_corr1:
+                            var_corr_x = st.selectbox("Variable X", variables_numericas, index=0, key='corr_x')
+                        with col_corr2:
+                            var_corr_y = st.selectbox("Variable Y", variables_numericas, index=1, key='corr_y')
+                        with col_corr3:
+                            ventana_horas = st.selectbox("Ventana (horas)", [2, 4, 8], index=1, key='corr_ventana')
+                        
+                        def grafico_correlacion_movil():
+                            import altair as alt
+
+                            serie_corr = correlacion_dia.serie_movil(var_corr_x, var_corr_y, ventana_horas)
+                            return alt.Chart(serie_corr).mark_line(strokeWidth=2).encode(
+                                x=alt.X('Fecha:T', title='Fin de la ventana'),
+                                y=alt.Y('Correlacion:Q', title='r', scale=alt.Scale(domain=[-1, 1])),
+                                tooltip=['Fecha:T', alt.Tooltip('Correlacion:Q', format='.3f')]
+                            ).properties(height=250)
+                        
+                        mostrar_grafico(
+                            'correlacion_movil',
+                            (fecha_seleccionada, var_corr_x, var_corr_y, ventana_horas),
+                            version_dia,
+                            grafico_correlacion_movil,
+                            rango=rango_dia,
+                            tags=[var_corr_x, var_corr_y]
+                        )
+    
+    with tab_resumen:
+        if tab_resumen.open:
+            perfilador.marcar('resumen')
+            # Estadísticas del día
+            st.markdown("## 📋 Resumen del Día")
             
-            # Estado visual
-            if eficiencia_promedio >= 90:
-                st.success("🟢 Rendimiento Excelente")
-            elif eficiencia_promedio >= 80:
-                st.warning("🟡 Rendimiento Aceptable")
-            else:
-                st.error("🔴 Rendimiento Crítico")
+            estadisticas_dia = vistas.estadisticas
+            resumen_dia = vistas.resumen
             
-            # Histograma de eficiencia usando Altair
-            st.markdown("#### Distribución de Eficiencia")
+            col1, col2 = st.columns(2)
             
-            chart_hist = alt.Chart(datos_filtrados).mark_bar(
-                opacity=0.7,
-                color='#2E86AB'
-            ).encode(
-                x=alt.X('Eficiencia_Proceso:Q', bin=alt.Bin(maxbins=15), title='Eficiencia (%)'),
-                y=alt.Y('count()', title='Frecuencia')
-            ).properties(
-                width=400,
-                height=200,
-                title='Distribución de Valores de Eficiencia'
-            )
+            with col1:
+                st.markdown("### 📊 Estadísticas Generales")
+                
+                # Resumen servido desde los agregados por hora (sin recorrer el día)
+                periodo_resumen = st.selectbox("Periodo", ["Día completo", *TURNOS], key='periodo_resumen')
+                if periodo_resumen == "Día completo":
+                    agregados = resumen_dia
+                else:
+                    agregados = estadisticas_dia.resumen_turno(fecha_seleccionada, periodo_resumen)
+                
+                vars_stats = [v for v in variables_seleccionadas[:6] if v in estadisticas_dia.tags]
+                if vars_stats:
+                    df_stats = agregados.tabla(estadisticas_dia.tags)
+                    df_stats = df_stats.set_index('Variable').loc[vars_stats].reset_index()
+                    df_stats['Variable'] = registro.etiquetar(df_stats['Variable'])
+                    st.dataframe(
+                        df_stats,
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            col: st.column_config.NumberColumn(format="%.2f")
+                            for col in ['Promedio', 'Máximo', 'Mínimo', 'Desv. Est.']
+                        }
+                    )
+                
+                with st.expander("Tiempo en cada estado", key='exp_tiempo_estados', on_change='rerun') as expansor:
+                    if expansor.open:
+                        tiempo_estados = resumen_kpis.tabla(registro.etiquetar(vistas.tags))
+                        tiempo_estados = tiempo_estados[np.isin(vistas.tags, vars_stats)]
+                        st.dataframe(
+                            tiempo_estados,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                col: st.column_config.NumberColumn(format="%.1f") for col in tiempo_estados.columns[1:]
+                            }
+                        )
+                
+                with st.expander("Resumen por hora", key='exp_resumen_hora', on_change='rerun') as expansor:
+                    if expansor.open:
+                        por_hora = estadisticas_dia.por_cubeta()
+                        por_hora = por_hora[por_hora['Variable'].isin(vars_stats)]
+                        st.dataframe(
+                            por_hora.pivot(index='Cubeta', columns='Variable', values='Promedio'),
+                            use_container_width=True
+                        )
             
-            st.altair_chart(chart_hist, use_container_width=True)
-        
-        # Indicadores adicionales
-        st.markdown("#### Otros Indicadores")
-        
-        # Calcular uptime simulado
-        uptime = np.random.uniform(98, 99.8)
-        st.metric("Uptime del Sistema", f"{uptime:.1f}%")
-        
-        # Calcular throughput
-        if 'Flujo_Entrada' in datos_filtrados.columns:
-            throughput = datos_filtrados['Flujo_Entrada'].sum()
-            st.metric("Throughput Total", f"{throughput:.0f} L")
+            with col2:
+                st.markdown("### 🎯 Indicadores de Rendimiento")
+                
+                # Calcular KPIs
+                if 'Eficiencia_Proceso' in indice_tag:
+                    eficiencia_promedio = resumen_dia.promedio[indice_tag['Eficiencia_Proceso']]
+                    
+                    # Mostrar eficiencia con progress bar
+                    st.markdown("#### Eficiencia del Proceso")
+                    st.progress(min(eficiencia_promedio / 100, 1.0))
+                    
+                    # Métricas de rendimiento
+                    col_eff1, col_eff2 = st.columns(2)
+                    with col_eff1:
+                        st.metric("Eficiencia Actual", f"{eficiencia_promedio:.1f}%")
+                    with col_eff2:
+                        target = 85
+                        delta = eficiencia_promedio - target
+                        st.metric("vs Objetivo (85%)", f"{delta:+.1f}%")
+                    
+                    # Estado visual
+                    if eficiencia_promedio >= 90:
+                        st.success("🟢 Rendimiento Excelente")
+                    elif eficiencia_promedio >= 80:
+                        st.warning("🟡 Rendimiento Aceptable")
+                    else:
+                        st.error("🔴 Rendimiento Crítico")
+                    
+                    # Histograma de eficiencia usando Altair
+                    st.markdown("#### Distribución de Eficiencia")
+                    
+                    def grafico_histograma():
+                        import altair as alt
+
+                        return alt.Chart(datos_filtrados[['Eficiencia_Proceso']]).mark_bar(
+                            opacity=0.7,
+                            color='#2E86AB'
+                        ).encode(
+                            x=alt.X('Eficiencia_Proceso:Q', bin=alt.Bin(maxbins=15), title='Eficiencia (%)'),
+                            y=alt.Y('count()', title='Frecuencia')
+                        ).properties(
+                            width=400,
+                            height=200,
+                            title='Distribución de Valores de Eficiencia'
+                        )
+                    
+                    mostrar_grafico(
+                        'histograma_eficiencia',
+                        fecha_seleccionada,
+                        version_dia,
+                        grafico_histograma,
+                        rango=rango_dia,
+                        tags=['Eficiencia_Proceso']
+                    )
+                
+                # Indicadores adicionales
+                st.markdown("#### Otros Indicadores")
+                
+                # Disponibilidad del día; la variación compara la última hora con datos
+                # contra la hora anterior
+                ultima_hora, hora_previa = vistas.kpis.ultimas_cubetas()
+                variacion = (ultima_hora.disponibilidad - hora_previa.disponibilidad) * 100
+                st.metric(
+                    "Uptime del Sistema",
+                    porcentaje(resumen_kpis.disponibilidad),
+                    delta=None if np.isnan(variacion) else f"{variacion:+.1f} pp vs hora anterior"
+                )
+                st.metric("OEE", porcentaje(oee_dia))
+                st.caption(
+                    f"Disponibilidad {porcentaje(resumen_kpis.disponibilidad)} × "
+                    f"Rendimiento {porcentaje(rendimiento)} × Calidad {porcentaje(resumen_kpis.calidad)}"
+                )
+                
+                # Calcular throughput
+                if 'Flujo_Entrada' in indice_tag:
+                    throughput = resumen_dia.suma[indice_tag['Flujo_Entrada']]
+                    st.metric("Throughput Total", f"{throughput:.0f} L")
+
 
 else:
     st.warning("⚠️ No hay datos disponibles para la fecha seleccionada.")
-    st.info("Selecciona una fecha entre el 20 y 22 de septiembre de 2024.")
+    dias_con_datos = almacen.dias()
+    if dias_con_datos:
+        st.info(
+            f"Hay datos del {min(dias_con_datos):%d/%m/%Y} al {max(dias_con_datos):%d/%m/%Y} "
+            f"({len(dias_con_datos)} días). Selecciona una fecha de ese rango."
+        )
+    else:
+        st.info("El almacén todavía no tiene datos.")
 
+perfilador.marcar('pie')
 # Footer con información del sistema
 st.markdown("---")
 col_footer1, col_footer2, col_footer3 = st.columns(3)
@@ -530,18 +1044,70 @@ with col_footer2:
     st.markdown(f"🕒 **Última actualización:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
 with col_footer3:
-    st.markdown(f"📡 **Estado de conexión:** 🟢 En línea")
+    # Salud real de la fuente en vivo según sus últimos sondeos
+    ingestor = ingestores_creados().get(id(almacen))
+    salud = ingestor.salud if ingestor is not None else None
+    if ingestor is None or not ingestor.activo:
+        estado_conexion = "⚪ Sin sondeo en vivo"
+    elif salud.estado == EN_LINEA:
+        estado_conexion = f"🟢 En línea ({salud.latencia * 1000:.0f} ms)"
+    elif salud.estado == DEGRADADO:
+        estado_conexion = f"🟡 Degradada ({salud.ultimo_error or 'alta latencia'})"
+    elif salud.estado == FUERA_DE_LINEA:
+        estado_conexion = f"🔴 Fuera de línea ({salud.ultimo_error})"
+    else:
+        estado_conexion = "⚪ Esperando primer sondeo"
+    st.markdown(f"📡 **Estado de conexión:** {estado_conexion}")
 
 # Información adicional en sidebar
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 🛠️ Herramientas")
 
 if st.sidebar.button("🔄 Recargar Datos"):
-    st.cache_data.clear()
+    # Invalida sólo las lecturas del día y variables visibles, no la caché
+    # de las demás sesiones
+    inicio_recarga = pd.Timestamp(fecha_seleccionada)
+    obtener_cache().invalidar(
+        rango=(inicio_recarga, inicio_recarga + pd.Timedelta(days=1)),
+        tags=variables_disponibles
+    )
+    obtener_servicio(almacen).invalidar(fecha_seleccionada)
+    obtener_cache_graficos().invalidar(rango=rango_dia)
     st.rerun()
 
-if st.sidebar.button("📊 Exportar Reporte"):
-    st.sidebar.success("Reporte exportado exitosamente!")
+# Exportación por bloques en un hilo de fondo: el rerun sólo la encarga y
+# el archivo se sirve al terminar
+with st.sidebar.expander("📊 Exportar Reporte"):
+    rango_exportacion = st.date_input(
+        "Días",
+        value=(fecha_seleccionada, fecha_seleccionada),
+        min_value=fecha_min,
+        max_value=fecha_max,
+        key='rango_exportacion'
+    )
+    contenido_exportacion = st.selectbox(
+        "Contenido", list(CONTENIDOS), format_func=CONTENIDOS.get, key='contenido_exportacion'
+    )
+    formato_exportacion = st.selectbox(
+        "Formato",
+        list(FORMATOS_EXPORTACION),
+        format_func=lambda f: FORMATOS_EXPORTACION[f][0],
+        key='formato_exportacion'
+    )
+    exportador = obtener_exportador(almacen)
+    if st.button("Exportar", disabled=len(rango_exportacion) < 2):
+        desde_exportacion, hasta_exportacion = rango_exportacion
+        trabajo = exportador.iniciar(
+            pd.Timestamp(desde_exportacion),
+            pd.Timestamp(hasta_exportacion) + pd.Timedelta(days=1),
+            variables_seleccionadas or variables_disponibles,
+            contenido_exportacion,
+            formato_exportacion
+        )
+        st.session_state['exportacion'] = trabajo.id
+    ultimo_trabajo = exportador.trabajo(st.session_state.get('exportacion'))
+    refrescando = ultimo_trabajo is not None and ultimo_trabajo.activo
+    st.fragment(panel_exportacion, run_every=1.0 if refrescando else None)(exportador, refrescando)
 
 if st.sidebar.button("⚙️ Calibrar Sensores"):
     st.sidebar.info("Calibración iniciada...")
@@ -550,3 +1116,48 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("### 📞 Soporte")
 st.sidebar.markdown("📧 soporte@industrial.com")
 st.sidebar.markdown("📱 +1-800-INDUSTRY")
+
+medicion = perfilador.terminar(caches={
+    'datos': obtener_cache().estadisticas(),
+    'graficos': obtener_cache_graficos().estadisticas(),
+})
+# Reruns medidos de esta sesión (RESULTADOS mezcla todas las del proceso)
+mediciones_sesion = st.session_state.setdefault('mediciones', deque(maxlen=100))
+if medicion is not None:
+    mediciones_sesion.append(medicion)
+
+# Panel de diagnóstico: costo de cada sección del rerun que acaba de terminar
+with st.sidebar.expander("🩺 Diagnóstico"):
+    st.checkbox("Medir secciones", key='diagnostico')
+    st.checkbox("Incluir memoria (tracemalloc)", key='diagnostico_memoria')
+    if medicion is None:
+        st.caption("Activa la medición para ver tiempos, memoria y cachés por sección.")
+    else:
+        st.caption(f"Rerun: {medicion['total_segundos'] * 1000:.0f} ms")
+        df_secciones = pd.DataFrame(medicion['secciones'])
+        df_secciones['ms'] = df_secciones.pop('segundos') * 1000
+        for columna in ['pico_bytes', 'neto_bytes']:
+            if columna in df_secciones:
+                df_secciones[columna.replace('_bytes', ' KB')] = pd.to_numeric(df_secciones.pop(columna)) / 1024
+        bytes_graficos = pd.DataFrame(medicion['graficos'], columns=['seccion', 'grafico', 'bytes'])
+        df_secciones['gráficos KB'] = df_secciones['seccion'].map(
+            bytes_graficos.groupby('seccion')['bytes'].sum() / 1024
+        ).fillna(0)
+        st.dataframe(
+            df_secciones.sort_values('ms', ascending=False),
+            hide_index=True,
+            column_config={c: st.column_config.NumberColumn(format="%.1f") for c in df_secciones.columns[1:]}
+        )
+        st.dataframe(
+            pd.DataFrame(medicion['caches']).T[['aciertos', 'fallos', 'tasa_aciertos', 'bytes']],
+            column_config={'tasa_aciertos': st.column_config.NumberColumn(format="%.2f")}
+        )
+        col_exp1, col_exp2 = st.columns(2)
+        with col_exp1:
+            st.download_button(
+                "Prometheus", a_prometheus(medicion), file_name='dashboard.prom', mime='text/plain'
+            )
+        with col_exp2:
+            st.download_button(
+                "JSONL", a_jsonl(list(mediciones_sesion)), file_name='dashboard.jsonl', mime='application/jsonl'
+            )